@@ -431,15 +431,15 @@ async def get_user_tech_statistics(
         asset_stats = data_service.get_tech_stack_asset_statistics(user_id)
         
         # 获取负债统计
-        debts = data_service.get_tech_stack_debts(user_id, is_active=True)
+        debts_count = data_service.count_tech_stack_debts(user_id, is_active=True)
         
         # 获取MCP会话统计
         mcp_stats = data_service.get_mcp_session_statistics(user_id)
         
         return TechStackStatistics(
-            total_technologies=asset_stats['total_assets'] + len(debts),
+            total_technologies=asset_stats['total_assets'] + debts_count,
             assets_count=asset_stats['total_assets'],
-            debts_count=len(debts),
+            debts_count=debts_count,
             average_proficiency=asset_stats['average_proficiency'],
             total_learning_hours=mcp_stats['total_duration_hours'],
             category_breakdown={
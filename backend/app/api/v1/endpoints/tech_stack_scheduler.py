@@ -20,6 +20,7 @@ class SchedulerStatusResponse(BaseModel):
     job_stats: Dict[str, Any]
     scheduled_jobs: list
     scheduler_state: Optional[str] = None
+    job_history: Optional[list] = None
 
 
 class ManualTriggerRequest(BaseModel):
@@ -40,16 +41,19 @@ class ManualTriggerResponse(BaseModel):
 
 
 @router.get("/status", response_model=SchedulerStatusResponse)
-async def get_scheduler_status():
+async def get_scheduler_status(include_history: bool = False):
     """
     获取调度器状态
     
+    Args:
+        include_history: 是否返回最近的任务执行记录
+    
     Returns:
         调度器状态信息
     """
     try:
         scheduler = get_scheduler()
-        status_info = scheduler.get_scheduler_status()
+        status_info = scheduler.get_scheduler_status(include_history=include_history)
         return SchedulerStatusResponse(**status_info)
     except Exception as e:
         raise HTTPException(
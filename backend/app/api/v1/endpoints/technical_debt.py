@@ -3,7 +3,7 @@
 技术债务相关 API 端点
 """
 
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
@@ -117,11 +117,17 @@ async def analyze_code_for_debt(
     file_path: str,
     code_content: str,
     user_id: int,
+    code_record_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """分析代码并识别技术债务"""
+    """分析代码并识别技术债务（提供code_record_id时高严重性问题会自动记录为技术债务）"""
     service = TechnicalDebtService(db)
-    analysis = await service.analyze_code_for_debt(file_path, code_content, user_id)
+    analysis = service.analyze_code_for_debt(
+        user_id=user_id,
+        code_content=code_content,
+        file_path=file_path,
+        code_record_id=code_record_id
+    )
     return analysis
 
 
@@ -19,6 +19,9 @@ class Settings(BaseSettings):
     
     # 数据库配置
     database_url: str = "sqlite:///./climber_engine.db"
+    database_pool_size: int = 50
+    database_max_overflow: int = 25
+    database_pool_recycle: int = 1800  # 连接回收时间（秒）
     
     # API 配置
     api_v1_str: str = "/api/v1"
@@ -52,6 +55,12 @@ class Settings(BaseSettings):
     # MCP 配置
     mcp_server_port: int = 8001
     
+    # 缓存配置
+    summary_cache_enabled: bool = True
+    summary_cache_ttl_seconds: float = 30.0
+    dashboard_cache_enabled: bool = True
+    dashboard_cache_ttl_seconds: float = 60.0
+    
     # 安全配置
     secret_key: str = "your-secret-key-here"
     algorithm: str = "HS256"
@@ -4,17 +4,38 @@
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 
 from app.core.config import settings
 
+# 连接池配置：SQLite 为单文件数据库，保持默认连接池；其他数据库显式设置池大小
+if "sqlite" in settings.database_url:
+    engine_options = {"connect_args": {"check_same_thread": False}}
+else:
+    engine_options = {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_recycle": settings.database_pool_recycle,
+    }
+    # psycopg2：INSERT批量合并为多值VALUES，UPDATE/DELETE的executemany（如bulk_update_mappings）
+    # 也改用execute_batch分页发送，避免逐行往返
+    if make_url(settings.database_url).get_driver_name() == "psycopg2":
+        engine_options.update(
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=1000,
+            executemany_batch_page_size=500,
+        )
+
 # 创建数据库引擎
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {},
-    echo=settings.debug
+    pool_pre_ping=True,
+    echo=settings.debug,
+    **engine_options
 )
 
 # 创建会话工厂
@@ -33,6 +54,21 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def upsert_insert(db: Session):
+    """
+    返回当前数据库方言支持 ON CONFLICT 的 insert 构造函数
+    
+    Raises:
+        NotImplementedError: 方言不支持 ON CONFLICT upsert
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    elif dialect_name == 'sqlite':
+        return sqlite.insert
+    raise NotImplementedError(f"Upsert is not supported for dialect: {dialect_name}")
+
+
 def init_db() -> None:
     """初始化数据库表"""
     # 导入所有模型以确保它们被注册到 Base.metadata
@@ -43,4 +79,8 @@ def init_db() -> None:
     )
     
     # 创建所有表
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    
+    # 为已存在的表补充新增的列、索引并回填数据
+    from app.core.schema_upgrade import upgrade_schema
+    upgrade_schema(engine)
\ No newline at end of file
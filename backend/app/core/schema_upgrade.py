@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+已有数据库的结构升级
+
+项目没有迁移工具，表结构由 create_all 创建，而 create_all 不会为已存在的表补充新增的列和索引。
+这里的各个步骤都是幂等的，由 init_db 在建表后依次执行，已是最新结构的数据库不做任何修改。
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _has_table(conn: Connection, table_name: str) -> bool:
+    """判断表是否存在"""
+    return inspect(conn).has_table(table_name)
+
+
+def _has_index(conn: Connection, table_name: str, index_name: str) -> bool:
+    """判断表上是否已有指定名称的索引"""
+    if conn.dialect.name == 'sqlite':
+        # SQLite的反射会跳过表达式索引（如 lower(technology_name)），直接查询sqlite_master
+        return conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND name = :name"),
+            {'table': table_name, 'name': index_name}
+        ).first() is not None
+    return any(index['name'] == index_name for index in inspect(conn).get_indexes(table_name))
+
+
+# 合并重复技术栈记录时各列的取值规则：(累加的计数列, 取最大值的评分/时间列, 取最小值的时间列,
+# (决定主记录的评分列, 随主记录取值的列))；其余列保留最早记录的值，为空时取其他重复记录中第一个非空值
+_TECH_STACK_MERGE_RULES = {
+    'tech_stack_assets': (
+        ('total_practice_hours', 'project_count'),
+        ('confidence_level', 'theoretical_knowledge', 'practical_skills', 'problem_solving',
+         'best_practices', 'advanced_features', 'market_demand', 'salary_impact', 'career_relevance',
+         'last_practiced_date', 'last_assessed_at', 'updated_at'),
+        ('first_learned_date', 'created_at'),
+        ('proficiency_score', ('proficiency_level',)),
+    ),
+    'tech_stack_debts': (
+        ('time_invested',),
+        ('career_impact', 'project_relevance', 'estimated_learning_hours', 'market_demand',
+         'salary_potential', 'job_opportunities', 'updated_at'),
+        ('identified_at', 'created_at', 'planned_start_date'),
+        ('importance_score', ('urgency_level',)),
+    ),
+}
+
+
+def _merge_duplicate_rows(rows: List[Dict[str, Any]], rules) -> Dict[str, Any]:
+    """按合并规则把同一技术的多条记录合并为一组列值，rows按id升序排列"""
+    sum_columns, max_columns, min_columns, (leader_column, leader_columns) = rules
+    
+    merged = {}
+    for column in rows[0]:
+        if column == 'id':
+            continue
+        values = [row[column] for row in rows if row[column] is not None]
+        if column in sum_columns:
+            merged[column] = sum(values) if values else None
+        elif column in max_columns:
+            merged[column] = max(values, default=None)
+        elif column in min_columns:
+            merged[column] = min(values, default=None)
+        else:
+            merged[column] = values[0] if values else None
+    
+    # 评分取最高的记录，其等级等描述列一并取自该记录
+    leader = max(rows, key=lambda row: row[leader_column] or 0)
+    merged[leader_column] = leader[leader_column]
+    for column in leader_columns:
+        merged[column] = leader[column]
+    return merged
+
+
+def _ensure_tech_stack_unique_indexes(conn: Connection) -> None:
+    """
+    为技术栈资产/负债补建 (user_id, lower(technology_name)) 唯一索引
+    
+    旧数据库中同一用户可能存在仅大小写不同的重复技术名称，直接建唯一索引会失败；
+    建索引前把重复记录合并到id最小（最早创建）的记录中并删除其余记录，合并情况逐条记录到日志
+    """
+    from app.models.learning_progress import TechStackAsset, TechStackDebt
+    
+    for model, index_name in (
+        (TechStackAsset, 'ux_tech_asset_user_lowername'),
+        (TechStackDebt, 'ux_tech_debt_user_lowername'),
+    ):
+        table = model.__table__
+        if not _has_table(conn, table.name) or _has_index(conn, table.name, index_name):
+            continue
+        
+        lower_name = func.lower(table.c.technology_name)
+        duplicate_keys = (
+            select(table.c.user_id, lower_name.label('lower_name'))
+            .group_by(table.c.user_id, lower_name)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        duplicates = conn.execute(
+            select(table, duplicate_keys.c.lower_name)
+            .join(duplicate_keys, and_(
+                table.c.user_id == duplicate_keys.c.user_id,
+                lower_name == duplicate_keys.c.lower_name
+            ))
+            .order_by(table.c.user_id, duplicate_keys.c.lower_name, table.c.id)
+        ).mappings().all()
+        
+        groups: Dict[Tuple[int, str], List[Dict[str, Any]]] = {}
+        for row in duplicates:
+            row = dict(row)
+            groups.setdefault((row['user_id'], row.pop('lower_name')), []).append(row)
+        
+        for (user_id, technology), rows in groups.items():
+            survivor_id = rows[0]['id']
+            removed_ids = [row['id'] for row in rows[1:]]
+            conn.execute(
+                update(table).where(table.c.id == survivor_id)
+                .values(**_merge_duplicate_rows(rows, _TECH_STACK_MERGE_RULES[table.name]))
+            )
+            conn.execute(delete(table).where(table.c.id.in_(removed_ids)))
+            logger.warning(
+                f"Merged duplicate {table.name} rows {removed_ids} into row {survivor_id} "
+                f"(user_id={user_id}, technology={technology})"
+            )
+        
+        next(index for index in table.indexes if index.name == index_name).create(conn)
+        logger.info(f"Created unique index {index_name}, merged {len(groups)} duplicate groups in {table.name}")
+
+
+def _has_column(conn: Connection, table_name: str, column_name: str) -> bool:
+    """判断表中是否已有指定列"""
+    return any(column['name'] == column_name for column in inspect(conn).get_columns(table_name))
+
+
+def _backfill_mcp_session_technology_tags(conn: Connection) -> None:
+    """
+    为MCP会话补充technology_tags列，并按各技术栈字段回填为空的记录
+    
+    回填后的标签至少为空串，重复执行时不会再次处理同一记录
+    """
+    from app.models.mcp_session import MCPSession, TECHNOLOGY_FIELDS, build_technology_tags
+    
+    table = MCPSession.__table__
+    if not _has_table(conn, table.name):
+        return
+    if not _has_column(conn, table.name, 'technology_tags'):
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN technology_tags TEXT"))
+    
+    rows = conn.execute(
+        select(table.c.id, *(table.c[field] for field in TECHNOLOGY_FIELDS))
+        .where(table.c.technology_tags.is_(None))
+    ).all()
+    if not rows:
+        return
+    
+    conn.execute(
+        update(table).where(table.c.id == bindparam('session_id')).values(technology_tags=bindparam('new_tags')),
+        [
+            {'session_id': row.id, 'new_tags': build_technology_tags(**row._asdict())}
+            for row in rows
+        ]
+    )
+    logger.info(f"Backfilled technology_tags for {len(rows)} MCP sessions")
+
+
+def _backfill_technical_debt_user_id(conn: Connection) -> None:
+    """
+    为技术债务补充冗余的user_id列，按 code_record -> coding_session 回填为空的记录
+    
+    user_id为空的记录不会出现在按用户的汇总、趋势和概览统计中；按用户统计的索引由 _create_missing_indexes 补建
+    """
+    from app.models.technical_debt import TechnicalDebt
+    
+    table = TechnicalDebt.__table__
+    if not _has_table(conn, table.name):
+        return
+    if not _has_column(conn, table.name, 'user_id'):
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN user_id INTEGER REFERENCES users(id)"))
+    
+    updated = conn.execute(text(
+        f"UPDATE {table.name} SET user_id = ("
+        "SELECT coding_sessions.user_id FROM code_records "
+        "JOIN coding_sessions ON coding_sessions.id = code_records.coding_session_id "
+        f"WHERE code_records.id = {table.name}.code_record_id"
+        ") WHERE user_id IS NULL AND code_record_id IS NOT NULL"
+    )).rowcount
+    if updated:
+        logger.info(f"Backfilled user_id for {updated} technical debts")
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    """
+    为已存在的表补建模型中声明、数据库中尚不存在的索引
+    
+    唯一索引可能因已有重复数据而创建失败，需由专门的步骤先处理数据，这里跳过；
+    限定方言的索引（如PostgreSQL的三元组GIN索引）在其他方言下由 ddl_if 跳过
+    """
+    from app.core.database import Base
+    
+    for table in Base.metadata.sorted_tables:
+        if not _has_table(conn, table.name):
+            continue
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.unique or _has_index(conn, table.name, index.name):
+                continue
+            if conn.dialect.name == 'postgresql' and index.dialect_options['postgresql']['using'] == 'gin':
+                # 三元组GIN索引依赖pg_trgm扩展，建表时由before_create事件创建，旧库需在此补建
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            index.create(conn)
+            if _has_index(conn, table.name, index.name):
+                logger.info(f"Created missing index {index.name} on {table.name}")
+
+
+# 按顺序执行的升级步骤
+UPGRADE_STEPS = (
+    _ensure_tech_stack_unique_indexes,
+    _backfill_mcp_session_technology_tags,
+    _backfill_technical_debt_user_id,
+    _create_missing_indexes,
+)
+
+
+def upgrade_schema(bind: Engine) -> None:
+    """在一个事务中依次执行全部升级步骤"""
+    with bind.begin() as conn:
+        for step in UPGRADE_STEPS:
+            step(conn)
@@ -5,8 +5,8 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Index, func, and_
+from sqlalchemy.orm import relationship, validates
 
 from app.core.database import Base
 
@@ -72,9 +72,20 @@ class TechStackAsset(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_assessed_at = Column(DateTime)  # 最后评估时间
     
+    # 索引：按用户列出资产并按熟练度排序；同一用户的技术名称（不区分大小写）唯一，作为upsert冲突目标
+    __table_args__ = (
+        Index('idx_tech_asset_user_prof', user_id, proficiency_score.desc()),
+        Index('ux_tech_asset_user_lowername', user_id, func.lower(technology_name), unique=True),
+    )
+    
     # 关系
     user = relationship("User", back_populates="tech_stack_assets")
     
+    @validates('technology_name')
+    def _strip_technology_name(self, key, value):
+        """去除技术名称首尾空白，保证 lower(technology_name) 索引查找的一致性"""
+        return value.strip() if value else value
+    
     def __repr__(self):
         return f"<TechStackAsset(id={self.id}, user_id={self.user_id}, tech='{self.technology_name}', level='{self.proficiency_level}')>"
     
@@ -121,6 +132,10 @@ class TechStackAsset(Base):
         self.is_active = True
 
 
+# 未完成（仍需学习）的负债状态
+OPEN_DEBT_STATUSES = ('identified', 'planned', 'learning')
+
+
 class TechStackDebt(Base):
     """技术栈负债模型 - 用户未掌握但需要学习的技术栈"""
     
@@ -191,9 +206,27 @@ class TechStackDebt(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：按用户列出负债（按重要性排序）、高优先级负债查询（部分索引，仅包含活跃且未完成的负债）；
+    # 同一用户的技术名称（不区分大小写）唯一
+    __table_args__ = (
+        Index('ux_tech_debt_user_lowername', user_id, func.lower(technology_name), unique=True),
+        Index('idx_tech_debt_user_importance', user_id, importance_score.desc()),
+        Index(
+            'idx_tech_debt_active_open',
+            user_id, learning_priority.desc(), importance_score.desc(),
+            sqlite_where=and_(is_active == True, status.in_(OPEN_DEBT_STATUSES)),
+            postgresql_where=and_(is_active == True, status.in_(OPEN_DEBT_STATUSES))
+        ),
+    )
+    
     # 关系
     user = relationship("User", back_populates="tech_stack_debts")
     
+    @validates('technology_name')
+    def _strip_technology_name(self, key, value):
+        """去除技术名称首尾空白，保证 lower(technology_name) 索引查找的一致性"""
+        return value.strip() if value else value
+    
     def __repr__(self):
         return f"<TechStackDebt(id={self.id}, user_id={self.user_id}, tech='{self.technology_name}', urgency='{self.urgency_level}')>"
     
@@ -317,6 +350,11 @@ class LearningProgressSummary(Base):
     generated_at = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    # 索引：按用户获取最新总结
+    __table_args__ = (
+        Index('idx_lps_user_generated', user_id, generated_at.desc()),
+    )
+    
     # 关系
     user = relationship("User", back_populates="learning_progress_summaries")
     
@@ -4,7 +4,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -84,6 +84,11 @@ class LearningTask(Base):
     completed_at = Column(DateTime)  # 完成时间
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：按用户列出记录时按 (created_at, id) 倒序做键集分页
+    __table_args__ = (
+        Index('idx_learning_task_user_created_id', user_id, created_at.desc(), id.desc()),
+    )
+    
     # 关系
     user = relationship("User", back_populates="learning_tasks")
     
@@ -5,12 +5,40 @@ MCP会话管理数据模型
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Index, DDL, event
+from sqlalchemy.orm import relationship, validates
 
 from app.core.database import Base
 
 
+# 参与技术标签汇总的技术栈字段
+TECHNOLOGY_FIELDS = ('technologies', 'primary_language', 'frameworks', 'libraries', 'tools')
+
+
+def normalize_technology_name(name: str) -> str:
+    """技术名称归一化（去除首尾空白并转为小写）"""
+    return name.strip().lower()
+
+
+def technology_tag(name: str) -> str:
+    """单个技术在technology_tags中的匹配片段"""
+    return f"|{normalize_technology_name(name)}|"
+
+
+def build_technology_tags(**fields) -> str:
+    """将各技术栈字段合并为去重后的归一化标签串，如 |python|react|"""
+    names = []
+    for field in TECHNOLOGY_FIELDS:
+        value = fields.get(field)
+        if not value:
+            continue
+        for name in ([value] if isinstance(value, str) else value):
+            if name and normalize_technology_name(name) not in names:
+                names.append(normalize_technology_name(name))
+    
+    return f"|{'|'.join(names)}|" if names else ""
+
+
 class MCPSession(Base):
     """MCP会话模型 - 记录每次Recorder MCP调用的会话信息"""
     
@@ -32,6 +60,7 @@ class MCPSession(Base):
     frameworks = Column(JSON)  # 使用的框架
     libraries = Column(JSON)  # 使用的库
     tools = Column(JSON)  # 使用的工具
+    technology_tags = Column(Text)  # 归一化的技术标签汇总，由上述字段自动维护
     
     # 难度和评估
     difficulty_level = Column(String(20), default="intermediate")  # beginner, intermediate, advanced, expert
@@ -77,10 +106,30 @@ class MCPSession(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：按用户和状态获取最近会话；PostgreSQL下为技术标签建立三元组GIN索引，
+    # 使按技术查询的 LIKE '%|python|%' 可走索引（SQLite不支持，仍为单列扫描）
+    __table_args__ = (
+        Index('idx_mcp_session_user_created_status', user_id, status, created_at.desc()),
+        Index(
+            'idx_mcp_session_technology_tags_trgm',
+            technology_tags,
+            postgresql_using='gin',
+            postgresql_ops={'technology_tags': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
+    
     # 关系
     user = relationship("User", back_populates="mcp_sessions")
     code_snippets = relationship("MCPCodeSnippet", back_populates="mcp_session", cascade="all, delete-orphan")
     
+    @validates(*TECHNOLOGY_FIELDS)
+    def _sync_technology_tags(self, key, value):
+        """技术栈字段变更时同步更新technology_tags"""
+        fields = {field: getattr(self, field) for field in TECHNOLOGY_FIELDS}
+        fields[key] = value
+        self.technology_tags = build_technology_tags(**fields)
+        return value
+    
     def __repr__(self):
         return f"<MCPSession(id={self.id}, user_id={self.user_id}, project='{self.project_name}', work_type='{self.work_type}')>"
     
@@ -154,6 +203,13 @@ class MCPSession(Base):
             "documentation_quality": self.documentation_quality
         }
 
+# 三元组GIN索引依赖pg_trgm扩展
+event.listen(
+    MCPSession.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
 
 class MCPCodeSnippet(Base):
     """MCP代码片段模型 - 记录与技术栈相关的代码片段"""
@@ -4,7 +4,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -74,6 +74,11 @@ class SkillAssessment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：按用户列出记录时按 (created_at, id) 倒序做键集分页
+    __table_args__ = (
+        Index('idx_skill_assessment_user_created_id', user_id, created_at.desc(), id.desc()),
+    )
+    
     # 关系
     user = relationship("User", back_populates="skill_assessments")
     
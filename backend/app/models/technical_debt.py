@@ -4,7 +4,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -17,6 +17,8 @@ class TechnicalDebt(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     code_record_id = Column(Integer, ForeignKey("code_records.id"), nullable=False)
+    # 冗余保存所属用户（即 code_record -> coding_session 的 user_id），按用户统计时无需两次连接
+    user_id = Column(Integer, ForeignKey("users.id"))
     
     # 债务基本信息
     title = Column(String(200), nullable=False)  # 债务标题
@@ -88,6 +90,19 @@ class TechnicalDebt(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：按用户的汇总和趋势统计（按状态、时间过滤，按严重性、类型分组）可只扫描索引完成；
+    # 按用户和筛选条件的债务列表按 (created_at, id) 倒序做键集分页
+    __table_args__ = (
+        Index(
+            'ix_td_user_status_created',
+            user_id, status, created_at, resolved_at, severity, debt_type, impact_score, effort_estimate
+        ),
+        Index(
+            'ix_td_user_filters_created_id',
+            user_id, status, severity, debt_type, created_at.desc(), id.desc()
+        ),
+    )
+    
     # 关系
     code_record = relationship("CodeRecord", back_populates="technical_debts")
     
@@ -99,6 +114,7 @@ class TechnicalDebt(Base):
         return {
             "id": self.id,
             "code_record_id": self.code_record_id,
+            "user_id": self.user_id,
             "title": self.title,
             "description": self.description,
             "debt_type": self.debt_type,
@@ -4,7 +4,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, Float, Index, DDL, event
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -56,6 +56,29 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 索引：PostgreSQL下为搜索字段建立三元组GIN索引，使 ILIKE '%关键字%' 可走索引
+    # （SQLite不支持，仍为全表扫描）
+    __table_args__ = (
+        Index(
+            'idx_user_username_trgm',
+            username,
+            postgresql_using='gin',
+            postgresql_ops={'username': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        Index(
+            'idx_user_email_trgm',
+            email,
+            postgresql_using='gin',
+            postgresql_ops={'email': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        Index(
+            'idx_user_full_name_trgm',
+            full_name,
+            postgresql_using='gin',
+            postgresql_ops={'full_name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
+    
     # 关系
     coding_sessions = relationship("CodingSession", back_populates="user", cascade="all, delete-orphan")
     skill_assessments = relationship("SkillAssessment", back_populates="user", cascade="all, delete-orphan")
@@ -86,4 +109,12 @@ class User(Base):
             "tech_debt_score": self.tech_debt_score,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+# 三元组GIN索引依赖pg_trgm扩展
+event.listen(
+    User.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
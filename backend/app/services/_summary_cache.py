@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+学习进度总结缓存
+为按用户查询最近一次总结的热点路径提供进程内TTL缓存
+"""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+class TTLCache:
+    """
+    线程安全的进程内TTL缓存
+    
+    基于字典 + 锁 + 单调时钟过期时间实现，缓存值可以为None
+    """
+    
+    def __init__(self, ttl_seconds: float, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        读取缓存
+        
+        Returns:
+            (是否命中, 缓存值)
+        """
+        if not self.enabled:
+            return False, None
+        
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return False, None
+            
+            return True, value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入缓存"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+    
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """使指定键失效，key为None时清空全部缓存"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+# 用户ID -> 最后一次分析时间（最新总结的period_end）
+last_analysis_time_cache = TTLCache(
+    settings.summary_cache_ttl_seconds, settings.summary_cache_enabled
+)
+
+# 用户ID -> 最新学习进度总结ID
+latest_summary_id_cache = TTLCache(
+    settings.summary_cache_ttl_seconds, settings.summary_cache_enabled
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    """用户生成新的学习进度总结后使其缓存失效"""
+    last_analysis_time_cache.invalidate(user_id)
+    latest_summary_id_cache.invalidate(user_id)
+
+
+# 会话info中记录已写入新总结、待事务提交后使缓存失效的用户ID集合的键
+_PENDING_INVALIDATION_KEY = 'summary_cache_pending_user_ids'
+
+
+def invalidate_user_after_commit(session: Session, user_id: int) -> None:
+    """
+    记录会话中为用户写入了新总结，事务提交后再使其缓存失效
+    
+    提交前失效会让并发读取把提交前的旧数据重新写入缓存；提交前该会话自身的读取应通过
+    has_pending_invalidation 跳过进程级缓存
+    """
+    session.info.setdefault(_PENDING_INVALIDATION_KEY, set()).add(user_id)
+
+
+def has_pending_invalidation(session: Session, user_id: int) -> bool:
+    """会话中是否有该用户尚未提交的新总结"""
+    return user_id in session.info.get(_PENDING_INVALIDATION_KEY, ())
+
+
+def _invalidate_pending_after_commit(session: Session) -> None:
+    """事务提交后使记录的用户缓存失效"""
+    for user_id in session.info.pop(_PENDING_INVALIDATION_KEY, ()):
+        invalidate_user(user_id)
+
+
+def _discard_pending_after_rollback(session: Session) -> None:
+    """事务回滚后新总结未写入，丢弃记录的用户"""
+    session.info.pop(_PENDING_INVALIDATION_KEY, None)
+
+
+event.listen(Session, 'after_commit', _invalidate_pending_after_commit)
+event.listen(Session, 'after_rollback', _discard_pending_after_rollback)
@@ -6,6 +6,7 @@ AI服务层 - 集成多个LLM API
 import os
 import json
 import asyncio
+import threading
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime
 import openai
@@ -22,50 +23,66 @@ from app.models.code_record import CodeRecord
 logger = get_logger(__name__)
 
 
+# 进程内共享的LLM客户端（各自持有HTTP连接池），首次使用时创建
+_llm_clients: Optional[Dict[str, Any]] = None
+_llm_clients_lock = threading.Lock()
+
+
+def _create_llm_clients() -> Dict[str, Any]:
+    """初始化各个LLM客户端"""
+    clients = {}
+    
+    # OpenAI客户端
+    if settings.openai_api_key:
+        clients['openai'] = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url
+        )
+        logger.info("OpenAI客户端初始化成功")
+    
+    # Qwen客户端
+    if settings.qwen_api_key:
+        clients['qwen'] = AsyncOpenAI(
+            api_key=settings.qwen_api_key,
+            base_url=settings.qwen_base_url
+        )
+        logger.info("Qwen客户端初始化成功")
+    
+    # Kimi客户端
+    if settings.kimi_api_key:
+        clients['kimi'] = AsyncOpenAI(
+            api_key=settings.kimi_api_key,
+            base_url=settings.kimi_base_url
+        )
+        logger.info("Kimi客户端初始化成功")
+    
+    # DeepSeek客户端
+    if settings.deepseek_api_key:
+        clients['deepseek'] = AsyncOpenAI(
+            api_key=settings.deepseek_api_key,
+            base_url=settings.deepseek_base_url
+        )
+        logger.info("DeepSeek客户端初始化成功")
+    
+    return clients
+
+
+def get_llm_clients() -> Dict[str, Any]:
+    """获取共享的LLM客户端，各请求的AIService复用同一组连接池（并发的首次调用也只创建一次）"""
+    global _llm_clients
+    if _llm_clients is None:
+        with _llm_clients_lock:
+            if _llm_clients is None:
+                _llm_clients = _create_llm_clients()
+    return _llm_clients
+
+
 class AIService:
     """AI服务类 - 统一管理多个LLM API调用"""
     
     def __init__(self, db: Session):
         self.db = db
-        self.clients = self._initialize_clients()
-    
-    def _initialize_clients(self) -> Dict[str, Any]:
-        """初始化各个LLM客户端"""
-        clients = {}
-        
-        # OpenAI客户端
-        if settings.openai_api_key:
-            clients['openai'] = AsyncOpenAI(
-                api_key=settings.openai_api_key,
-                base_url=settings.openai_base_url
-            )
-            logger.info("OpenAI客户端初始化成功")
-        
-        # Qwen客户端
-        if settings.qwen_api_key:
-            clients['qwen'] = AsyncOpenAI(
-                api_key=settings.qwen_api_key,
-                base_url=settings.qwen_base_url
-            )
-            logger.info("Qwen客户端初始化成功")
-        
-        # Kimi客户端
-        if settings.kimi_api_key:
-            clients['kimi'] = AsyncOpenAI(
-                api_key=settings.kimi_api_key,
-                base_url=settings.kimi_base_url
-            )
-            logger.info("Kimi客户端初始化成功")
-        
-        # DeepSeek客户端
-        if settings.deepseek_api_key:
-            clients['deepseek'] = AsyncOpenAI(
-                api_key=settings.deepseek_api_key,
-                base_url=settings.deepseek_base_url
-            )
-            logger.info("DeepSeek客户端初始化成功")
-        
-        return clients
+        self.clients = get_llm_clients()
     
     async def call_llm(
         self,
@@ -4,15 +4,23 @@
 负责技术栈总结Agent的数据访问操作
 """
 
+import json
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc, asc
+from itertools import chain
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from sqlalchemy.orm import Session, load_only, selectinload, raiseload
+from sqlalchemy import Text, and_, or_, cast, func, desc, asc, update, bindparam
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.models.mcp_session import MCPSession, MCPCodeSnippet
-from app.models.learning_progress import TechStackAsset, TechStackDebt, LearningProgressSummary
+from app.core.config import settings
+from app.core.database import upsert_insert
+from app.models.mcp_session import MCPSession, MCPCodeSnippet, technology_tag, normalize_technology_name
+from app.models.learning_progress import (
+    TechStackAsset, TechStackDebt, LearningProgressSummary, OPEN_DEBT_STATUSES
+)
 from app.models.user import User
+from app.services import _summary_cache
 from app.schemas.learning_progress import (
     TechStackAssetCreate, TechStackAssetUpdate, TechStackAssetResponse,
     TechStackDebtCreate, TechStackDebtUpdate, TechStackDebtResponse,
@@ -20,6 +28,16 @@ from app.schemas.learning_progress import (
 )
 
 
+# 批量查询时IN列表的最大长度，避免超出数据库绑定参数数量限制
+BULK_QUERY_CHUNK_SIZE = 500
+
+
+def _chunked(items: List[Any], size: int = BULK_QUERY_CHUNK_SIZE) -> Iterator[List[Any]]:
+    """按固定大小切分列表"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 class TechStackDataService:
     """
     技术栈数据访问服务
@@ -29,6 +47,37 @@ class TechStackDataService:
     
     def __init__(self, db: Session):
         self.db = db
+        # 实例级查询缓存：同一次Agent运行中按用户重复查询时避免多次往返，提交或回滚时清空
+        self._user_cache: Dict[int, Optional[User]] = {}
+        self._last_analysis_cache: Dict[int, Optional[datetime]] = {}
+        self._latest_summary_cache: Dict[int, Optional[LearningProgressSummary]] = {}
+    
+    def __enter__(self) -> "TechStackDataService":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """退出时释放身份映射并关闭会话，未提交的事务会被回滚"""
+        self.db.expunge_all()
+        self.db.close()
+    
+    def _relation_loader_options(self, model, load_relations: Tuple[str, ...]) -> list:
+        """
+        构建关系加载选项
+        
+        指定的关系通过selectinload一次性预加载；调试模式下其余关系设为raiseload，
+        使意外的懒加载（N+1查询）直接报错而不是悄悄执行
+        
+        Args:
+            model: 查询的模型类
+            load_relations: 需要预加载的关系名称
+        
+        Returns:
+            查询选项列表
+        """
+        options = [selectinload(getattr(model, name)) for name in load_relations]
+        if settings.debug:
+            options.append(raiseload('*'))
+        return options
     
     # ==================== MCP会话数据访问 ====================
     
@@ -37,7 +86,9 @@ class TechStackDataService:
         user_id: Optional[int] = None,
         since: Optional[datetime] = None,
         limit: int = 100,
-        min_duration_minutes: int = 5
+        min_duration_minutes: int = 5,
+        columns: Optional[Tuple[str, ...]] = None,
+        load_relations: Tuple[str, ...] = ()
     ) -> List[MCPSession]:
         """
         获取最近的MCP会话数据
@@ -47,10 +98,44 @@ class TechStackDataService:
             since: 起始时间，None表示最近30天
             limit: 最大返回数量
             min_duration_minutes: 最小会话时长（分钟）
+            columns: 只加载的列名，None表示加载全部列
+            load_relations: 需要预加载的关系名称，如('user',)
         
         Returns:
             MCP会话列表
         """
+        return self._recent_mcp_sessions_query(
+            user_id, since, limit, min_duration_minutes, columns, load_relations
+        ).all()
+    
+    def iter_recent_mcp_sessions(
+        self, 
+        user_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: int = 100,
+        min_duration_minutes: int = 5,
+        columns: Optional[Tuple[str, ...]] = None,
+        load_relations: Tuple[str, ...] = ()
+    ) -> Iterator[MCPSession]:
+        """
+        分批流式迭代最近的MCP会话，参数同get_recent_mcp_sessions
+        
+        仅需遍历一次结果时使用，内存占用与批大小而非结果总量成正比
+        """
+        yield from self._recent_mcp_sessions_query(
+            user_id, since, limit, min_duration_minutes, columns, load_relations
+        ).yield_per(200)
+    
+    def _recent_mcp_sessions_query(
+        self, 
+        user_id: Optional[int],
+        since: Optional[datetime],
+        limit: int,
+        min_duration_minutes: int,
+        columns: Optional[Tuple[str, ...]],
+        load_relations: Tuple[str, ...]
+    ):
+        """构建最近MCP会话查询"""
         if since is None:
             since = datetime.utcnow() - timedelta(days=30)
         
@@ -68,7 +153,12 @@ class TechStackDataService:
         if user_id:
             query = query.filter(MCPSession.user_id == user_id)
         
-        return query.order_by(desc(MCPSession.created_at)).limit(limit).all()
+        if columns:
+            query = query.options(load_only(*(getattr(MCPSession, column) for column in columns)))
+        
+        query = query.options(*self._relation_loader_options(MCPSession, load_relations))
+        
+        return query.order_by(desc(MCPSession.created_at)).limit(limit)
     
     def get_mcp_sessions_by_technology(
         self, 
@@ -87,13 +177,15 @@ class TechStackDataService:
         Returns:
             MCP会话列表
         """
+        # 各技术栈字段已汇总到technology_tags，单个条件即可覆盖（不区分大小写）；
+        # 尚未回填technology_tags的旧记录仍按各技术栈字段匹配
         query = self.db.query(MCPSession).filter(
             or_(
-                MCPSession.technologies.contains([technology]),
-                MCPSession.primary_language == technology,
-                MCPSession.frameworks.contains([technology]),
-                MCPSession.libraries.contains([technology]),
-                MCPSession.tools.contains([technology])
+                MCPSession.technology_tags.contains(technology_tag(technology), autoescape=True),
+                and_(
+                    MCPSession.technology_tags.is_(None),
+                    self._legacy_technology_predicate(technology)
+                )
             )
         )
         
@@ -102,6 +194,20 @@ class TechStackDataService:
         
         return query.order_by(desc(MCPSession.created_at)).limit(limit).all()
     
+    @staticmethod
+    def _legacy_technology_predicate(technology: str):
+        """按各技术栈字段匹配技术（不区分大小写），用于technology_tags为空的旧记录"""
+        name = normalize_technology_name(technology)
+        # JSON列序列化后逐项为带引号的字符串，按 "name" 片段匹配数组中的任一元素
+        quoted = json.dumps(name)
+        return or_(
+            func.lower(MCPSession.primary_language) == name,
+            *(
+                func.lower(cast(column, Text)).contains(quoted, autoescape=True)
+                for column in (MCPSession.technologies, MCPSession.frameworks, MCPSession.libraries, MCPSession.tools)
+            )
+        )
+    
     def get_mcp_session_statistics(
         self, 
         user_id: int,
@@ -117,20 +223,99 @@ class TechStackDataService:
         Returns:
             统计信息字典
         """
+        return self.get_bulk_mcp_session_statistics([user_id], since)[user_id]
+    
+    def get_bulk_mcp_session_statistics(
+        self, 
+        user_ids: List[int],
+        since: Optional[datetime] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        批量获取多个用户的MCP会话统计信息（每批用户一次查询，而非每个用户一次）
+        
+        Args:
+            user_ids: 用户ID列表
+            since: 起始时间
+        
+        Returns:
+            用户ID到统计信息字典的映射，格式同get_mcp_session_statistics
+        """
         if since is None:
             since = datetime.utcnow() - timedelta(days=30)
         
-        query = self.db.query(MCPSession).filter(
-            and_(
-                MCPSession.user_id == user_id,
-                MCPSession.created_at >= since,
-                MCPSession.status == 'completed'
-            )
-        )
+        accumulators = {
+            user_id: {
+                'total_sessions': 0,
+                'total_duration': 0,
+                'total_quality': 0,
+                'quality_count': 0,
+                'technologies': Counter(),
+                'projects': set(),
+                'work_types': Counter()
+            }
+            for user_id in user_ids
+        }
         
-        sessions = query.all()
+        for chunk in _chunked(list(accumulators)):
+            # 只加载统计所需的列，并分批流式读取，避免整表水合到身份映射中
+            query = self.db.query(MCPSession).options(
+                load_only(
+                    MCPSession.user_id,
+                    MCPSession.actual_duration,
+                    MCPSession.code_quality_score,
+                    MCPSession.technologies,
+                    MCPSession.frameworks,
+                    MCPSession.libraries,
+                    MCPSession.tools,
+                    MCPSession.primary_language,
+                    MCPSession.project_name,
+                    MCPSession.work_type
+                )
+            ).filter(
+                and_(
+                    MCPSession.user_id.in_(chunk),
+                    MCPSession.created_at >= since,
+                    MCPSession.status == 'completed'
+                )
+            ).yield_per(500)
+            
+            for session in query:
+                stats = accumulators[session.user_id]
+                stats['total_sessions'] += 1
+                
+                # 统计时长
+                if session.actual_duration:
+                    stats['total_duration'] += session.actual_duration
+                
+                # 统计质量分数
+                if session.code_quality_score:
+                    stats['total_quality'] += session.code_quality_score
+                    stats['quality_count'] += 1
+                
+                # 统计技术栈
+                stats['technologies'].update(chain(
+                    session.technologies or (),
+                    session.frameworks or (),
+                    session.libraries or (),
+                    session.tools or (),
+                    (session.primary_language,) if session.primary_language else ()
+                ))
+                
+                # 统计项目
+                if session.project_name:
+                    stats['projects'].add(session.project_name)
+                
+                # 统计工作类型
+                stats['work_types'][session.work_type] += 1
         
-        if not sessions:
+        return {
+            user_id: self._finalize_session_statistics(stats)
+            for user_id, stats in accumulators.items()
+        }
+    
+    def _finalize_session_statistics(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """将累加结果转换为统计信息字典"""
+        if not stats['total_sessions']:
             return {
                 'total_sessions': 0,
                 'total_duration_hours': 0,
@@ -140,51 +325,15 @@ class TechStackDataService:
                 'work_types': {}
             }
         
-        # 统计技术栈使用情况
-        tech_counter = {}
-        project_set = set()
-        work_type_counter = {}
-        total_duration = 0
-        total_quality = 0
-        quality_count = 0
-        
-        for session in sessions:
-            # 统计时长
-            if session.actual_duration:
-                total_duration += session.actual_duration
-            
-            # 统计质量分数
-            if session.code_quality_score:
-                total_quality += session.code_quality_score
-                quality_count += 1
-            
-            # 统计技术栈
-            all_techs = (session.technologies or []) + \
-                       (session.frameworks or []) + \
-                       (session.libraries or []) + \
-                       (session.tools or [])
-            
-            if session.primary_language:
-                all_techs.append(session.primary_language)
-            
-            for tech in all_techs:
-                tech_counter[tech] = tech_counter.get(tech, 0) + 1
-            
-            # 统计项目
-            if session.project_name:
-                project_set.add(session.project_name)
-            
-            # 统计工作类型
-            work_type = session.work_type
-            work_type_counter[work_type] = work_type_counter.get(work_type, 0) + 1
-        
         return {
-            'total_sessions': len(sessions),
-            'total_duration_hours': total_duration / 60.0,
-            'average_quality_score': total_quality / quality_count if quality_count > 0 else 0,
-            'technologies_used': sorted(tech_counter.items(), key=lambda x: x[1], reverse=True),
-            'projects_worked_on': list(project_set),
-            'work_types': work_type_counter
+            'total_sessions': stats['total_sessions'],
+            'total_duration_hours': stats['total_duration'] / 60.0,
+            'average_quality_score': (
+                stats['total_quality'] / stats['quality_count'] if stats['quality_count'] > 0 else 0
+            ),
+            'technologies_used': stats['technologies'].most_common(),
+            'projects_worked_on': list(stats['projects']),
+            'work_types': dict(stats['work_types'])
         }
     
     def get_last_analysis_time(self, user_id: int) -> Optional[datetime]:
@@ -197,11 +346,21 @@ class TechStackDataService:
         Returns:
             最后分析时间，如果没有则返回None
         """
-        last_summary = self.db.query(LearningProgressSummary).filter(
-            LearningProgressSummary.user_id == user_id
-        ).order_by(desc(LearningProgressSummary.generated_at)).first()
-        
-        return last_summary.period_end if last_summary else None
+        if user_id in self._last_analysis_cache:
+            return self._last_analysis_cache[user_id]
+        
+        # 本会话中有尚未提交的新总结时，进程级缓存中是旧值，直接查询且不写入缓存
+        pending = _summary_cache.has_pending_invalidation(self.db, user_id)
+        hit, last_time = (False, None) if pending else _summary_cache.last_analysis_time_cache.get(user_id)
+        if not hit:
+            last_time = self.db.query(LearningProgressSummary.period_end).filter(
+                LearningProgressSummary.user_id == user_id
+            ).order_by(desc(LearningProgressSummary.generated_at)).limit(1).scalar()
+            if not pending:
+                _summary_cache.last_analysis_time_cache.set(user_id, last_time)
+        
+        self._last_analysis_cache[user_id] = last_time
+        return last_time
     
     # ==================== 技术栈资产数据访问 ====================
     
@@ -232,6 +391,66 @@ class TechStackDataService:
         
         return query.order_by(desc(TechStackAsset.proficiency_score)).all()
     
+    def get_bulk_tech_stack_assets(
+        self, 
+        user_ids: List[int],
+        is_active: Optional[bool] = None
+    ) -> Dict[int, List[TechStackAsset]]:
+        """
+        批量获取多个用户的技术栈资产
+        
+        Args:
+            user_ids: 用户ID列表
+            is_active: 是否活跃过滤
+        
+        Returns:
+            用户ID到技术栈资产列表（按熟练度降序）的映射，没有资产的用户对应空列表
+        """
+        assets_by_user = {user_id: [] for user_id in user_ids}
+        
+        for chunk in _chunked(list(assets_by_user)):
+            query = self.db.query(TechStackAsset).filter(TechStackAsset.user_id.in_(chunk))
+            
+            if is_active is not None:
+                query = query.filter(TechStackAsset.is_active == is_active)
+            
+            for asset in query.order_by(desc(TechStackAsset.proficiency_score)):
+                assets_by_user[asset.user_id].append(asset)
+        
+        return assets_by_user
+    
+    def get_bulk_proficiency_summary(
+        self, 
+        user_ids: List[int],
+        is_active: Optional[bool] = True
+    ) -> Dict[int, Tuple[float, int]]:
+        """
+        批量获取多个用户的平均熟练度和资产数量（GROUP BY user_id，不加载资产对象）
+        
+        Args:
+            user_ids: 用户ID列表
+            is_active: 是否活跃过滤
+        
+        Returns:
+            用户ID到 (平均熟练度, 资产数量) 的映射，没有资产的用户对应 (0, 0)
+        """
+        summary = dict.fromkeys(user_ids, (0, 0))
+        
+        for chunk in _chunked(list(summary)):
+            query = self.db.query(
+                TechStackAsset.user_id,
+                func.avg(TechStackAsset.proficiency_score),
+                func.count(TechStackAsset.id)
+            ).filter(TechStackAsset.user_id.in_(chunk))
+            
+            if is_active is not None:
+                query = query.filter(TechStackAsset.is_active == is_active)
+            
+            for user_id, avg_proficiency, total_assets in query.group_by(TechStackAsset.user_id):
+                summary[user_id] = (avg_proficiency or 0, total_assets)
+        
+        return summary
+    
     def get_tech_stack_asset_by_name(
         self, 
         user_id: int, 
@@ -250,23 +469,53 @@ class TechStackDataService:
         return self.db.query(TechStackAsset).filter(
             and_(
                 TechStackAsset.user_id == user_id,
-                func.lower(TechStackAsset.technology_name) == technology_name.lower()
+                func.lower(TechStackAsset.technology_name) == normalize_technology_name(technology_name)
             )
         ).first()
     
-    def create_tech_stack_asset(self, asset_data: TechStackAssetCreate) -> TechStackAsset:
+    def get_tech_stack_assets_by_names(
+        self, 
+        user_id: int, 
+        technology_names: List[str]
+    ) -> Dict[str, TechStackAsset]:
+        """
+        根据多个技术名称批量获取技术栈资产（单次IN查询）
+        
+        Args:
+            user_id: 用户ID
+            technology_names: 技术名称列表
+        
+        Returns:
+            归一化技术名称（小写）到技术栈资产的映射，不存在的名称不在结果中
+        """
+        normalized_names = {normalize_technology_name(name) for name in technology_names if name}
+        if not normalized_names:
+            return {}
+        
+        rows = self.db.query(TechStackAsset).filter(
+            and_(
+                TechStackAsset.user_id == user_id,
+                func.lower(TechStackAsset.technology_name).in_(normalized_names)
+            )
+        ).all()
+        
+        return {normalize_technology_name(row.technology_name): row for row in rows}
+    
+    def create_tech_stack_asset(self, asset_data: TechStackAssetCreate, flush: bool = True) -> TechStackAsset:
         """
         创建技术栈资产
         
         Args:
             asset_data: 资产创建数据
+            flush: 是否立即刷新以获取ID，调用方不需要ID时可传False省去一次往返
         
         Returns:
             创建的技术栈资产
         """
-        asset = TechStackAsset(**asset_data.dict())
+        asset = TechStackAsset(**asset_data.model_dump())
         self.db.add(asset)
-        self.db.flush()  # 获取ID但不提交事务
+        if flush:
+            self.db.flush()  # 获取ID但不提交事务
         return asset
     
     def update_tech_stack_asset(
@@ -284,13 +533,52 @@ class TechStackDataService:
         Returns:
             更新后的技术栈资产
         """
-        update_dict = update_data.dict(exclude_unset=True)
-        for field, value in update_dict.items():
-            setattr(asset, field, value)
-        
-        asset.updated_at = datetime.utcnow()
+        update_dict = update_data.model_dump(exclude_unset=True)
+        if not update_dict:
+            return asset
+        
+        # 单条UPDATE语句写入，updated_at由列的onupdate自动维护
+        self.db.execute(
+            update(TechStackAsset)
+            .where(TechStackAsset.id == asset.id)
+            .values(**update_dict)
+            .execution_options(synchronize_session='evaluate')
+        )
         return asset
     
+    def bulk_update_tech_stack_assets(self, updates: List[Dict[str, Any]]) -> None:
+        """
+        按主键批量更新技术栈资产
+        
+        Args:
+            updates: 更新字典列表，每项需包含id
+        """
+        self.db.bulk_update_mappings(TechStackAsset, updates)
+    
+    def upsert_tech_stack_asset(self, asset_data: TechStackAssetCreate) -> int:
+        """
+        创建或更新技术栈资产（按用户ID + 技术名称，不区分大小写）
+        
+        Args:
+            asset_data: 资产数据
+        
+        Returns:
+            受影响的行数
+        """
+        return self.bulk_upsert_tech_stack_assets([asset_data.model_dump()])
+    
+    def bulk_upsert_tech_stack_assets(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量创建或更新技术栈资产，整批只执行一条 INSERT ... ON CONFLICT DO UPDATE
+        
+        Args:
+            rows: 资产字段字典列表，每行需包含相同的字段
+        
+        Returns:
+            受影响的行数
+        """
+        return self._bulk_upsert(TechStackAsset, rows)
+    
     def get_tech_stack_asset_statistics(self, user_id: int) -> Dict[str, Any]:
         """
         获取技术栈资产统计信息
@@ -301,9 +589,16 @@ class TechStackDataService:
         Returns:
             统计信息字典
         """
-        assets = self.get_tech_stack_assets(user_id)
+        user_filter = TechStackAsset.user_id == user_id
+        
+        # 总数、活跃数和平均熟练度在数据库端一次聚合完成
+        total_assets, active_assets, average_proficiency = self.db.query(
+            func.count(TechStackAsset.id),
+            func.count(TechStackAsset.id).filter(TechStackAsset.is_active == True),
+            func.avg(TechStackAsset.proficiency_score)
+        ).filter(user_filter).one()
         
-        if not assets:
+        if not total_assets:
             return {
                 'total_assets': 0,
                 'active_assets': 0,
@@ -313,36 +608,45 @@ class TechStackDataService:
                 'top_skills': []
             }
         
-        active_assets = [a for a in assets if a.is_active]
-        category_dist = {}
-        proficiency_dist = {'beginner': 0, 'intermediate': 0, 'advanced': 0, 'expert': 0}
+        # 分类分布
+        category_dist = dict(
+            self.db.query(TechStackAsset.category, func.count(TechStackAsset.id))
+            .filter(user_filter)
+            .group_by(TechStackAsset.category)
+            .all()
+        )
         
-        total_proficiency = 0
-        for asset in assets:
-            # 分类分布
-            category_dist[asset.category] = category_dist.get(asset.category, 0) + 1
-            
-            # 熟练度分布
-            proficiency_dist[asset.proficiency_level] += 1
-            
-            # 总熟练度
-            total_proficiency += asset.proficiency_score
+        # 熟练度分布
+        proficiency_dist = {'beginner': 0, 'intermediate': 0, 'advanced': 0, 'expert': 0}
+        proficiency_dist.update(
+            self.db.query(TechStackAsset.proficiency_level, func.count(TechStackAsset.id))
+            .filter(user_filter)
+            .group_by(TechStackAsset.proficiency_level)
+            .all()
+        )
         
-        # 排序获取顶级技能
-        top_skills = sorted(assets, key=lambda x: x.proficiency_score, reverse=True)[:10]
+        # 顶级技能直接由数据库排序并截取，只查询需要的列（返回元组，不创建ORM对象）
+        top_skills = self.db.query(
+            TechStackAsset.technology_name,
+            TechStackAsset.category,
+            TechStackAsset.proficiency_score,
+            TechStackAsset.proficiency_level
+        ).filter(user_filter).order_by(
+            desc(TechStackAsset.proficiency_score)
+        ).limit(10).all()
         
         return {
-            'total_assets': len(assets),
-            'active_assets': len(active_assets),
-            'average_proficiency': total_proficiency / len(assets),
+            'total_assets': total_assets,
+            'active_assets': active_assets,
+            'average_proficiency': average_proficiency or 0,
             'category_distribution': category_dist,
             'proficiency_distribution': proficiency_dist,
             'top_skills': [{
-                'name': skill.technology_name,
-                'category': skill.category,
-                'proficiency_score': skill.proficiency_score,
-                'proficiency_level': skill.proficiency_level
-            } for skill in top_skills]
+                'name': name,
+                'category': category,
+                'proficiency_score': proficiency_score,
+                'proficiency_level': proficiency_level
+            } for name, category, proficiency_score, proficiency_level in top_skills]
         }
     
     # ==================== 技术栈负债数据访问 ====================
@@ -366,7 +670,94 @@ class TechStackDataService:
         Returns:
             技术栈负债列表
         """
-        query = self.db.query(TechStackDebt).filter(TechStackDebt.user_id == user_id)
+        query = self._filter_tech_stack_debts(
+            self.db.query(TechStackDebt), user_id, status, urgency_level, is_active
+        )
+        
+        return query.order_by(desc(TechStackDebt.importance_score)).all()
+    
+    def iter_tech_stack_debts(
+        self, 
+        user_id: int,
+        status: Optional[str] = None,
+        urgency_level: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> Iterator[TechStackDebt]:
+        """
+        分批流式迭代用户的技术栈负债，参数同get_tech_stack_debts
+        
+        仅需遍历一次结果时使用，内存占用与批大小而非结果总量成正比
+        """
+        query = self._filter_tech_stack_debts(
+            self.db.query(TechStackDebt), user_id, status, urgency_level, is_active
+        )
+        
+        yield from query.order_by(desc(TechStackDebt.importance_score)).yield_per(200)
+    
+    def count_tech_stack_debts(
+        self, 
+        user_id: int,
+        status: Optional[str] = None,
+        urgency_level: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> int:
+        """
+        统计用户的技术栈负债数量（数据库端COUNT，不加载负债对象）
+        
+        Args:
+            user_id: 用户ID
+            status: 状态过滤
+            urgency_level: 紧急程度过滤
+            is_active: 是否活跃过滤
+        
+        Returns:
+            负债数量
+        """
+        query = self._filter_tech_stack_debts(
+            self.db.query(func.count(TechStackDebt.id)), user_id, status, urgency_level, is_active
+        )
+        
+        return query.scalar()
+    
+    def get_bulk_debt_counts(
+        self, 
+        user_ids: List[int],
+        is_active: Optional[bool] = None
+    ) -> Dict[int, int]:
+        """
+        批量统计多个用户的技术栈负债数量（GROUP BY user_id）
+        
+        Args:
+            user_ids: 用户ID列表
+            is_active: 是否活跃过滤
+        
+        Returns:
+            用户ID到负债数量的映射，没有负债的用户对应0
+        """
+        counts = dict.fromkeys(user_ids, 0)
+        
+        for chunk in _chunked(list(counts)):
+            query = self.db.query(TechStackDebt.user_id, func.count(TechStackDebt.id)).filter(
+                TechStackDebt.user_id.in_(chunk)
+            )
+            
+            if is_active is not None:
+                query = query.filter(TechStackDebt.is_active == is_active)
+            
+            counts.update(query.group_by(TechStackDebt.user_id).all())
+        
+        return counts
+    
+    def _filter_tech_stack_debts(
+        self, 
+        query,
+        user_id: int,
+        status: Optional[str],
+        urgency_level: Optional[str],
+        is_active: Optional[bool]
+    ):
+        """为负债查询附加通用过滤条件"""
+        query = query.filter(TechStackDebt.user_id == user_id)
         
         if status:
             query = query.filter(TechStackDebt.status == status)
@@ -377,7 +768,7 @@ class TechStackDataService:
         if is_active is not None:
             query = query.filter(TechStackDebt.is_active == is_active)
         
-        return query.order_by(desc(TechStackDebt.importance_score)).all()
+        return query
     
     def get_tech_stack_debt_by_name(
         self, 
@@ -397,23 +788,53 @@ class TechStackDataService:
         return self.db.query(TechStackDebt).filter(
             and_(
                 TechStackDebt.user_id == user_id,
-                func.lower(TechStackDebt.technology_name) == technology_name.lower()
+                func.lower(TechStackDebt.technology_name) == normalize_technology_name(technology_name)
             )
         ).first()
     
-    def create_tech_stack_debt(self, debt_data: TechStackDebtCreate) -> TechStackDebt:
+    def get_tech_stack_debts_by_names(
+        self, 
+        user_id: int, 
+        technology_names: List[str]
+    ) -> Dict[str, TechStackDebt]:
+        """
+        根据多个技术名称批量获取技术栈负债（单次IN查询）
+        
+        Args:
+            user_id: 用户ID
+            technology_names: 技术名称列表
+        
+        Returns:
+            归一化技术名称（小写）到技术栈负债的映射，不存在的名称不在结果中
+        """
+        normalized_names = {normalize_technology_name(name) for name in technology_names if name}
+        if not normalized_names:
+            return {}
+        
+        rows = self.db.query(TechStackDebt).filter(
+            and_(
+                TechStackDebt.user_id == user_id,
+                func.lower(TechStackDebt.technology_name).in_(normalized_names)
+            )
+        ).all()
+        
+        return {normalize_technology_name(row.technology_name): row for row in rows}
+    
+    def create_tech_stack_debt(self, debt_data: TechStackDebtCreate, flush: bool = True) -> TechStackDebt:
         """
         创建技术栈负债
         
         Args:
             debt_data: 负债创建数据
+            flush: 是否立即刷新以获取ID，调用方不需要ID时可传False省去一次往返
         
         Returns:
             创建的技术栈负债
         """
-        debt = TechStackDebt(**debt_data.dict())
+        debt = TechStackDebt(**debt_data.model_dump())
         self.db.add(debt)
-        self.db.flush()  # 获取ID但不提交事务
+        if flush:
+            self.db.flush()  # 获取ID但不提交事务
         return debt
     
     def update_tech_stack_debt(
@@ -431,13 +852,52 @@ class TechStackDataService:
         Returns:
             更新后的技术栈负债
         """
-        update_dict = update_data.dict(exclude_unset=True)
-        for field, value in update_dict.items():
-            setattr(debt, field, value)
-        
-        debt.updated_at = datetime.utcnow()
+        update_dict = update_data.model_dump(exclude_unset=True)
+        if not update_dict:
+            return debt
+        
+        # 单条UPDATE语句写入，updated_at由列的onupdate自动维护
+        self.db.execute(
+            update(TechStackDebt)
+            .where(TechStackDebt.id == debt.id)
+            .values(**update_dict)
+            .execution_options(synchronize_session='evaluate')
+        )
         return debt
     
+    def bulk_update_tech_stack_debts(self, updates: List[Dict[str, Any]]) -> None:
+        """
+        按主键批量更新技术栈负债
+        
+        Args:
+            updates: 更新字典列表，每项需包含id
+        """
+        self.db.bulk_update_mappings(TechStackDebt, updates)
+    
+    def upsert_tech_stack_debt(self, debt_data: TechStackDebtCreate) -> int:
+        """
+        创建或更新技术栈负债（按用户ID + 技术名称，不区分大小写）
+        
+        Args:
+            debt_data: 负债数据
+        
+        Returns:
+            受影响的行数
+        """
+        return self.bulk_upsert_tech_stack_debts([debt_data.model_dump()])
+    
+    def bulk_upsert_tech_stack_debts(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量创建或更新技术栈负债，整批只执行一条 INSERT ... ON CONFLICT DO UPDATE
+        
+        Args:
+            rows: 负债字段字典列表，每行需包含相同的字段
+        
+        Returns:
+            受影响的行数
+        """
+        return self._bulk_upsert(TechStackDebt, rows)
+    
     def get_high_priority_debts(self, user_id: int, limit: int = 10) -> List[TechStackDebt]:
         """
         获取高优先级技术栈负债
@@ -449,11 +909,14 @@ class TechStackDataService:
         Returns:
             高优先级负债列表
         """
+        # 状态值以字面量形式内联到SQL中，数据库才能判定命中 idx_tech_debt_active_open 部分索引
+        open_statuses = bindparam('open_statuses', list(OPEN_DEBT_STATUSES), literal_execute=True)
+        
         return self.db.query(TechStackDebt).filter(
             and_(
                 TechStackDebt.user_id == user_id,
                 TechStackDebt.is_active == True,
-                TechStackDebt.status.in_(['identified', 'planned', 'learning'])
+                TechStackDebt.status.in_(open_statuses)
             )
         ).order_by(
             desc(TechStackDebt.learning_priority),
@@ -479,6 +942,30 @@ class TechStackDataService:
         Returns:
             学习进度总结列表
         """
+        return self._learning_progress_summaries_query(user_id, report_period, limit).all()
+    
+    def iter_learning_progress_summaries(
+        self, 
+        user_id: int,
+        report_period: Optional[str] = None,
+        limit: int = 10
+    ) -> Iterator[LearningProgressSummary]:
+        """
+        分批流式迭代学习进度总结，参数同get_learning_progress_summaries
+        
+        仅需遍历一次结果时使用，内存占用与批大小而非结果总量成正比
+        """
+        yield from self._learning_progress_summaries_query(
+            user_id, report_period, limit
+        ).yield_per(200)
+    
+    def _learning_progress_summaries_query(
+        self, 
+        user_id: int,
+        report_period: Optional[str],
+        limit: int
+    ):
+        """构建学习进度总结查询"""
         query = self.db.query(LearningProgressSummary).filter(
             LearningProgressSummary.user_id == user_id
         )
@@ -486,24 +973,31 @@ class TechStackDataService:
         if report_period:
             query = query.filter(LearningProgressSummary.report_period == report_period)
         
-        return query.order_by(desc(LearningProgressSummary.generated_at)).limit(limit).all()
+        return query.order_by(desc(LearningProgressSummary.generated_at)).limit(limit)
     
     def create_learning_progress_summary(
         self, 
-        summary_data: LearningProgressSummaryCreate
+        summary_data: LearningProgressSummaryCreate,
+        flush: bool = True
     ) -> LearningProgressSummary:
         """
         创建学习进度总结
         
         Args:
             summary_data: 总结创建数据
+            flush: 是否立即刷新以获取ID，调用方不需要ID时可传False省去一次往返
         
         Returns:
             创建的学习进度总结
         """
-        summary = LearningProgressSummary(**summary_data.dict())
+        summary = LearningProgressSummary(**summary_data.model_dump())
         self.db.add(summary)
-        self.db.flush()  # 获取ID但不提交事务
+        if flush:
+            self.db.flush()  # 获取ID但不提交事务
+        # 进程级缓存在事务提交后才失效，本实例的缓存只对当前会话可见，立即失效
+        _summary_cache.invalidate_user_after_commit(self.db, summary.user_id)
+        self._last_analysis_cache.pop(summary.user_id, None)
+        self._latest_summary_cache.pop(summary.user_id, None)
         return summary
     
     def get_latest_progress_summary(self, user_id: int) -> Optional[LearningProgressSummary]:
@@ -516,27 +1010,72 @@ class TechStackDataService:
         Returns:
             最新的学习进度总结或None
         """
-        return self.db.query(LearningProgressSummary).filter(
-            LearningProgressSummary.user_id == user_id
-        ).order_by(desc(LearningProgressSummary.generated_at)).first()
+        if user_id in self._latest_summary_cache:
+            return self._latest_summary_cache[user_id]
+        
+        # 进程级缓存只保存主键，ORM对象始终从当前会话获取，避免跨会话共享实例；
+        # 本会话中有尚未提交的新总结时跳过进程级缓存
+        pending = _summary_cache.has_pending_invalidation(self.db, user_id)
+        hit, summary_id = (False, None) if pending else _summary_cache.latest_summary_id_cache.get(user_id)
+        if hit:
+            summary = self.db.get(LearningProgressSummary, summary_id) if summary_id else None
+        else:
+            summary = self.db.query(LearningProgressSummary).filter(
+                LearningProgressSummary.user_id == user_id
+            ).order_by(desc(LearningProgressSummary.generated_at)).first()
+            if not pending:
+                _summary_cache.latest_summary_id_cache.set(user_id, summary.id if summary else None)
+        
+        self._latest_summary_cache[user_id] = summary
+        return summary
     
     # ==================== 用户数据访问 ====================
     
-    def get_active_users_with_sessions(self, days: int = 7) -> List[User]:
+    def get_active_users_with_sessions(
+        self, 
+        days: int = 7,
+        load_relations: Tuple[str, ...] = ()
+    ) -> List[User]:
         """
         获取有活跃会话的用户
         
         Args:
             days: 天数范围
+            load_relations: 需要预加载的关系名称，如('mcp_sessions', 'tech_stack_assets')
         
         Returns:
             用户列表
         """
+        return self._active_users_query(days, load_relations).all()
+    
+    def iter_active_users_with_sessions(
+        self, 
+        days: int = 7,
+        chunk: int = 500,
+        load_relations: Tuple[str, ...] = ()
+    ) -> Iterator[User]:
+        """
+        分批流式迭代有活跃会话的用户，参数同get_active_users_with_sessions
+        
+        Args:
+            days: 天数范围
+            chunk: 每批读取的行数
+            load_relations: 需要预加载的关系名称
+        
+        Returns:
+            用户迭代器，内存占用与批大小而非用户总数成正比
+        """
+        yield from self._active_users_query(days, load_relations).yield_per(chunk)
+    
+    def _active_users_query(self, days: int, load_relations: Tuple[str, ...]):
+        """构建有活跃会话的用户查询"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
         return self.db.query(User).join(MCPSession).filter(
             MCPSession.created_at >= cutoff_date
-        ).distinct().all()
+        ).options(
+            *self._relation_loader_options(User, load_relations)
+        ).distinct()
     
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """
@@ -548,10 +1087,57 @@ class TechStackDataService:
         Returns:
             用户对象或None
         """
-        return self.db.query(User).filter(User.id == user_id).first()
+        if user_id not in self._user_cache:
+            self._user_cache[user_id] = self.db.query(User).filter(User.id == user_id).first()
+        return self._user_cache[user_id]
+    
+    # ==================== 批量写入 ====================
+    
+    def _bulk_upsert(self, model, rows: List[Dict[str, Any]]) -> int:
+        """
+        按 (user_id, lower(technology_name)) 唯一索引执行批量upsert
+        
+        注意：语句绕过ORM工作单元，会话中已加载的同名对象不会自动刷新
+        
+        Args:
+            model: TechStackAsset 或 TechStackDebt
+            rows: 字段字典列表
+        
+        Returns:
+            受影响的行数
+        """
+        if not rows:
+            return 0
+        
+        # 同一语句中冲突键重复会导致数据库报错，按冲突键去重（后者覆盖前者）；
+        # Core语句不经过模型的validates，这里同样去除名称首尾空白
+        unique_rows = {
+            (row['user_id'], normalize_technology_name(row['technology_name'])):
+                dict(row, technology_name=row['technology_name'].strip())
+            for row in rows
+        }
+        
+        stmt = upsert_insert(self.db)(model).values(list(unique_rows.values()))
+        immutable_fields = {'id', 'user_id', 'technology_name', 'created_at'}
+        update_fields = {
+            field: stmt.excluded[field] for field in rows[0] if field not in immutable_fields
+        }
+        update_fields['updated_at'] = datetime.utcnow()
+        
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.user_id, func.lower(model.technology_name)],
+            set_=update_fields
+        )
+        return self.db.execute(stmt).rowcount
     
     # ==================== 事务管理 ====================
     
+    def clear_cache(self) -> None:
+        """清空实例级查询缓存"""
+        self._user_cache.clear()
+        self._last_analysis_cache.clear()
+        self._latest_summary_cache.clear()
+    
     def commit(self):
         """提交事务"""
         try:
@@ -559,10 +1145,13 @@ class TechStackDataService:
         except SQLAlchemyError as e:
             self.db.rollback()
             raise e
+        finally:
+            self.clear_cache()
     
     def rollback(self):
         """回滚事务"""
         self.db.rollback()
+        self.clear_cache()
     
     def flush(self):
         """刷新会话"""
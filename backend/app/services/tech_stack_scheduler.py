@@ -4,19 +4,50 @@
 """
 
 import asyncio
+import functools
+import heapq
 import logging
+import time
+import types
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
-from sqlalchemy.orm import Session
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, JobExecutionEvent
+from sqlalchemy import text
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, engine
 from app.services.tech_stack_summary_agent import TechStackSummaryAgent
 from app.services.tech_stack_data_service import TechStackDataService
+from app.services._summary_cache import TTLCache
+
+
+# 活跃用户列表缓存时间（秒），时间相近的任务共享同一次查询结果
+ACTIVE_USERS_CACHE_TTL_SECONDS = 300
+
+# 保留的最近任务执行记录条数
+JOB_HISTORY_SIZE = 100
+
+# 耗时任务错过执行时间的宽限期（秒）
+HEAVY_JOB_MISFIRE_GRACE_SECONDS = 3600
+# 健康检查错过执行时间的宽限期（秒），过期的检查没有意义，直接跳过
+HEALTH_CHECK_MISFIRE_GRACE_SECONDS = 60
+# 健康检查的正常间隔（秒）
+HEALTH_CHECK_INTERVAL_SECONDS = 3600
+# 健康检查失败后改用的重试间隔（秒），恢复后回到正常间隔
+HEALTH_CHECK_RETRY_SECONDS = 60
+# 连续健康检查失败达到该次数后熔断，暂停耗时任务
+HEALTH_FAILURE_THRESHOLD = 3
+# 熔断后经过该时间（秒）进入半开状态，允许耗时任务重新尝试；
+# 故障期间每次重试失败都会重新计时，因此必须大于重试间隔，熔断才能在故障持续时保持打开
+CIRCUIT_RESET_SECONDS = 300
+# 周期任务触发时间的随机抖动（秒），避免多个任务在同一时刻集中访问数据库
+JOB_JITTER_SECONDS = 60
 
 
 class TechStackScheduler:
@@ -28,8 +59,11 @@ class TechStackScheduler:
     
     def __init__(self, config_path: str = "app/config/tech_stack_agent_config.yaml"):
         """初始化调度器"""
+        self._config_path = config_path
         self.agent = TechStackSummaryAgent(config_path)
         self.scheduler = None
+        # Agent分析专用线程池，在start()中创建
+        self._analysis_pool: Optional[ThreadPoolExecutor] = None
         self.logger = self._setup_logger()
         self.is_running = False
         self.job_stats = {
@@ -40,6 +74,17 @@ class TechStackScheduler:
             'last_run_status': None,
             'next_run_time': None
         }
+        # 最近的任务执行记录（定长，自动淘汰最旧记录）
+        self.job_history: deque = deque(maxlen=JOB_HISTORY_SIZE)
+        # 任务下次运行时间的最小堆 (next_run_time, job_id)，过期条目在读取堆顶时惰性删除
+        self._due_heap: List[Tuple[datetime, str]] = []
+        # 按天数缓存的活跃用户ID列表
+        self._active_users_cache = TTLCache(ACTIVE_USERS_CACHE_TTL_SECONDS)
+        # 健康检查熔断状态：连续失败次数、熔断开始时间（单调时钟）
+        self._health_failures = 0
+        self._circuit_opened_at: Optional[float] = None
+        # 进行中的手动分析：并发键 -> 结果Future，相同键的重复触发复用同一次运行的结果
+        self._inflight: Dict[str, asyncio.Future] = {}
     
     def _setup_logger(self) -> logging.Logger:
         """设置日志记录器"""
@@ -89,10 +134,19 @@ class TechStackScheduler:
         
         try:
             self.scheduler = self._create_scheduler()
+            self._analysis_pool = ThreadPoolExecutor(
+                max_workers=self.agent.config.get('schedule', {}).get('max_concurrent_analyses', 4),
+                thread_name_prefix='tech-stack-analysis'
+            )
             
             # 添加定时任务
             await self._add_scheduled_jobs()
             
+            # 任务执行后增量维护下次运行时间
+            self.scheduler.add_listener(
+                self._on_job_event, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+            )
+            
             # 启动调度器
             self.scheduler.start()
             self.is_running = True
@@ -100,6 +154,7 @@ class TechStackScheduler:
             self.logger.info("TechStack Scheduler started successfully")
             
             # 记录下次运行时间
+            self._seed_due_heap()
             self._update_next_run_time()
             
         except Exception as e:
@@ -117,6 +172,11 @@ class TechStackScheduler:
                 self.scheduler.shutdown(wait=True)
                 self.scheduler = None
             
+            if self._analysis_pool:
+                # 取消排队中的分析，正在执行的分析在后台完成
+                self._analysis_pool.shutdown(wait=False, cancel_futures=True)
+                self._analysis_pool = None
+            
             self.is_running = False
             self.logger.info("TechStack Scheduler stopped")
             
@@ -125,55 +185,59 @@ class TechStackScheduler:
     
     async def _add_scheduled_jobs(self):
         """添加定时任务"""
-        config = self.agent.config
+        schedule_config = self.agent.config.get('schedule', {})
         
         # 主要分析任务
-        analysis_interval = config.get('schedule', {}).get('analysis_interval_hours', 24)
+        analysis_interval = schedule_config.get('analysis_interval_hours', 24)
         self.scheduler.add_job(
             self._run_analysis_job,
-            trigger=IntervalTrigger(hours=analysis_interval),
+            trigger=IntervalTrigger(hours=analysis_interval, jitter=JOB_JITTER_SECONDS),
             id='tech_stack_analysis',
             name='Tech Stack Analysis',
             replace_existing=True
         )
         
         # 深度分析任务（如果配置了）
-        deep_analysis_interval = config.get('schedule', {}).get('deep_analysis_interval_days')
+        deep_analysis_interval = schedule_config.get('deep_analysis_interval_days')
         if deep_analysis_interval:
             self.scheduler.add_job(
                 self._run_deep_analysis_job,
-                trigger=IntervalTrigger(days=deep_analysis_interval),
+                trigger=IntervalTrigger(days=deep_analysis_interval, jitter=JOB_JITTER_SECONDS),
                 id='tech_stack_deep_analysis',
                 name='Tech Stack Deep Analysis',
+                misfire_grace_time=HEAVY_JOB_MISFIRE_GRACE_SECONDS,
                 replace_existing=True
             )
         
         # 月度总结任务
-        monthly_interval = config.get('schedule', {}).get('monthly_summary_interval_days', 30)
+        monthly_interval = schedule_config.get('monthly_summary_interval_days', 30)
         self.scheduler.add_job(
             self._run_monthly_summary_job,
-            trigger=IntervalTrigger(days=monthly_interval),
+            trigger=IntervalTrigger(days=monthly_interval, jitter=JOB_JITTER_SECONDS),
             id='tech_stack_monthly_summary',
             name='Tech Stack Monthly Summary',
+            misfire_grace_time=HEAVY_JOB_MISFIRE_GRACE_SECONDS,
             replace_existing=True
         )
         
         # 季度报告任务
-        quarterly_interval = config.get('schedule', {}).get('quarterly_report_interval_days', 90)
+        quarterly_interval = schedule_config.get('quarterly_report_interval_days', 90)
         self.scheduler.add_job(
             self._run_quarterly_report_job,
-            trigger=IntervalTrigger(days=quarterly_interval),
+            trigger=IntervalTrigger(days=quarterly_interval, jitter=JOB_JITTER_SECONDS),
             id='tech_stack_quarterly_report',
             name='Tech Stack Quarterly Report',
+            misfire_grace_time=HEAVY_JOB_MISFIRE_GRACE_SECONDS,
             replace_existing=True
         )
         
-        # 健康检查任务（每小时）
+        # 健康检查任务（正常每小时一次，失败期间按重试间隔检查）
         self.scheduler.add_job(
             self._health_check_job,
-            trigger=IntervalTrigger(hours=1),
+            trigger=IntervalTrigger(seconds=HEALTH_CHECK_INTERVAL_SECONDS),
             id='scheduler_health_check',
             name='Scheduler Health Check',
+            misfire_grace_time=HEALTH_CHECK_MISFIRE_GRACE_SECONDS,
             replace_existing=True
         )
         
@@ -195,8 +259,13 @@ class TechStackScheduler:
                 self.job_stats['last_run_status'] = 'skipped'
                 return
             
-            # 运行分析
-            result = self.agent.run_analysis()
+            if self._circuit_open():
+                self.logger.debug(f"{job_name} skipped - database circuit open")
+                self.job_stats['last_run_status'] = 'skipped'
+                return
+            
+            # 运行分析（在分析线程池中执行，避免同步数据库操作阻塞事件循环）
+            result = await self._run_agent_analysis()
             
             if result['status'] == 'completed':
                 self.job_stats['successful_runs'] += 1
@@ -219,140 +288,164 @@ class TechStackScheduler:
             self.logger.error(f"Error in {job_name}: {e}")
         
         finally:
-            self._update_next_run_time()
+            self._record_job_run(job_name, start_time, self.job_stats['last_run_status'])
     
     async def _run_deep_analysis_job(self):
         """运行深度分析任务"""
         job_name = "Tech Stack Deep Analysis"
         self.logger.info(f"Starting {job_name}")
         
+        start_time = datetime.utcnow()
+        run_status = 'error'
         try:
+            if self._circuit_open():
+                self.logger.debug(f"{job_name} skipped - database circuit open")
+                run_status = 'skipped'
+                return
+            
             # 深度分析可以包含更复杂的逻辑
             # 例如：分析技能趋势、市场需求变化等
             
             # 获取所有活跃用户
-            db = next(get_db())
-            data_service = TechStackDataService(db)
+            user_ids = await asyncio.to_thread(self._get_active_user_ids, 30)
             
-            try:
-                active_users = data_service.get_active_users_with_sessions(days=30)
-                
-                self.logger.info(f"Running deep analysis for {len(active_users)} active users")
-                
-                for user in active_users:
-                    # 为每个用户运行详细分析
-                    result = self.agent.run_analysis(user_id=user.id)
-                    
-                    if result['status'] != 'completed':
-                        self.logger.warning(
-                            f"Deep analysis failed for user {user.id}: {result.get('message')}"
-                        )
-                
-                self.logger.info(f"{job_name} completed for {len(active_users)} users")
+            self.logger.info(f"Running deep analysis for {len(user_ids)} active users")
             
-            finally:
-                db.close()
+            # 每个用户的分析提交到分析线程池（各自使用独立的数据库会话），
+            # 并发数由线程池大小（schedule.max_concurrent_analyses）限制
+            results = await asyncio.gather(
+                *(self._run_agent_analysis(user_id) for user_id in user_ids),
+                return_exceptions=True
+            )
+            
+            for user_id, result in zip(user_ids, results):
+                if isinstance(result, Exception):
+                    self.logger.warning(f"Deep analysis failed for user {user_id}: {result}")
+                elif result['status'] != 'completed':
+                    self.logger.warning(
+                        f"Deep analysis failed for user {user_id}: {result.get('message')}"
+                    )
+            
+            self.logger.info(f"{job_name} completed for {len(user_ids)} users")
+            run_status = 'success'
         
         except Exception as e:
             self.logger.error(f"Error in {job_name}: {e}")
+        
+        finally:
+            self._record_job_run(job_name, start_time, run_status)
     
     async def _run_monthly_summary_job(self):
         """运行月度总结任务"""
         job_name = "Tech Stack Monthly Summary"
         self.logger.info(f"Starting {job_name}")
         
+        start_time = datetime.utcnow()
+        run_status = 'error'
         try:
+            if self._circuit_open():
+                self.logger.debug(f"{job_name} skipped - database circuit open")
+                run_status = 'skipped'
+                return
+            
             # 生成月度总结报告
             # 这里可以实现更复杂的报告生成逻辑
+            monthly_stats = await asyncio.to_thread(self._collect_monthly_stats)
             
-            db = next(get_db())
-            data_service = TechStackDataService(db)
-            
-            try:
-                active_users = data_service.get_active_users_with_sessions(days=30)
-                
-                monthly_stats = {
-                    'period': datetime.utcnow().strftime('%Y-%m'),
-                    'active_users': len(active_users),
-                    'total_sessions': 0,
-                    'total_learning_hours': 0,
-                    'top_technologies': {},
-                    'generated_at': datetime.utcnow().isoformat()
-                }
-                
-                for user in active_users:
-                    user_stats = data_service.get_mcp_session_statistics(user.id)
-                    monthly_stats['total_sessions'] += user_stats['total_sessions']
-                    monthly_stats['total_learning_hours'] += user_stats['total_duration_hours']
-                    
-                    # 统计技术使用情况
-                    for tech, count in user_stats['technologies_used']:
-                        if tech in monthly_stats['top_technologies']:
-                            monthly_stats['top_technologies'][tech] += count
-                        else:
-                            monthly_stats['top_technologies'][tech] = count
-                
-                self.logger.info(
-                    f"{job_name} completed. "
-                    f"Active users: {monthly_stats['active_users']}, "
-                    f"Total sessions: {monthly_stats['total_sessions']}, "
-                    f"Learning hours: {monthly_stats['total_learning_hours']:.1f}"
-                )
-            
-            finally:
-                db.close()
+            self.logger.info(
+                f"{job_name} completed. "
+                f"Active users: {monthly_stats['active_users']}, "
+                f"Total sessions: {monthly_stats['total_sessions']}, "
+                f"Learning hours: {monthly_stats['total_learning_hours']:.1f}"
+            )
+            run_status = 'success'
         
         except Exception as e:
             self.logger.error(f"Error in {job_name}: {e}")
+        
+        finally:
+            self._record_job_run(job_name, start_time, run_status)
+    
+    def _collect_monthly_stats(self) -> Dict[str, Any]:
+        """汇总月度统计数据（同步数据库操作，在线程中执行）"""
+        with self._data_service() as data_service:
+            user_ids = self._active_user_ids(data_service, 30)
+            all_user_stats = list(data_service.get_bulk_mcp_session_statistics(user_ids).values())
+        
+        # 统计技术使用情况
+        top_technologies = Counter()
+        for user_stats in all_user_stats:
+            top_technologies.update(dict(user_stats['technologies_used']))
+        
+        now = datetime.utcnow()
+        return {
+            'period': now.strftime('%Y-%m'),
+            'active_users': len(user_ids),
+            'total_sessions': sum(stats['total_sessions'] for stats in all_user_stats),
+            'total_learning_hours': sum(stats['total_duration_hours'] for stats in all_user_stats),
+            'top_technologies': dict(top_technologies),
+            'generated_at': now.isoformat()
+        }
     
     async def _run_quarterly_report_job(self):
         """运行季度报告任务"""
         job_name = "Tech Stack Quarterly Report"
         self.logger.info(f"Starting {job_name}")
         
+        start_time = datetime.utcnow()
+        run_status = 'error'
         try:
+            if self._circuit_open():
+                self.logger.debug(f"{job_name} skipped - database circuit open")
+                run_status = 'skipped'
+                return
+            
             # 生成季度报告
             # 包含更长期的趋势分析
+            quarterly_stats = await asyncio.to_thread(self._collect_quarterly_stats)
             
-            db = next(get_db())
-            data_service = TechStackDataService(db)
+            self.logger.info(
+                f"{job_name} completed for {quarterly_stats['active_users']} users"
+            )
+            run_status = 'success'
+        
+        except Exception as e:
+            self.logger.error(f"Error in {job_name}: {e}")
+        
+        finally:
+            self._record_job_run(job_name, start_time, run_status)
+    
+    def _collect_quarterly_stats(self) -> Dict[str, Any]:
+        """汇总季度统计数据（同步数据库操作，在线程中执行）"""
+        with self._data_service() as data_service:
+            user_ids = self._active_user_ids(data_service, 90)
+            
+            # 只取一次当前时间，避免跨季度边界时季度号与年份不一致
+            now = datetime.utcnow()
+            quarterly_stats = {
+                'period': f"Q{(now.month - 1) // 3 + 1}-{now.year}",
+                'active_users': len(user_ids),
+                'skill_growth_trends': {},
+                'technology_adoption': {},
+                'learning_velocity': {},
+                'generated_at': now.isoformat()
+            }
             
-            try:
-                active_users = data_service.get_active_users_with_sessions(days=90)
+            # 技能增长（平均熟练度、资产数量）和负债数量均由数据库聚合
+            proficiency_summary = data_service.get_bulk_proficiency_summary(user_ids, is_active=True)
+            debt_counts = data_service.get_bulk_debt_counts(user_ids, is_active=True)
+            
+            # 分析每个用户的季度进展
+            for user_id in user_ids:
+                avg_proficiency, total_assets = proficiency_summary[user_id]
                 
-                quarterly_stats = {
-                    'period': f"Q{(datetime.utcnow().month - 1) // 3 + 1}-{datetime.utcnow().year}",
-                    'active_users': len(active_users),
-                    'skill_growth_trends': {},
-                    'technology_adoption': {},
-                    'learning_velocity': {},
-                    'generated_at': datetime.utcnow().isoformat()
+                quarterly_stats['skill_growth_trends'][user_id] = {
+                    'avg_proficiency': avg_proficiency,
+                    'total_assets': total_assets,
+                    'active_debts': debt_counts[user_id]
                 }
-                
-                # 分析每个用户的季度进展
-                for user in active_users:
-                    assets = data_service.get_tech_stack_assets(user.id, is_active=True)
-                    debts = data_service.get_tech_stack_debts(user.id, is_active=True)
-                    
-                    # 计算技能增长
-                    total_proficiency = sum(asset.proficiency_score for asset in assets)
-                    avg_proficiency = total_proficiency / len(assets) if assets else 0
-                    
-                    quarterly_stats['skill_growth_trends'][user.id] = {
-                        'avg_proficiency': avg_proficiency,
-                        'total_assets': len(assets),
-                        'active_debts': len(debts)
-                    }
-                
-                self.logger.info(
-                    f"{job_name} completed for {len(active_users)} users"
-                )
             
-            finally:
-                db.close()
-        
-        except Exception as e:
-            self.logger.error(f"Error in {job_name}: {e}")
+            return quarterly_stats
     
     async def _health_check_job(self):
         """健康检查任务"""
@@ -364,49 +457,160 @@ class TechStackScheduler:
                 self.logger.warning("TechStack Agent is disabled")
             
             # 检查数据库连接
-            db = next(get_db())
-            try:
-                # 简单的数据库查询测试
-                data_service = TechStackDataService(db)
-                active_users = data_service.get_active_users_with_sessions(days=1)
-                
-                self.logger.debug(
-                    f"Health check passed. Agent enabled: {status['enabled']}, "
-                    f"Active users (24h): {len(active_users)}"
-                )
-            finally:
-                db.close()
+            await asyncio.to_thread(self._ping_database)
         
         except Exception as e:
-            self.logger.error(f"Health check failed: {e}")
+            self._health_failures += 1
+            # 只在状态变化时输出告警，避免持续故障期间刷屏
+            if self._health_failures == 1:
+                self.logger.warning(f"Health check failed: {e}")
+            elif self._health_failures == HEALTH_FAILURE_THRESHOLD:
+                self.logger.error(
+                    f"Health check failed {self._health_failures} times in a row, "
+                    f"pausing heavy jobs: {e}"
+                )
+            else:
+                self.logger.debug(f"Health check failed ({self._health_failures}): {e}")
+            if self._health_failures >= HEALTH_FAILURE_THRESHOLD:
+                self._circuit_opened_at = time.monotonic()
+            if self._health_failures == 1:
+                # 失败期间缩短检查间隔，使熔断能在几分钟内打开，并在故障持续时保持打开
+                self._set_health_check_interval(HEALTH_CHECK_RETRY_SECONDS)
+            return
+        
+        if self._circuit_opened_at is not None:
+            self.logger.info("Health check recovered, resuming heavy jobs")
+        if self._health_failures:
+            self._set_health_check_interval(HEALTH_CHECK_INTERVAL_SECONDS)
+        self._health_failures = 0
+        self._circuit_opened_at = None
+        self.logger.debug(f"Health check passed. Agent enabled: {status['enabled']}")
+    
+    def _set_health_check_interval(self, seconds: int):
+        """调整健康检查任务的执行间隔（调度器未启动时忽略）"""
+        if self.scheduler and self.scheduler.get_job('scheduler_health_check'):
+            self.scheduler.reschedule_job(
+                'scheduler_health_check', trigger=IntervalTrigger(seconds=seconds)
+            )
+    
+    def _ping_database(self):
+        """执行 SELECT 1 检查数据库连接"""
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    
+    def _circuit_open(self) -> bool:
+        """熔断是否生效（熔断超过CIRCUIT_RESET_SECONDS后进入半开状态，允许任务重新尝试）"""
+        if self._circuit_opened_at is None:
+            return False
+        return time.monotonic() - self._circuit_opened_at < CIRCUIT_RESET_SECONDS
+    
+    async def _run_agent_analysis(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        在分析线程池中运行Agent分析（调度器未启动时使用事件循环的默认线程池）
+        
+        分析在池内线程中逐个用户执行，不再另开线程池，总线程数以 schedule.max_concurrent_analyses 为上限
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._analysis_pool, functools.partial(self.agent.run_analysis, user_id=user_id, parallel=False)
+        )
+    
+    def _record_job_run(self, job_name: str, start_time: datetime, status: Optional[str]):
+        """记录一次任务执行"""
+        self.job_history.append({
+            'job': job_name,
+            'start': start_time,
+            'duration_s': (datetime.utcnow() - start_time).total_seconds(),
+            'status': status
+        })
+    
+    def _data_service(self) -> TechStackDataService:
+        """创建任务使用的数据服务（同一任务内的所有查询共用一个会话）"""
+        return TechStackDataService(SessionLocal())
+    
+    def _active_user_ids(self, data_service: TechStackDataService, days: int) -> List[int]:
+        """获取最近有会话的用户ID，短时间内的重复调用复用缓存结果"""
+        hit, user_ids = self._active_users_cache.get(days)
+        if hit:
+            return user_ids
+        
+        # 流式读取用户，只保留ID，不在内存中累积完整的用户对象
+        user_ids = [user.id for user in data_service.iter_active_users_with_sessions(days=days)]
+        self._active_users_cache.set(days, user_ids)
+        return user_ids
+    
+    def _get_active_user_ids(self, days: int) -> List[int]:
+        """获取最近有会话的用户ID（同步数据库操作，在线程中执行）"""
+        with self._data_service() as data_service:
+            return self._active_user_ids(data_service, days)
+    
+    def _on_job_event(self, event: JobExecutionEvent):
+        """任务执行（或错过）后将其新的下次运行时间入堆，并更新最近的下次运行时间"""
+        job = self.scheduler.get_job(event.job_id) if self.scheduler else None
+        if job and job.next_run_time:
+            heapq.heappush(self._due_heap, (job.next_run_time, job.id))
+        self._update_next_run_time()
+    
+    def _seed_due_heap(self):
+        """根据当前全部任务重建下次运行时间堆（启动和重新调度时执行一次）"""
+        self._due_heap = [
+            (job.next_run_time, job.id) for job in self.scheduler.get_jobs() if job.next_run_time
+        ]
+        heapq.heapify(self._due_heap)
     
     def _update_next_run_time(self):
         """更新下次运行时间"""
         try:
             if self.scheduler:
-                jobs = self.scheduler.get_jobs()
-                if jobs:
-                    # 找到最近的下次运行时间
-                    next_times = [job.next_run_time for job in jobs if job.next_run_time]
-                    if next_times:
-                        self.job_stats['next_run_time'] = min(next_times)
+                # 堆顶与任务当前的下次运行时间不一致（已执行、已删除或已修改）时弹出
+                while self._due_heap:
+                    next_run_time, job_id = self._due_heap[0]
+                    job = self.scheduler.get_job(job_id)
+                    if job and job.next_run_time == next_run_time:
+                        self.job_stats['next_run_time'] = next_run_time
+                        return
+                    heapq.heappop(self._due_heap)
         except Exception as e:
             self.logger.error(f"Error updating next run time: {e}")
     
     async def trigger_manual_analysis(self, user_id: Optional[int] = None) -> Dict[str, Any]:
-        """手动触发分析"""
+        """手动触发分析（同一用户已有分析在运行时直接等待并返回其结果）"""
+        key = f"analysis:{user_id or 'all'}"
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.logger.debug(f"Manual analysis for {key} already running, joining it")
+            return await asyncio.shield(inflight)
+        
         self.logger.info(f"Manual analysis triggered for user_id: {user_id}")
         
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            result = self.agent.run_analysis(user_id=user_id)
+            result = await self._run_agent_analysis(user_id)
             self.logger.info(f"Manual analysis completed: {result['status']}")
-            return result
         except Exception as e:
             self.logger.error(f"Manual analysis failed: {e}")
-            return {'status': 'error', 'message': str(e)}
+            result = {'status': 'error', 'message': str(e)}
+        except BaseException:
+            # 发起方被取消时同时取消等待中的重复触发
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        
+        future.set_result(result)
+        return result
     
-    def get_scheduler_status(self) -> Dict[str, Any]:
-        """获取调度器状态"""
+    def get_scheduler_status(self, include_history: bool = False) -> Dict[str, Any]:
+        """
+        获取调度器状态
+        
+        Args:
+            include_history: 是否包含最近的任务执行记录
+        
+        Returns:
+            调度器状态信息，job_stats为只读视图
+        """
         jobs_info = []
         
         if self.scheduler:
@@ -418,13 +622,18 @@ class TechStackScheduler:
                     'trigger': str(job.trigger)
                 })
         
-        return {
+        status_info = {
             'is_running': self.is_running,
             'agent_enabled': self.agent.is_enabled(),
-            'job_stats': self.job_stats.copy(),
+            'job_stats': types.MappingProxyType(self.job_stats),
             'scheduled_jobs': jobs_info,
             'scheduler_state': self.scheduler.state if self.scheduler else None
         }
+        
+        if include_history:
+            status_info['job_history'] = tuple(self.job_history)
+        
+        return status_info
     
     async def reschedule_jobs(self):
         """重新调度任务（重新加载配置）"""
@@ -434,7 +643,8 @@ class TechStackScheduler:
         
         try:
             # 重新加载Agent配置
-            self.agent = TechStackSummaryAgent()
+            self.agent = TechStackSummaryAgent(self._config_path)
+            self._active_users_cache.invalidate()
             
             # 移除现有任务
             for job in self.scheduler.get_jobs():
@@ -444,6 +654,7 @@ class TechStackScheduler:
             await self._add_scheduled_jobs()
             
             self.logger.info("Jobs rescheduled successfully")
+            self._seed_due_heap()
             self._update_next_run_time()
             
         except Exception as e:
@@ -464,7 +675,11 @@ def get_scheduler() -> TechStackScheduler:
 
 
 async def start_scheduler():
-    """启动全局调度器"""
+    """
+    启动全局调度器
+    
+    调度器运行在应用所在的事件循环中，事件循环实现（如uvloop）由进程入口（uvicorn --loop）决定
+    """
     scheduler = get_scheduler()
     await scheduler.start()
 
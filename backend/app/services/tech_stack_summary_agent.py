@@ -4,17 +4,24 @@
 负责分析MCP会话数据并更新学习进度
 """
 
+import copy
+import os
+import types
 import yaml
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import Row, and_, case, or_, func, insert, select
 
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal, upsert_insert
 from app.models.mcp_session import MCPSession, MCPCodeSnippet
 from app.models.learning_progress import TechStackAsset, TechStackDebt, LearningProgressSummary
 from app.models.user import User
+from app.services import _summary_cache
 from app.schemas.learning_progress import (
     TechStackAssetCreate, TechStackAssetUpdate,
     TechStackDebtCreate, TechStackDebtUpdate,
@@ -22,6 +29,51 @@ from app.schemas.learning_progress import (
 )
 
 
+# 熟练度级别阈值，按分数从高到低排列；低于全部阈值为beginner
+_PROFICIENCY_LEVEL_THRESHOLDS = ((80, "expert"), (60, "advanced"), (30, "intermediate"))
+
+# 相关技术栈映射，键为小写技术名
+_RELATED_MAP = types.MappingProxyType({k.lower(): v for k, v in {
+    'React': ('JavaScript', 'HTML', 'CSS', 'Node.js'),
+    'Vue.js': ('JavaScript', 'HTML', 'CSS'),
+    'Django': ('Python', 'HTML', 'CSS', 'SQL'),
+    'Flask': ('Python', 'HTML', 'CSS'),
+    'Spring Boot': ('Java', 'SQL', 'Maven'),
+    'Express.js': ('Node.js', 'JavaScript'),
+}.items()})
+
+# 技术分类映射，键为小写技术名
+_CATEGORY_MAP = types.MappingProxyType({k.lower(): v for k, v in {
+    'JavaScript': 'programming_language',
+    'Python': 'programming_language',
+    'Java': 'programming_language',
+    'HTML': 'markup_language',
+    'CSS': 'stylesheet_language',
+    'SQL': 'query_language',
+    'Node.js': 'runtime',
+    'Maven': 'build_tool',
+}.items()})
+
+
+@lru_cache(maxsize=1024)
+def _related_technologies(tech_name: str) -> Tuple[str, ...]:
+    """获取相关技术栈（不区分大小写），结果按技术名缓存"""
+    return _RELATED_MAP.get(tech_name.lower(), ())
+
+
+@lru_cache(maxsize=1024)
+def _tech_category(tech_name: str) -> str:
+    """确定技术分类（不区分大小写），结果按技术名缓存"""
+    return _CATEGORY_MAP.get(tech_name.lower(), 'general')
+
+
+@lru_cache(maxsize=8)
+def _read_config_file(config_path: str, mtime: float) -> Dict[str, Any]:
+    """解析YAML配置文件，按 (路径, 修改时间) 缓存，文件被修改后自动重新解析"""
+    with open(config_path, 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
 class TechStackSummaryAgent:
     """
     技术栈总结Agent
@@ -37,13 +89,23 @@ class TechStackSummaryAgent:
         """初始化Agent"""
         self.config = self._load_config(config_path)
         self.logger = self._setup_logger()
+        
+        # 分析过程中反复使用的配置子项，只在初始化时取一次
+        analysis_config = self.config.get('analysis', {})
+        self._weights = analysis_config.get('tech_stack_weights', {})
+        scoring = analysis_config.get('proficiency_scoring', {})
+        self._base_score = scoring.get('base_score', 10.0)
+        self._duration_weight = scoring.get('duration_weight', 0.3)
+        self._complexity_weight = scoring.get('complexity_weight', 0.4)
+        self._quality_weight = scoring.get('quality_weight', 0.3)
+        self._max_increment = scoring.get('max_single_increment', 5.0)
         self.last_analysis_time = None
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file)
+            # 返回副本，避免各Agent实例共享缓存中的同一个字典
+            return copy.deepcopy(_read_config_file(config_path, os.path.getmtime(config_path)))
         except FileNotFoundError:
             # 使用默认配置
             return {
@@ -100,8 +162,15 @@ class TechStackSummaryAgent:
         
         return time_since_last >= timedelta(hours=interval_hours)
     
-    def run_analysis(self, user_id: Optional[int] = None) -> Dict[str, Any]:
-        """运行技术栈分析"""
+    def run_analysis(self, user_id: Optional[int] = None, parallel: bool = True) -> Dict[str, Any]:
+        """
+        运行技术栈分析
+        
+        Args:
+            user_id: 只分析指定用户，为空时分析所有近期活跃的用户
+            parallel: 多个用户时是否在独立线程池中并行分析；调用方自身已在线程池中运行时传False，
+                在当前线程逐个分析，避免线程池嵌套使线程数成倍增长
+        """
         if not self.is_enabled():
             self.logger.warning("TechStackSummaryAgent is disabled")
             return {'status': 'disabled', 'message': 'Agent is disabled'}
@@ -113,11 +182,18 @@ class TechStackSummaryAgent:
             
             # 获取需要分析的用户列表
             users_to_analyze = self._get_users_to_analyze(db, user_id)
+            user_ids = [user.id for user in users_to_analyze]
             
-            results = []
-            for user in users_to_analyze:
-                user_result = self._analyze_user_sessions(db, user.id)
-                results.append(user_result)
+            # 各用户的分析互不依赖，多个用户时在线程池中并行执行，每个线程使用独立的数据库会话
+            max_workers = min(
+                self.config.get('performance', {}).get('max_concurrent_processes', 4),
+                len(user_ids)
+            )
+            if parallel and max_workers > 1:
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tech-stack-analysis') as executor:
+                    results = list(executor.map(self._analyze_user_in_new_session, user_ids))
+            else:
+                results = [self._analyze_user_in_new_session(uid) for uid in user_ids]
             
             self.last_analysis_time = datetime.utcnow()
             
@@ -140,6 +216,17 @@ class TechStackSummaryAgent:
         finally:
             db.close()
     
+    def _analyze_user_in_new_session(self, user_id: int) -> Dict[str, Any]:
+        """在独立的数据库会话中分析单个用户，供并行分析使用"""
+        db = SessionLocal()
+        try:
+            return self._analyze_user_sessions(db, user_id)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
     def _get_users_to_analyze(self, db: Session, user_id: Optional[int] = None) -> List[User]:
         """获取需要分析的用户列表"""
         if user_id:
@@ -155,11 +242,17 @@ class TechStackSummaryAgent:
         """分析单个用户的会话数据"""
         self.logger.info(f"Analyzing sessions for user {user_id}")
         
+        # 本次分析统一使用同一个时间戳
+        now = datetime.utcnow()
+        
         # 获取最近的会话数据
         cutoff_time = self._get_analysis_cutoff_time(db, user_id)
         sessions = self._get_recent_sessions(db, user_id, cutoff_time)
         
-        if not sessions:
+        # 分析技术栈使用情况（流式消费会话，只遍历一次）
+        tech_usage, session_stats = self._analyze_technology_usage(sessions)
+        
+        if not session_stats['session_count']:
             self.logger.info(f"No new sessions found for user {user_id}")
             return {
                 'user_id': user_id,
@@ -168,23 +261,23 @@ class TechStackSummaryAgent:
                 'debts_identified': 0
             }
         
-        # 分析技术栈使用情况
-        tech_usage = self._analyze_technology_usage(sessions)
-        
-        # 更新技术栈资产
-        assets_updated = self._update_tech_stack_assets(db, user_id, tech_usage)
-        
-        # 识别技术栈负债
-        debts_identified = self._identify_tech_stack_debts(db, user_id, tech_usage)
-        
-        # 生成学习进度总结
-        self._generate_progress_summary(db, user_id, sessions, tech_usage)
+        # 写入期间关闭autoflush，待提交的变更只在commit时统一flush一次
+        with db.no_autoflush:
+            # 更新技术栈资产
+            assets_updated = self._update_tech_stack_assets(db, user_id, tech_usage, now)
+            
+            # 识别技术栈负债
+            debts_identified = self._identify_tech_stack_debts(db, user_id, tech_usage)
+            
+            # 生成学习进度总结
+            self._generate_progress_summary(db, user_id, session_stats, now)
         
         db.commit()
+        _summary_cache.invalidate_user(user_id)
         
         return {
             'user_id': user_id,
-            'sessions_processed': len(sessions),
+            'sessions_processed': session_stats['session_count'],
             'assets_updated': assets_updated,
             'debts_identified': debts_identified,
             'technologies_analyzed': len(tech_usage)
@@ -203,12 +296,28 @@ class TechStackSummaryAgent:
             # 如果没有历史记录，分析最近30天的数据
             return datetime.utcnow() - timedelta(days=30)
     
-    def _get_recent_sessions(self, db: Session, user_id: int, cutoff_time: datetime) -> List[MCPSession]:
-        """获取最近的会话数据"""
+    def _get_recent_sessions(self, db: Session, user_id: int, cutoff_time: datetime) -> Iterator[Row]:
+        """
+        分批流式迭代最近的会话数据，内存占用与批大小而非会话总数成正比
+        
+        只查询分析所需的列并返回Core行（可按属性访问），不构造ORM对象
+        """
         max_sessions = self.config.get('data_processing', {}).get('max_sessions_per_batch', 100)
         min_duration = self.config.get('data_processing', {}).get('min_session_duration_minutes', 5)
         
-        return db.query(MCPSession).filter(
+        stmt = select(
+            MCPSession.id,
+            MCPSession.created_at,
+            MCPSession.primary_language,
+            MCPSession.technologies,
+            MCPSession.frameworks,
+            MCPSession.libraries,
+            MCPSession.tools,
+            MCPSession.actual_duration,
+            MCPSession.complexity_score,
+            MCPSession.code_quality_score,
+            MCPSession.project_name
+        ).where(
             and_(
                 MCPSession.user_id == user_id,
                 MCPSession.created_at > cutoff_time,
@@ -218,157 +327,199 @@ class TechStackSummaryAgent:
                     MCPSession.actual_duration.is_(None)
                 )
             )
-        ).order_by(MCPSession.created_at.desc()).limit(max_sessions).all()
+        ).order_by(MCPSession.created_at.desc()).limit(max_sessions)
+        
+        yield from db.execute(stmt.execution_options(yield_per=200))
     
-    def _analyze_technology_usage(self, sessions: List[MCPSession]) -> Dict[str, Dict[str, Any]]:
-        """分析技术栈使用情况"""
-        tech_usage = {}
+    def _analyze_technology_usage(self, sessions: Iterable[Row]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        分析技术栈使用情况
+        
+        Args:
+            sessions: 会话数据，按属性访问所需列（Core行或MCPSession对象均可）
+        
+        Returns:
+            (按小写技术名索引的使用情况, 会话汇总统计)，汇总统计在同一次遍历中得到，供学习进度总结使用
+        """
+        tech_usage = defaultdict(lambda: {
+            'name': None,
+            'category': None,
+            'usage_count': 0,
+            'total_duration': 0,
+            'total_complexity': 0,
+            'total_quality': 0,
+            'sessions': [],
+            'projects': set()
+        })
+        session_stats = {
+            'session_count': 0,
+            'min_created_at': None,
+            'total_duration': 0,
+            'project_names': set(),
+            'new_assets_acquired': 0
+        }
         
         for session in sessions:
-            # 分析主要技术栈
-            technologies = session.technologies or []
-            if session.primary_language:
-                technologies.append(session.primary_language)
+            # 会话级的数值只取一次，供该会话涉及的所有技术累加
+            duration = session.actual_duration or 0
+            complexity = session.complexity_score or 0
+            quality = session.code_quality_score or 0
             
-            frameworks = session.frameworks or []
-            libraries = session.libraries or []
-            tools = session.tools or []
-            
-            # 合并所有技术栈
-            all_techs = {
-                'programming_language': [session.primary_language] if session.primary_language else [],
-                'framework': frameworks,
-                'library': libraries,
-                'tool': tools,
-                'general': [t for t in technologies if t not in frameworks + libraries + tools]
-            }
+            session_stats['session_count'] += 1
+            session_stats['total_duration'] += duration
+            if session_stats['min_created_at'] is None or session.created_at < session_stats['min_created_at']:
+                session_stats['min_created_at'] = session.created_at
+            if session.project_name:
+                session_stats['project_names'].add(session.project_name)
             
-            for category, tech_list in all_techs.items():
-                for tech in tech_list:
-                    if not tech:
-                        continue
-                    
-                    tech_key = tech.lower().strip()
-                    if tech_key not in tech_usage:
-                        tech_usage[tech_key] = {
-                            'name': tech,
-                            'category': category,
-                            'usage_count': 0,
-                            'total_duration': 0,
-                            'total_complexity': 0,
-                            'total_quality': 0,
-                            'sessions': [],
-                            'projects': set()
-                        }
-                    
-                    usage = tech_usage[tech_key]
-                    usage['usage_count'] += 1
-                    usage['total_duration'] += session.actual_duration or 0
-                    usage['total_complexity'] += session.complexity_score or 0
-                    usage['total_quality'] += session.code_quality_score or 0
-                    usage['sessions'].append(session.id)
-                    
-                    if session.project_name:
-                        usage['projects'].add(session.project_name)
-        
-        # 计算平均值
-        for tech_key, usage in tech_usage.items():
+            for category, tech in self._iter_session_technologies(session):
+                usage = tech_usage[tech.lower().strip()]
+                if usage['name'] is None:
+                    # 以首次出现时的名称和分类为准
+                    usage['name'] = tech
+                    usage['category'] = category
+                
+                usage['usage_count'] += 1
+                usage['total_duration'] += duration
+                usage['total_complexity'] += complexity
+                usage['total_quality'] += quality
+                usage['sessions'].append(session.id)
+                
+                if session.project_name:
+                    usage['projects'].add(session.project_name)
+        
+        # 计算平均值（每项技术至少出现一次，usage_count必然大于0）
+        for usage in tech_usage.values():
             count = usage['usage_count']
-            if count > 0:
-                usage['avg_duration'] = usage['total_duration'] / count
-                usage['avg_complexity'] = usage['total_complexity'] / count
-                usage['avg_quality'] = usage['total_quality'] / count
-                usage['project_count'] = len(usage['projects'])
-                usage['projects'] = list(usage['projects'])
-        
-        return tech_usage
+            usage['avg_duration'] = usage['total_duration'] / count
+            usage['avg_complexity'] = usage['total_complexity'] / count
+            usage['avg_quality'] = usage['total_quality'] / count
+            usage['project_count'] = len(usage['projects'])
+            usage['projects'] = list(usage['projects'])
+            if count == 1:
+                session_stats['new_assets_acquired'] += 1
+        
+        return dict(tech_usage), session_stats
     
-    def _update_tech_stack_assets(self, db: Session, user_id: int, tech_usage: Dict[str, Dict[str, Any]]) -> int:
-        """更新技术栈资产"""
-        updated_count = 0
-        weights = self.config.get('analysis', {}).get('tech_stack_weights', {})
-        scoring = self.config.get('analysis', {}).get('proficiency_scoring', {})
-        
-        for tech_key, usage in tech_usage.items():
-            # 查找现有资产
-            existing_asset = db.query(TechStackAsset).filter(
-                and_(
-                    TechStackAsset.user_id == user_id,
-                    func.lower(TechStackAsset.technology_name) == tech_key
-                )
-            ).first()
-            
-            if existing_asset:
-                # 更新现有资产
-                self._update_existing_asset(existing_asset, usage, scoring)
-                updated_count += 1
-            else:
-                # 创建新资产
-                new_asset = self._create_new_asset(db, user_id, usage, weights, scoring)
-                if new_asset:
-                    updated_count += 1
+    def _iter_session_technologies(self, session: Row) -> Iterator[Tuple[str, str]]:
+        """按分类逐个产出会话涉及的技术，返回 (分类, 技术名)，跳过空值"""
+        # 分析主要技术栈（复制一份再追加，不修改会话自身的technologies）
+        technologies = list(session.technologies or ())
+        if session.primary_language:
+            technologies.append(session.primary_language)
+        
+        frameworks = session.frameworks or []
+        libraries = session.libraries or []
+        tools = session.tools or []
+        
+        # 已归入框架/库/工具的技术不再计入general，用集合做O(1)成员判断
+        excluded = set(frameworks)
+        excluded.update(libraries)
+        excluded.update(tools)
+        
+        # 合并所有技术栈
+        all_techs = {
+            'programming_language': [session.primary_language] if session.primary_language else [],
+            'framework': frameworks,
+            'library': libraries,
+            'tool': tools,
+            'general': [t for t in technologies if t not in excluded]
+        }
         
-        return updated_count
+        for category, tech_list in all_techs.items():
+            for tech in tech_list:
+                if tech:
+                    yield category, tech
     
-    def _update_existing_asset(self, asset: TechStackAsset, usage: Dict[str, Any], scoring: Dict[str, Any]):
-        """更新现有技术栈资产"""
-        # 计算新的熟练度分数
-        score_increment = self._calculate_proficiency_increment(usage, scoring)
-        
-        # 更新分数，但不超过最大增长限制
-        max_increment = scoring.get('max_single_increment', 5.0)
-        actual_increment = min(score_increment, max_increment)
-        
-        asset.proficiency_score = min(100.0, asset.proficiency_score + actual_increment)
-        asset.total_practice_hours += usage.get('total_duration', 0) / 60.0  # 转换为小时
-        asset.project_count += usage.get('project_count', 0)
-        asset.last_practiced_date = datetime.utcnow()
-        asset.is_active = True
+    def _update_tech_stack_assets(self, db: Session, user_id: int, tech_usage: Dict[str, Dict[str, Any]],
+                                  now: Optional[datetime] = None) -> int:
+        """
+        更新技术栈资产
+        
+        整批只执行一条 INSERT ... ON CONFLICT DO UPDATE（冲突目标为 (user_id, lower(technology_name)) 唯一索引）：
+        新技术按初始分数插入，已有技术在数据库端原子地累加分数、时长和技能维度，避免先查询再写入的竞态
+        """
+        if not tech_usage:
+            return 0
+        now = now or datetime.utcnow()
+        
+        rows = []
+        score_increments = {}
+        for usage in tech_usage.values():
+            row = self._build_new_asset_row(user_id, usage, now)
+            rows.append(row)
+            # 已有资产的分数增长，不超过单次最大增长限制
+            score_increments[row['technology_name']] = min(
+                self._calculate_proficiency_increment(usage), self._max_increment
+            )
         
-        # 更新熟练度级别
-        asset.proficiency_level = self._determine_proficiency_level(asset.proficiency_score)
+        stmt = upsert_insert(db)(TechStackAsset).values(rows)
+        excluded = stmt.excluded
         
-        # 更新技能维度
-        self._update_skill_dimensions(asset, usage)
+        # 已有资产：分数按技术名取本批增长值；插入行中的时长、项目数和技能维度恰为本次的增量
+        new_score = self._cap_score(
+            TechStackAsset.proficiency_score + case(score_increments, value=excluded.technology_name, else_=0.0)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TechStackAsset.user_id, func.lower(TechStackAsset.technology_name)],
+            set_={
+                'proficiency_score': new_score,
+                'proficiency_level': self._proficiency_level_expression(new_score),
+                'total_practice_hours': TechStackAsset.total_practice_hours + excluded.total_practice_hours,
+                'project_count': TechStackAsset.project_count + excluded.project_count,
+                'last_practiced_date': excluded.last_practiced_date,
+                'is_active': True,
+                'practical_skills': self._cap_score(
+                    func.coalesce(TechStackAsset.practical_skills, 0.0) + excluded.practical_skills
+                ),
+                'problem_solving': self._cap_score(
+                    func.coalesce(TechStackAsset.problem_solving, 0.0) + excluded.problem_solving
+                ),
+                'theoretical_knowledge': self._cap_score(
+                    func.coalesce(TechStackAsset.theoretical_knowledge, 0.0) + excluded.theoretical_knowledge
+                ),
+                'updated_at': now
+            }
+        )
+        db.execute(stmt)
         
-        asset.updated_at = datetime.utcnow()
+        return len(rows)
+    
+    @staticmethod
+    def _cap_score(score):
+        """SQL表达式：分数不超过100"""
+        return case((score > 100.0, 100.0), else_=score)
     
-    def _create_new_asset(self, db: Session, user_id: int, usage: Dict[str, Any], 
-                         weights: Dict[str, float], scoring: Dict[str, Any]) -> Optional[TechStackAsset]:
-        """创建新的技术栈资产"""
+    def _build_new_asset_row(self, user_id: int, usage: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        """构建新技术栈资产的插入行数据"""
         category = usage.get('category', 'general')
-        weight = weights.get(category, 0.5)
+        weight = self._weights.get(category, 0.5)
         
         # 计算初始熟练度分数
-        initial_score = self._calculate_initial_proficiency_score(usage, scoring, weight)
+        initial_score = self._calculate_initial_proficiency_score(usage, weight)
         
-        new_asset = TechStackAsset(
-            user_id=user_id,
-            technology_name=usage['name'],
-            category=category,
-            proficiency_level=self._determine_proficiency_level(initial_score),
-            proficiency_score=initial_score,
-            confidence_level=min(1.0, initial_score / 100.0),
-            first_learned_date=datetime.utcnow(),
-            last_practiced_date=datetime.utcnow(),
-            total_practice_hours=usage.get('total_duration', 0) / 60.0,
-            project_count=usage.get('project_count', 0),
-            is_active=True
-        )
+        row = {
+            'user_id': user_id,
+            # Core语句不经过模型的validates，这里同样去除名称首尾空白
+            'technology_name': usage['name'].strip(),
+            'category': category,
+            'proficiency_level': self._determine_proficiency_level(initial_score),
+            'proficiency_score': initial_score,
+            'confidence_level': min(1.0, initial_score / 100.0),
+            'first_learned_date': now,
+            'last_practiced_date': now,
+            'total_practice_hours': usage.get('total_duration', 0) / 60.0,
+            'project_count': usage.get('project_count', 0),
+            'is_active': True
+        }
         
         # 设置技能维度
-        self._update_skill_dimensions(new_asset, usage)
+        row.update(self._calculate_skill_dimensions(0.0, 0.0, 0.0, usage))
         
-        db.add(new_asset)
-        return new_asset
+        return row
     
-    def _calculate_proficiency_increment(self, usage: Dict[str, Any], scoring: Dict[str, Any]) -> float:
-        """计算熟练度增长"""
-        base_score = scoring.get('base_score', 10.0)
-        duration_weight = scoring.get('duration_weight', 0.3)
-        complexity_weight = scoring.get('complexity_weight', 0.4)
-        quality_weight = scoring.get('quality_weight', 0.3)
-        
+    def _calculate_proficiency_increment(self, usage: Dict[str, Any]) -> float:
+        """计算熟练度增长（评分参数在初始化时已从配置中读取）"""
         # 基于使用时长的分数
         duration_score = min(20.0, (usage.get('avg_duration', 0) / 60.0) * 2)  # 每小时2分
         
@@ -379,147 +530,155 @@ class TechStackSummaryAgent:
         quality_score = usage.get('avg_quality', 0) / 10  # 质量分数 / 10
         
         total_score = (
-            base_score +
-            duration_score * duration_weight +
-            complexity_score * complexity_weight +
-            quality_score * quality_weight
+            self._base_score +
+            duration_score * self._duration_weight +
+            complexity_score * self._complexity_weight +
+            quality_score * self._quality_weight
         )
         
         return total_score
     
-    def _calculate_initial_proficiency_score(self, usage: Dict[str, Any], 
-                                           scoring: Dict[str, Any], weight: float) -> float:
+    def _calculate_initial_proficiency_score(self, usage: Dict[str, Any], weight: float) -> float:
         """计算初始熟练度分数"""
-        increment = self._calculate_proficiency_increment(usage, scoring)
+        increment = self._calculate_proficiency_increment(usage)
         return min(100.0, increment * weight)
     
     def _determine_proficiency_level(self, score: float) -> str:
         """根据分数确定熟练度级别"""
-        if score >= 80:
-            return "expert"
-        elif score >= 60:
-            return "advanced"
-        elif score >= 30:
-            return "intermediate"
-        else:
-            return "beginner"
+        for threshold, level in _PROFICIENCY_LEVEL_THRESHOLDS:
+            if score >= threshold:
+                return level
+        return "beginner"
+    
+    def _proficiency_level_expression(self, score):
+        """SQL表达式：根据分数确定熟练度级别，与 _determine_proficiency_level 使用相同阈值"""
+        return case(
+            *[(score >= threshold, level) for threshold, level in _PROFICIENCY_LEVEL_THRESHOLDS],
+            else_="beginner"
+        )
     
     def _update_skill_dimensions(self, asset: TechStackAsset, usage: Dict[str, Any]):
         """更新技能维度评分"""
+        dimensions = self._calculate_skill_dimensions(
+            asset.practical_skills, asset.problem_solving, asset.theoretical_knowledge, usage
+        )
+        for field, value in dimensions.items():
+            setattr(asset, field, value)
+    
+    def _calculate_skill_dimensions(self, practical_skills: Optional[float], problem_solving: Optional[float],
+                                    theoretical_knowledge: Optional[float], usage: Dict[str, Any]) -> Dict[str, float]:
+        """根据当前技能维度和使用情况计算新的技能维度评分"""
         # 基于使用情况更新各个维度
         usage_factor = min(1.0, usage.get('usage_count', 1) / 10.0)
         quality_factor = usage.get('avg_quality', 50) / 100.0
         complexity_factor = usage.get('avg_complexity', 5) / 10.0
         
-        # 确保asset的属性不为None，如果为None则初始化为0
-        if asset.practical_skills is None:
-            asset.practical_skills = 0.0
-        if asset.problem_solving is None:
-            asset.problem_solving = 0.0
-        if asset.theoretical_knowledge is None:
-            asset.theoretical_knowledge = 0.0
-        
-        # 实践技能基于使用频率和质量
-        asset.practical_skills = min(100.0, asset.practical_skills + usage_factor * quality_factor * 10)
-        
-        # 问题解决能力基于复杂度
-        asset.problem_solving = min(100.0, asset.problem_solving + complexity_factor * 8)
+        # 属性为None时按0处理
+        practical_skills = practical_skills or 0.0
+        problem_solving = problem_solving or 0.0
+        theoretical_knowledge = theoretical_knowledge or 0.0
         
         # 理论知识基于项目多样性
         project_diversity = min(1.0, usage.get('project_count', 1) / 5.0)
-        asset.theoretical_knowledge = min(100.0, asset.theoretical_knowledge + project_diversity * 6)
+        
+        return {
+            # 实践技能基于使用频率和质量
+            'practical_skills': min(100.0, practical_skills + usage_factor * quality_factor * 10),
+            # 问题解决能力基于复杂度
+            'problem_solving': min(100.0, problem_solving + complexity_factor * 8),
+            'theoretical_knowledge': min(100.0, theoretical_knowledge + project_diversity * 6)
+        }
     
     def _identify_tech_stack_debts(self, db: Session, user_id: int, tech_usage: Dict[str, Dict[str, Any]]) -> int:
         """识别技术栈负债"""
         # 这里可以实现更复杂的负债识别逻辑
         # 例如：分析项目需求但用户缺乏的技术栈
         identified_count = 0
+        new_debt_rows = []
         
         # 示例：如果用户使用了某个框架但没有掌握相关的核心技术
-        for tech_key, usage in tech_usage.items():
-            related_techs = self._get_related_technologies(usage['name'], usage['category'])
-            
+        related_by_tech = [
+            self._get_related_technologies(usage['name'], usage['category'])
+            for usage in tech_usage.values()
+        ]
+        candidate_names = {related.lower() for related_techs in related_by_tech for related in related_techs}
+        if not candidate_names:
+            return 0
+        
+        # 两次IN查询取回用户已掌握或已记录为负债的候选技术（小写名）
+        known_techs = {
+            name for (name,) in db.query(func.lower(TechStackAsset.technology_name)).filter(
+                and_(
+                    TechStackAsset.user_id == user_id,
+                    func.lower(TechStackAsset.technology_name).in_(candidate_names)
+                )
+            )
+        }
+        known_techs.update(
+            name for (name,) in db.query(func.lower(TechStackDebt.technology_name)).filter(
+                and_(
+                    TechStackDebt.user_id == user_id,
+                    func.lower(TechStackDebt.technology_name).in_(candidate_names)
+                )
+            )
+        )
+        
+        for related_techs in related_by_tech:
             for related_tech in related_techs:
-                # 检查用户是否已经掌握相关技术
-                existing_asset = db.query(TechStackAsset).filter(
-                    and_(
-                        TechStackAsset.user_id == user_id,
-                        func.lower(TechStackAsset.technology_name) == related_tech.lower()
-                    )
-                ).first()
-                
-                existing_debt = db.query(TechStackDebt).filter(
-                    and_(
-                        TechStackDebt.user_id == user_id,
-                        func.lower(TechStackDebt.technology_name) == related_tech.lower()
-                    )
-                ).first()
+                # 已掌握、已有负债或本轮已识别（多个框架可能共享相关技术）的跳过
+                if related_tech.lower() in known_techs:
+                    continue
                 
-                if not existing_asset and not existing_debt:
-                    # 创建新的技术栈负债
-                    new_debt = TechStackDebt(
-                        user_id=user_id,
-                        technology_name=related_tech,
-                        category=self._determine_tech_category(related_tech),
-                        urgency_level="medium",
-                        importance_score=70.0,
-                        career_impact=60.0,
-                        project_relevance=80.0,
-                        target_proficiency_level="intermediate",
-                        estimated_learning_hours=20.0,
-                        learning_priority=3,
-                        auto_generated=True,
-                        status="identified"
-                    )
-                    
-                    db.add(new_debt)
-                    identified_count += 1
+                # 新的技术栈负债先收集为行数据，循环结束后批量插入
+                new_debt_rows.append({
+                    'user_id': user_id,
+                    'technology_name': related_tech,
+                    'category': self._determine_tech_category(related_tech),
+                    'urgency_level': "medium",
+                    'importance_score': 70.0,
+                    'career_impact': 60.0,
+                    'project_relevance': 80.0,
+                    'target_proficiency_level': "intermediate",
+                    'estimated_learning_hours': 20.0,
+                    'learning_priority': 3,
+                    'auto_generated': True,
+                    'status': "identified"
+                })
+                known_techs.add(related_tech.lower())
+                identified_count += 1
+        
+        if new_debt_rows:
+            db.execute(insert(TechStackDebt), new_debt_rows)
         
         return identified_count
     
-    def _get_related_technologies(self, tech_name: str, category: str) -> List[str]:
-        """获取相关技术栈"""
+    def _get_related_technologies(self, tech_name: str, category: str) -> Tuple[str, ...]:
+        """获取相关技术栈（不区分大小写）"""
         # 这里可以实现更智能的相关技术推荐逻辑
-        related_map = {
-            'React': ['JavaScript', 'HTML', 'CSS', 'Node.js'],
-            'Vue.js': ['JavaScript', 'HTML', 'CSS'],
-            'Django': ['Python', 'HTML', 'CSS', 'SQL'],
-            'Flask': ['Python', 'HTML', 'CSS'],
-            'Spring Boot': ['Java', 'SQL', 'Maven'],
-            'Express.js': ['Node.js', 'JavaScript'],
-        }
-        
-        return related_map.get(tech_name, [])
+        return _related_technologies(tech_name)
     
     def _determine_tech_category(self, tech_name: str) -> str:
-        """确定技术分类"""
-        category_map = {
-            'JavaScript': 'programming_language',
-            'Python': 'programming_language',
-            'Java': 'programming_language',
-            'HTML': 'markup_language',
-            'CSS': 'stylesheet_language',
-            'SQL': 'query_language',
-            'Node.js': 'runtime',
-            'Maven': 'build_tool',
-        }
-        
-        return category_map.get(tech_name, 'general')
+        """确定技术分类（不区分大小写）"""
+        return _tech_category(tech_name)
     
-    def _generate_progress_summary(self, db: Session, user_id: int, 
-                                 sessions: List[MCPSession], tech_usage: Dict[str, Dict[str, Any]]):
-        """生成学习进度总结"""
-        period_start = min(session.created_at for session in sessions) if sessions else datetime.utcnow()
-        period_end = datetime.utcnow()
-        
-        # 统计资产和负债数量
-        total_assets = db.query(TechStackAsset).filter(TechStackAsset.user_id == user_id).count()
-        total_debts = db.query(TechStackDebt).filter(
+    def _generate_progress_summary(self, db: Session, user_id: int, session_stats: Dict[str, Any],
+                                 now: Optional[datetime] = None):
+        """生成学习进度总结（会话汇总统计来自 _analyze_technology_usage）"""
+        now = now or datetime.utcnow()
+        period_start = session_stats['min_created_at'] or now
+        period_end = now
+        
+        # 统计资产和负债数量（两个标量子查询合并为一次查询）
+        asset_count = db.query(func.count(TechStackAsset.id)).filter(
+            TechStackAsset.user_id == user_id
+        ).scalar_subquery()
+        debt_count = db.query(func.count(TechStackDebt.id)).filter(
             and_(TechStackDebt.user_id == user_id, TechStackDebt.is_active == True)
-        ).count()
+        ).scalar_subquery()
+        total_assets, total_debts = db.query(asset_count, debt_count).one()
         
         # 计算学习时间
-        total_learning_hours = sum(session.actual_duration or 0 for session in sessions) / 60.0
+        total_learning_hours = session_stats['total_duration'] / 60.0
         
         summary = LearningProgressSummary(
             user_id=user_id,
@@ -527,12 +686,12 @@ class TechStackSummaryAgent:
             period_start=period_start,
             period_end=period_end,
             total_assets=total_assets,
-            new_assets_acquired=len([u for u in tech_usage.values() if u.get('usage_count', 0) == 1]),
+            new_assets_acquired=session_stats['new_assets_acquired'],
             total_debts=total_debts,
             total_learning_hours=total_learning_hours,
-            practice_sessions=len(sessions),
-            projects_completed=len(set(s.project_name for s in sessions if s.project_name)),
-            generated_at=datetime.utcnow()
+            practice_sessions=session_stats['session_count'],
+            projects_completed=len(session_stats['project_names']),
+            generated_at=now
         )
         
         db.add(summary)
@@ -4,12 +4,19 @@
 处理技术债务分析和管理的业务逻辑
 """
 
-from typing import List, Optional, Dict, Any
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from copy import deepcopy
+from itertools import accumulate
+from types import MappingProxyType
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy import and_, or_, func, desc, case, literal, insert, update, delete, cast, Integer, Date, tuple_
+import hashlib
 import json
 import re
+import threading
 
 from ..models.technical_debt import TechnicalDebt
 from ..models.user import User
@@ -21,6 +28,181 @@ from ..core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 静态分析使用的正则在模块加载时一次性编译，避免逐行匹配时反复查找re的模式缓存
+# 函数定义（Python的def或JavaScript的function）
+_FUNC_DEF_RE = re.compile(r'^\s*(?:def|function)\s+\w+')
+# 函数名：行内第一个紧跟左括号的标识符
+_FUNC_NAME_RE = re.compile(r'\b(\w+)\s*\(')
+# TODO/FIXME类注释
+_TODO_RE = re.compile(r'\b(TODO|FIXME|HACK|XXX)\b', re.IGNORECASE)
+
+# 安全问题修复建议：标题 -> 建议
+_SECURITY_FIX_SUGGESTIONS = MappingProxyType({
+    'Hardcoded Password': 'Use environment variables or secure configuration management',
+    'Hardcoded API Key': 'Store API keys in environment variables or secure vaults',
+    'Hardcoded Secret': 'Use secure secret management systems',
+    'Use of eval()': 'Avoid eval(), use safer alternatives like ast.literal_eval()',
+    'Use of exec()': 'Avoid exec(), redesign to use safer code execution patterns',
+    'Shell Injection Risk': 'Use shell=False and validate inputs, or use subprocess with list arguments',
+    'Potential SQL Injection': 'Use parameterized queries or ORM methods'
+})
+
+# 性能问题修复建议：标题 -> 建议
+_PERFORMANCE_FIX_SUGGESTIONS = MappingProxyType({
+    'Inefficient Loop Pattern': 'Use enumerate() instead of range(len())',
+    'List Append in Loop': 'Consider list comprehension or pre-allocate list size',
+    'String Concatenation in Loop': 'Use join() method or f-strings for better performance',
+    'Blocking Sleep': 'Consider async/await or non-blocking alternatives'
+})
+
+# 安全问题模式：(编译后的正则, 标题, 严重性, 修复建议)
+_SECURITY_PATTERNS = tuple(
+    (re.compile(pattern, re.IGNORECASE), title, severity, _SECURITY_FIX_SUGGESTIONS[title])
+    for pattern, title, severity in (
+        (r'password\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded Password', 'critical'),
+        (r'api_key\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded API Key', 'critical'),
+        (r'secret\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded Secret', 'critical'),
+        (r'eval\s*\(', 'Use of eval()', 'high'),
+        (r'exec\s*\(', 'Use of exec()', 'high'),
+        (r'shell=True', 'Shell Injection Risk', 'high'),
+        (r'sql\s*=.*\+.*', 'Potential SQL Injection', 'high')
+    )
+)
+
+# 性能问题模式：(编译后的正则, 标题, 严重性, 修复建议)，区分大小写
+_PERFORMANCE_PATTERNS = tuple(
+    (re.compile(pattern), title, severity, _PERFORMANCE_FIX_SUGGESTIONS[title])
+    for pattern, title, severity in (
+        (r'for\s+\w+\s+in\s+range\s*\(\s*len\s*\(', 'Inefficient Loop Pattern', 'medium'),
+        (r'\.append\s*\(.*\)\s*$', 'List Append in Loop', 'low'),
+        # 等价于 \+\s*=.*\[.*\]（只判断是否命中），但不会因嵌套的 .* 回溯而在长行上耗时呈立方增长
+        (r'\+\s*=[^\[\n]*\[[^\]\n]*\]', 'String Concatenation in Loop', 'medium'),
+        (r'time\.sleep\s*\(', 'Blocking Sleep', 'low')
+    )
+)
+
+# 超过该长度的行视为长行
+_MAX_LINE_LENGTH = 120
+
+# 超过该长度的行（如压缩后的代码）只报告长行问题，不参与正则匹配，避免 .* 类模式在超长行上回溯
+_MAX_LINE_SCAN_LENGTH = 4096
+# 超过该字符数的代码不做静态分析
+_MAX_ANALYZE_CHARS = 4 << 20
+# 检查前若干个字符中是否有NUL字符来判断二进制内容
+_BINARY_SNIFF_CHARS = 4096
+
+# 逐行规则（长行、TODO、安全、性能）的合并预筛选：整段文本只扫描一次，只有可能命中的行才逐条规则检查。
+# 各分支保留原有的大小写设置；MULTILINE使 ^ 和 $ 在每行首尾匹配，保证任何能逐行命中的行都会被找出
+_LONG_LINE_PATTERN = f'^.{{{_MAX_LINE_LENGTH + 1}}}'
+_CASELESS_LINE_PATTERNS = [_TODO_RE.pattern] + [pattern.pattern for pattern, _, _, _ in _SECURITY_PATTERNS]
+_CASE_SENSITIVE_LINE_PATTERNS = [pattern.pattern for pattern, _, _, _ in _PERFORMANCE_PATTERNS]
+
+_LINE_RULES_PREFILTER_RE = re.compile(
+    '|'.join(
+        [_LONG_LINE_PATTERN]
+        + [f'(?i:{pattern})' for pattern in _CASELESS_LINE_PATTERNS]
+        + [f'(?:{pattern})' for pattern in _CASE_SENSITIVE_LINE_PATTERNS]
+    ),
+    re.MULTILINE
+)
+
+# 纯ASCII文本的预筛选：在小写化后的文本上做区分大小写的匹配，避免忽略大小写的多分支匹配逐位置回溯。
+# ASCII文本小写化后长度和偏移不变，区分大小写的模式只包含小写字面量，因此命中的行是逐行检查结果的超集。
+# 注意：模式中只能使用小写的转义（\s、\w、\b等），否则小写化会改变其含义
+_LINE_RULES_ASCII_PREFILTER_RE = re.compile(
+    '|'.join(
+        [_LONG_LINE_PATTERN]
+        + [f'(?:{pattern.lower()})' for pattern in _CASELESS_LINE_PATTERNS + _CASE_SENSITIVE_LINE_PATTERNS]
+    ),
+    re.MULTILINE
+)
+# 改进建议规则表：(是否适用, 建议模板)，按顺序套用；description中的占位符用对应指标填充
+_IMPROVEMENT_SUGGESTION_RULES = (
+    # 基于严重性分布的建议
+    (lambda metrics: metrics['critical'] > 0, MappingProxyType({
+        'type': 'urgent_action',
+        'priority': 'high',
+        'title': 'Address Critical Issues',
+        'description': "You have {critical} critical technical debt issues that need immediate attention.",
+        'action_items': (
+            'Review all critical security vulnerabilities',
+            'Fix hardcoded secrets and credentials',
+            'Address critical performance bottlenecks'
+        )
+    })),
+    (lambda metrics: metrics['high'] > 5, MappingProxyType({
+        'type': 'code_quality',
+        'priority': 'medium',
+        'title': 'Improve Code Quality',
+        'description': "You have {high} high-severity issues affecting code quality.",
+        'action_items': (
+            'Refactor complex functions',
+            'Reduce code duplication',
+            'Improve error handling'
+        )
+    })),
+    # 基于类型分布的建议
+    (lambda metrics: metrics['security'] > 0, MappingProxyType({
+        'type': 'security',
+        'priority': 'high',
+        'title': 'Security Review Required',
+        'description': "Found {security} security-related issues.",
+        'action_items': (
+            'Conduct security code review',
+            'Implement secure coding practices',
+            'Use security scanning tools'
+        )
+    })),
+    (lambda metrics: metrics['performance'] > 3, MappingProxyType({
+        'type': 'performance',
+        'priority': 'medium',
+        'title': 'Performance Optimization',
+        'description': "Multiple performance issues detected ({performance} issues).",
+        'action_items': (
+            'Profile application performance',
+            'Optimize database queries',
+            'Implement caching strategies'
+        )
+    })),
+    # 基于总体情况的建议
+    (lambda metrics: metrics['total_debts'] > 20, MappingProxyType({
+        'type': 'process',
+        'priority': 'medium',
+        'title': 'Establish Debt Management Process',
+        'description': 'High volume of technical debt suggests need for better processes.',
+        'action_items': (
+            'Implement regular code reviews',
+            'Set up automated code quality checks',
+            'Allocate time for debt reduction in sprints'
+        )
+    })),
+    (lambda metrics: metrics['resolution_rate'] < 50, MappingProxyType({
+        'type': 'workflow',
+        'priority': 'low',
+        'title': 'Improve Debt Resolution Rate',
+        'description': "Current resolution rate is {resolution_rate:.1f}%.",
+        'action_items': (
+            'Prioritize debt resolution tasks',
+            'Break down large debt items',
+            'Track resolution progress regularly'
+        )
+    })),
+)
+
+# 静态分析结果缓存：代码内容摘要 -> 检测到的问题列表，按最近使用淘汰。
+# 检测结果只取决于代码内容；服务实例按请求创建，因此缓存放在模块级并加锁供多个线程共享
+_DETECTION_CACHE_SIZE = 256
+_detection_cache: "OrderedDict[bytes, List[Dict[str, Any]]]" = OrderedDict()
+_detection_cache_lock = threading.Lock()
+
+
+def _copy_issues(issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """复制问题列表；问题字典中只有metadata是嵌套的可变对象，其余字段为不可变值，浅拷贝即可"""
+    return [
+        {**issue, 'metadata': deepcopy(issue['metadata'])} if 'metadata' in issue else dict(issue)
+        for issue in issues
+    ]
+
 
 class TechnicalDebtService:
     """技术债务服务类"""
@@ -32,8 +214,14 @@ class TechnicalDebtService:
                           user_id: Optional[int] = None,
                           status: Optional[str] = None,
                           severity: Optional[str] = None,
-                          debt_type: Optional[str] = None) -> List[TechnicalDebt]:
-        """获取技术债务列表"""
+                          debt_type: Optional[str] = None,
+                          cursor: Optional[Tuple[datetime, int]] = None) -> List[TechnicalDebt]:
+        """
+        获取技术债务列表
+        
+        按 (created_at, id) 倒序返回。传入cursor时使用键集分页：只返回排在cursor之后的记录并忽略skip，
+        翻页开销不随页数增长；下一页的cursor为本页最后一条记录的 (created_at, id)
+        """
         query = self.db.query(TechnicalDebt)
         
         if user_id:
@@ -48,7 +236,14 @@ class TechnicalDebtService:
         if debt_type:
             query = query.filter(TechnicalDebt.debt_type == debt_type)
         
-        return query.order_by(desc(TechnicalDebt.created_at)).offset(skip).limit(limit).all()
+        if cursor:
+            query = query.filter(tuple_(TechnicalDebt.created_at, TechnicalDebt.id) < tuple_(*cursor))
+        
+        query = query.order_by(desc(TechnicalDebt.created_at), desc(TechnicalDebt.id))
+        if not cursor:
+            query = query.offset(skip)
+        
+        return query.limit(limit).all()
     
     def get_technical_debt_by_id(self, debt_id: int) -> TechnicalDebt:
         """根据ID获取技术债务"""
@@ -90,124 +285,231 @@ class TechnicalDebtService:
         return db_debt
     
     def update_technical_debt(self, debt_id: int, debt_data: TechnicalDebtUpdate) -> TechnicalDebt:
-        """更新技术债务"""
-        debt = self.get_technical_debt_by_id(debt_id)
-        
-        # 更新字段
-        update_data = debt_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(debt, field, value)
+        """更新技术债务（单条 UPDATE ... RETURNING，无需先查询整行）"""
+        # 只有模型中存在的列会被持久化，其余字段忽略
+        update_data = {
+            field: value for field, value in debt_data.dict(exclude_unset=True).items()
+            if field in TechnicalDebt.__table__.columns
+        }
+        update_data['updated_at'] = datetime.utcnow()
+        
+        debt = self.db.execute(
+            update(TechnicalDebt)
+            .where(TechnicalDebt.id == debt_id)
+            .values(**update_data)
+            .returning(TechnicalDebt)
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        if debt is None:
+            raise TechnicalDebtNotFoundError(f"Technical debt with id {debt_id} not found")
         
-        debt.updated_at = datetime.utcnow()
+        title = debt.title
         self.db.commit()
-        self.db.refresh(debt)
         
-        logger.info(f"Updated technical debt: {debt.title} (ID: {debt.id})")
+        logger.info(f"Updated technical debt: {title} (ID: {debt_id})")
         return debt
     
     def delete_technical_debt(self, debt_id: int) -> bool:
-        """删除技术债务"""
-        debt = self.get_technical_debt_by_id(debt_id)
+        """删除技术债务（单条 DELETE ... RETURNING，无需先查询整行）"""
+        title = self.db.execute(
+            delete(TechnicalDebt)
+            .where(TechnicalDebt.id == debt_id)
+            .returning(TechnicalDebt.title)
+        ).scalar_one_or_none()
+        if title is None:
+            raise TechnicalDebtNotFoundError(f"Technical debt with id {debt_id} not found")
         
-        self.db.delete(debt)
         self.db.commit()
         
-        logger.info(f"Deleted technical debt: {debt.title} (ID: {debt.id})")
+        logger.info(f"Deleted technical debt: {title} (ID: {debt_id})")
         return True
     
     def resolve_technical_debt(self, debt_id: int, resolution_notes: str) -> TechnicalDebt:
-        """解决技术债务"""
-        debt = self.get_technical_debt_by_id(debt_id)
-        
-        if debt.status == 'resolved':
+        """解决技术债务（单条 UPDATE ... RETURNING；只有更新失败时才查询失败原因）"""
+        now = datetime.utcnow()
+        debt = self.db.execute(
+            update(TechnicalDebt)
+            .where(
+                and_(
+                    TechnicalDebt.id == debt_id,
+                    or_(TechnicalDebt.status.is_(None), TechnicalDebt.status != 'resolved')
+                )
+            )
+            .values(status='resolved', resolved_at=now, resolution_notes=resolution_notes, updated_at=now)
+            .returning(TechnicalDebt)
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        if debt is None:
+            # 未更新任何行：债务不存在或已解决
+            self.get_technical_debt_by_id(debt_id)
             raise InvalidOperationError("Technical debt is already resolved")
         
-        debt.status = 'resolved'
-        debt.resolved_at = datetime.utcnow()
-        debt.resolution_notes = resolution_notes
-        debt.updated_at = datetime.utcnow()
-        
+        title = debt.title
         self.db.commit()
-        self.db.refresh(debt)
         
-        logger.info(f"Resolved technical debt: {debt.title} (ID: {debt.id})")
+        logger.info(f"Resolved technical debt: {title} (ID: {debt_id})")
         return debt
     
     def analyze_code_for_debt(self, user_id: int, code_content: str, 
-                            file_path: Optional[str] = None) -> List[Dict[str, Any]]:
-        """分析代码中的技术债务"""
+                            file_path: Optional[str] = None,
+                            code_record_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        分析代码中的技术债务
+        
+        Args:
+            user_id: 用户ID
+            code_content: 代码内容
+            file_path: 文件路径
+            code_record_id: 代码记录ID，提供时高严重性问题会自动记录为技术债务
+        """
+        # 过大或二进制的内容直接跳过，其余做静态分析（相同内容的代码直接复用缓存结果）
+        skip_reason = self._get_analysis_skip_reason(code_content)
+        if skip_reason:
+            logger.info(f"Skipped code analysis for {file_path}: {skip_reason}")
+            detected_debts = []
+        else:
+            detected_debts = self._detect_issues_cached(code_content, file_path)
+        
+        # 自动创建技术债务记录：只自动创建高严重性问题，一次批量插入、一次提交
+        created_debts = []
+        high_issues = [issue for issue in detected_debts if issue['severity'] in ['high', 'critical']]
+        if high_issues and code_record_id is not None:
+            created_debts = self._bulk_create_detected_debts(user_id, code_record_id, file_path, high_issues)
+        
+        logger.info(f"Analyzed code and detected {len(detected_debts)} issues, created {len(created_debts)} debt records")
+        # 各严重性的问题数在一次遍历中统计
+        severity_counts = Counter(issue['severity'] for issue in detected_debts)
+        result = {
+            'detected_issues': detected_debts,
+            'created_debts': created_debts,
+            'analysis_summary': {
+                'total_issues': len(detected_debts),
+                'critical_issues': severity_counts['critical'],
+                'high_issues': severity_counts['high'],
+                'medium_issues': severity_counts['medium'],
+                'low_issues': severity_counts['low']
+            }
+        }
+        if skip_reason:
+            result['skipped'] = True
+            result['reason'] = skip_reason
+        return result
+    
+    def _get_analysis_skip_reason(self, code_content: str) -> Optional[str]:
+        """返回跳过静态分析的原因（too_large / binary），无需跳过时返回None"""
+        if len(code_content) > _MAX_ANALYZE_CHARS:
+            return 'too_large'
+        if '\x00' in code_content[:_BINARY_SNIFF_CHARS]:
+            return 'binary'
+        return None
+    
+    def _detect_issues_cached(self, code_content: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        带缓存的静态分析，相同内容的代码重复分析时直接返回缓存结果
+        
+        缓存中保存的和返回的都是独立的深拷贝，调用方修改结果不会影响缓存
+        """
+        digest = hashlib.blake2b(code_content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        with _detection_cache_lock:
+            cached = _detection_cache.get(digest)
+            if cached is not None:
+                _detection_cache.move_to_end(digest)
+        if cached is not None:
+            return _copy_issues(cached)
+        
+        detected_debts = self._detect_issues(code_content, file_path)
+        
+        with _detection_cache_lock:
+            _detection_cache[digest] = _copy_issues(detected_debts)
+            if len(_detection_cache) > _DETECTION_CACHE_SIZE:
+                _detection_cache.popitem(last=False)
+        return detected_debts
+    
+    def _detect_issues(self, code_content: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
+        """执行各项静态分析并按固定顺序合并结果，不访问数据库"""
         detected_debts = []
+        # 只按 '\n' 切分一次，各分析器共享同一份行列表（不用splitlines，以保持原有的行号和行内容）
+        lines = code_content.split('\n')
         
         # 代码复杂度分析
-        complexity_issues = self._analyze_complexity(code_content, file_path)
+        complexity_issues = self._analyze_complexity(lines, file_path)
         detected_debts.extend(complexity_issues)
         
         # 代码重复分析
-        duplication_issues = self._analyze_duplication(code_content, file_path)
+        duplication_issues = self._analyze_duplication(lines, file_path)
         detected_debts.extend(duplication_issues)
         
-        # 代码风格分析
-        style_issues = self._analyze_style(code_content, file_path)
+        # 代码风格、安全和性能问题在同一次扫描中分析，按原有顺序合并
+        style_issues, security_issues, performance_issues = self._analyze_line_rules(code_content, lines, file_path)
         detected_debts.extend(style_issues)
-        
-        # 安全问题分析
-        security_issues = self._analyze_security(code_content, file_path)
         detected_debts.extend(security_issues)
-        
-        # 性能问题分析
-        performance_issues = self._analyze_performance(code_content, file_path)
         detected_debts.extend(performance_issues)
         
-        # 自动创建技术债务记录
-        created_debts = []
-        for issue in detected_debts:
-            if issue['severity'] in ['high', 'critical']:  # 只自动创建高严重性问题
-                debt_data = TechnicalDebtCreate(
-                    user_id=user_id,
-                    title=issue['title'],
-                    description=issue['description'],
-                    debt_type=issue['type'],
-                    severity=issue['severity'],
-                    file_path=file_path,
-                    line_number=issue.get('line_number'),
-                    code_snippet=issue.get('code_snippet'),
-                    suggested_fix=issue.get('suggested_fix'),
-                    estimated_effort=issue.get('estimated_effort', 60),
-                    impact_score=issue.get('impact_score', 5),
-                    metadata={'auto_detected': True, 'analysis_timestamp': datetime.utcnow().isoformat()}
-                )
-                
-                debt = self.create_technical_debt(debt_data)
-                created_debts.append(debt)
+        return detected_debts
+    
+    def _bulk_create_detected_debts(self, user_id: int, code_record_id: int, file_path: Optional[str],
+                                    issues: List[Dict[str, Any]]) -> List[TechnicalDebt]:
+        """
+        批量创建自动检测到的技术债务记录，返回新建的技术债务对象
+        
+        冗余的user_id取自代码记录所属编码会话的用户，并校验与调用方传入的用户一致，避免债务归属到错误的用户
+        """
+        owner_user_id = self.db.query(CodingSession.user_id).join(
+            CodeRecord, CodeRecord.coding_session_id == CodingSession.id
+        ).filter(CodeRecord.id == code_record_id).scalar()
+        if owner_user_id is None:
+            raise InvalidOperationError(f"Code record with id {code_record_id} not found")
+        if owner_user_id != user_id:
+            raise InvalidOperationError(f"Code record {code_record_id} does not belong to user {user_id}")
+        
+        now = datetime.utcnow()
+        rows = [{
+            'code_record_id': code_record_id,
+            'user_id': owner_user_id,
+            'title': issue['title'],
+            'description': issue['description'],
+            'debt_type': issue['type'],
+            'severity': issue['severity'],
+            'file_path': file_path,
+            'line_start': issue.get('line_number'),
+            'line_end': issue.get('line_number'),
+            'code_snippet': issue.get('code_snippet'),
+            'suggested_fix': issue.get('suggested_fix'),
+            'effort_estimate': issue.get('estimated_effort', 60),
+            'impact_score': issue.get('impact_score', 5),
+            'detection_method': 'static_analysis',
+            'status': 'open',
+            'first_detected': now,
+            'last_seen': now,
+            'created_at': now,
+            'updated_at': now
+        } for issue in issues]
+        
+        # ORM批量插入配合RETURNING直接得到新建的TechnicalDebt对象，仍然只执行一条INSERT；
+        # 批量语句不触发映射器事件，声明涉及的用户，提交后只使该用户的仪表板缓存失效
+        created_debts = self.db.scalars(
+            insert(TechnicalDebt).returning(TechnicalDebt).execution_options(dashboard_user_ids=(owner_user_id,)),
+            rows
+        ).all()
+        self.db.commit()
         
-        logger.info(f"Analyzed code and detected {len(detected_debts)} issues, created {len(created_debts)} debt records")
-        return {
-            'detected_issues': detected_debts,
-            'created_debts': created_debts,
-            'analysis_summary': {
-                'total_issues': len(detected_debts),
-                'critical_issues': len([i for i in detected_debts if i['severity'] == 'critical']),
-                'high_issues': len([i for i in detected_debts if i['severity'] == 'high']),
-                'medium_issues': len([i for i in detected_debts if i['severity'] == 'medium']),
-                'low_issues': len([i for i in detected_debts if i['severity'] == 'low'])
-            }
-        }
+        logger.info(f"Created {len(created_debts)} auto-detected technical debts for code record {code_record_id}")
+        return created_debts
     
-    def _analyze_complexity(self, code: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
+    def _analyze_complexity(self, lines: List[str], file_path: Optional[str]) -> List[Dict[str, Any]]:
         """分析代码复杂度"""
         issues = []
-        lines = code.split('\n')
         
         # 检查函数长度
         current_function = None
         function_start = 0
-        indent_level = 0
         
         for i, line in enumerate(lines, 1):
-            stripped = line.strip()
+            # 缩进每行只计算一次
+            current_indent = len(line) - len(line.lstrip())
             
-            # 检测函数定义
-            if re.match(r'^\s*def\s+\w+', line) or re.match(r'^\s*function\s+\w+', line):
+            # 检测函数定义：先用子串判断排除绝大多数不可能是定义的行，再做正则匹配
+            if ('def' in line or 'function' in line) and _FUNC_DEF_RE.match(line):
                 if current_function:
                     # 检查前一个函数的长度
                     function_length = i - function_start
@@ -224,12 +526,11 @@ class TechnicalDebtService:
                             'impact_score': 7
                         })
                 
-                current_function = re.search(r'\b(\w+)\s*\(', line).group(1) if re.search(r'\b(\w+)\s*\(', line) else 'unknown'
+                name_match = _FUNC_NAME_RE.search(line)
+                current_function = name_match.group(1) if name_match else 'unknown'
                 function_start = i
-                indent_level = len(line) - len(line.lstrip())
             
             # 检查嵌套深度
-            current_indent = len(line) - len(line.lstrip())
             if current_indent > 20:  # 超过5层嵌套
                 issues.append({
                     'title': 'Deep Nesting Detected',
@@ -260,20 +561,18 @@ class TechnicalDebtService:
         
         return issues
     
-    def _analyze_duplication(self, code: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
+    def _analyze_duplication(self, lines: List[str], file_path: Optional[str]) -> List[Dict[str, Any]]:
         """分析代码重复"""
         issues = []
-        lines = code.split('\n')
         
-        # 简单的重复行检测
+        # 简单的重复行检测：每行只做一次字典查找；不足11个字符的行strip后也不可能达到长度，直接跳过
         line_counts = {}
         for i, line in enumerate(lines, 1):
+            if len(line) <= 10:
+                continue
             stripped = line.strip()
-            if len(stripped) > 10 and not stripped.startswith('#') and not stripped.startswith('//'):
-                if stripped in line_counts:
-                    line_counts[stripped].append(i)
-                else:
-                    line_counts[stripped] = [i]
+            if len(stripped) > 10 and not stripped.startswith(('#', '//')):
+                line_counts.setdefault(stripped, []).append(i)
         
         for line_content, line_numbers in line_counts.items():
             if len(line_numbers) > 2:  # 出现3次以上
@@ -292,206 +591,171 @@ class TechnicalDebtService:
         
         return issues
     
-    def _analyze_style(self, code: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
-        """分析代码风格"""
-        issues = []
-        lines = code.split('\n')
-        
-        for i, line in enumerate(lines, 1):
-            # 检查行长度
-            if len(line) > 120:
-                issues.append({
-                    'title': 'Long Line',
-                    'description': f'Line {i} is {len(line)} characters long, exceeds recommended 120 characters',
-                    'type': 'style',
-                    'severity': 'low',
-                    'line_number': i,
-                    'code_snippet': line,
-                    'suggested_fix': 'Break long line into multiple lines or extract to variables',
-                    'estimated_effort': 15,
-                    'impact_score': 2
-                })
+    def _analyze_line_rules(self, code: str, lines: List[str], file_path: Optional[str]) -> Tuple[
+            List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        一次扫描完成代码风格、安全和性能的逐行规则分析
+        
+        先用合并后的预筛选正则在整段文本上查找可能命中的行，再只对这些行逐条检查规则
+        
+        Returns:
+            (代码风格问题, 安全问题, 性能问题)
+        """
+        style_issues = []
+        security_issues = []
+        performance_issues = []
+        # 超长行不参与预筛选：把它们替换为空行（行号不变），之后单独报告长行问题
+        oversized_indexes = []
+        scan_lines = lines
+        if lines and max(map(len, lines)) > _MAX_LINE_SCAN_LENGTH:
+            oversized_indexes = [index for index, line in enumerate(lines) if len(line) > _MAX_LINE_SCAN_LENGTH]
+            scan_lines = list(lines)
+            for index in oversized_indexes:
+                scan_lines[index] = ''
+            code = '\n'.join(scan_lines)
+        
+        # 每行的起始偏移由行长度累加得到，无需再扫描一遍换行符
+        line_starts = list(accumulate((len(line) + 1 for line in scan_lines[:-1]), initial=0))
+        
+        if code.isascii():
+            text, prefilter = code.lower(), _LINE_RULES_ASCII_PREFILTER_RE
+        else:
+            text, prefilter = code, _LINE_RULES_PREFILTER_RE
+        
+        candidate_indexes = []
+        pos = 0
+        while True:
+            match = prefilter.search(text, pos)
+            if not match:
+                break
             
-            # 检查TODO/FIXME注释
-            if re.search(r'\b(TODO|FIXME|HACK|XXX)\b', line, re.IGNORECASE):
-                issues.append({
-                    'title': 'TODO/FIXME Comment',
-                    'description': f'Found TODO/FIXME comment at line {i}',
-                    'type': 'maintenance',
-                    'severity': 'low',
-                    'line_number': i,
-                    'code_snippet': line.strip(),
-                    'suggested_fix': 'Address the TODO/FIXME or create a proper issue',
-                    'estimated_effort': 30,
-                    'impact_score': 3
-                })
+            index = bisect_right(line_starts, match.start()) - 1
+            candidate_indexes.append(index)
+            
+            # 从下一行开始继续查找，同一行只检查一次
+            if index + 1 >= len(line_starts):
+                break
+            pos = line_starts[index + 1]
         
-        return issues
-    
-    def _analyze_security(self, code: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
-        """分析安全问题"""
-        issues = []
-        lines = code.split('\n')
-        
-        security_patterns = [
-            (r'password\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded Password', 'critical'),
-            (r'api_key\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded API Key', 'critical'),
-            (r'secret\s*=\s*["\'][^"\'\']+["\']', 'Hardcoded Secret', 'critical'),
-            (r'eval\s*\(', 'Use of eval()', 'high'),
-            (r'exec\s*\(', 'Use of exec()', 'high'),
-            (r'shell=True', 'Shell Injection Risk', 'high'),
-            (r'sql\s*=.*\+.*', 'Potential SQL Injection', 'high')
-        ]
+        if oversized_indexes:
+            candidate_indexes = sorted(set(candidate_indexes).union(oversized_indexes))
         
-        for i, line in enumerate(lines, 1):
-            for pattern, title, severity in security_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    issues.append({
-                        'title': title,
-                        'description': f'Potential security issue detected at line {i}',
-                        'type': 'security',
-                        'severity': severity,
-                        'line_number': i,
-                        'code_snippet': line.strip(),
-                        'suggested_fix': self._get_security_fix_suggestion(title),
-                        'estimated_effort': 60,
-                        'impact_score': 9 if severity == 'critical' else 7
-                    })
+        for index in candidate_indexes:
+            self._check_line_rules(index + 1, lines[index], style_issues, security_issues, performance_issues)
         
-        return issues
+        return style_issues, security_issues, performance_issues
     
-    def _analyze_performance(self, code: str, file_path: Optional[str]) -> List[Dict[str, Any]]:
-        """分析性能问题"""
-        issues = []
-        lines = code.split('\n')
-        
-        performance_patterns = [
-            (r'for\s+\w+\s+in\s+range\s*\(\s*len\s*\(', 'Inefficient Loop Pattern', 'medium'),
-            (r'\.append\s*\(.*\)\s*$', 'List Append in Loop', 'low'),
-            (r'\+\s*=.*\[.*\]', 'String Concatenation in Loop', 'medium'),
-            (r'time\.sleep\s*\(', 'Blocking Sleep', 'low')
-        ]
+    def _check_line_rules(self, i: int, line: str, style_issues: List[Dict[str, Any]],
+                          security_issues: List[Dict[str, Any]],
+                          performance_issues: List[Dict[str, Any]]) -> None:
+        """对单行检查风格、安全和性能规则，命中的问题追加到对应列表"""
+        # 检查行长度
+        if len(line) > _MAX_LINE_LENGTH:
+            style_issues.append({
+                'title': 'Long Line',
+                'description': f'Line {i} is {len(line)} characters long, exceeds recommended 120 characters',
+                'type': 'style',
+                'severity': 'low',
+                'line_number': i,
+                'code_snippet': line,
+                'suggested_fix': 'Break long line into multiple lines or extract to variables',
+                'estimated_effort': 15,
+                'impact_score': 2
+            })
+            
+            # 超长行不再做正则规则检查
+            if len(line) > _MAX_LINE_SCAN_LENGTH:
+                return
+        
+        # 检查TODO/FIXME注释
+        if _TODO_RE.search(line):
+            style_issues.append({
+                'title': 'TODO/FIXME Comment',
+                'description': f'Found TODO/FIXME comment at line {i}',
+                'type': 'maintenance',
+                'severity': 'low',
+                'line_number': i,
+                'code_snippet': line.strip(),
+                'suggested_fix': 'Address the TODO/FIXME or create a proper issue',
+                'estimated_effort': 30,
+                'impact_score': 3
+            })
         
-        for i, line in enumerate(lines, 1):
-            for pattern, title, severity in performance_patterns:
-                if re.search(pattern, line):
-                    issues.append({
-                        'title': title,
-                        'description': f'Potential performance issue at line {i}',
-                        'type': 'performance',
-                        'severity': severity,
-                        'line_number': i,
-                        'code_snippet': line.strip(),
-                        'suggested_fix': self._get_performance_fix_suggestion(title),
-                        'estimated_effort': 45,
-                        'impact_score': 4
-                    })
+        # 安全问题
+        for pattern, title, severity, suggested_fix in _SECURITY_PATTERNS:
+            if pattern.search(line):
+                security_issues.append({
+                    'title': title,
+                    'description': f'Potential security issue detected at line {i}',
+                    'type': 'security',
+                    'severity': severity,
+                    'line_number': i,
+                    'code_snippet': line.strip(),
+                    'suggested_fix': suggested_fix,
+                    'estimated_effort': 60,
+                    'impact_score': 9 if severity == 'critical' else 7
+                })
         
-        return issues
-    
-    def _get_security_fix_suggestion(self, issue_type: str) -> str:
-        """获取安全问题修复建议"""
-        suggestions = {
-            'Hardcoded Password': 'Use environment variables or secure configuration management',
-            'Hardcoded API Key': 'Store API keys in environment variables or secure vaults',
-            'Hardcoded Secret': 'Use secure secret management systems',
-            'Use of eval()': 'Avoid eval(), use safer alternatives like ast.literal_eval()',
-            'Use of exec()': 'Avoid exec(), redesign to use safer code execution patterns',
-            'Shell Injection Risk': 'Use shell=False and validate inputs, or use subprocess with list arguments',
-            'Potential SQL Injection': 'Use parameterized queries or ORM methods'
-        }
-        return suggestions.get(issue_type, 'Review and apply security best practices')
-    
-    def _get_performance_fix_suggestion(self, issue_type: str) -> str:
-        """获取性能问题修复建议"""
-        suggestions = {
-            'Inefficient Loop Pattern': 'Use enumerate() instead of range(len())',
-            'List Append in Loop': 'Consider list comprehension or pre-allocate list size',
-            'String Concatenation in Loop': 'Use join() method or f-strings for better performance',
-            'Blocking Sleep': 'Consider async/await or non-blocking alternatives'
-        }
-        return suggestions.get(issue_type, 'Review for performance optimization opportunities')
+        # 性能问题
+        for pattern, title, severity, suggested_fix in _PERFORMANCE_PATTERNS:
+            if pattern.search(line):
+                performance_issues.append({
+                    'title': title,
+                    'description': f'Potential performance issue at line {i}',
+                    'type': 'performance',
+                    'severity': severity,
+                    'line_number': i,
+                    'code_snippet': line.strip(),
+                    'suggested_fix': suggested_fix,
+                    'estimated_effort': 45,
+                    'impact_score': 4
+                })
     
     def get_user_debt_summary(self, user_id: int, days: int = 30) -> Dict[str, Any]:
         """获取用户技术债务汇总"""
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # 基础统计 - 通过CodeRecord和CodingSession关联用户
-        total_debts = self.db.query(func.count(TechnicalDebt.id)).join(
-            CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id
-        ).join(
-            CodingSession, CodeRecord.coding_session_id == CodingSession.id
-        ).filter(
-            CodingSession.user_id == user_id
-        ).scalar() or 0
-        
-        open_debts = self.db.query(func.count(TechnicalDebt.id)).join(
-            CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id
-        ).join(
-            CodingSession, CodeRecord.coding_session_id == CodingSession.id
-        ).filter(
-            and_(
-                CodingSession.user_id == user_id,
-                TechnicalDebt.status == 'open'
-            )
-        ).scalar() or 0
-        
-        resolved_debts = self.db.query(func.count(TechnicalDebt.id)).join(
-            CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id
-        ).join(
-            CodingSession, CodeRecord.coding_session_id == CodingSession.id
+        # 基础统计 - 直接按冗余的user_id过滤，条件聚合一次查出各项计数和合计
+        is_open = TechnicalDebt.status == 'open'
+        totals = self.db.query(
+            func.count(TechnicalDebt.id).label('total'),
+            func.sum(case((is_open, 1), else_=0)).label('open'),
+            func.sum(case((TechnicalDebt.status == 'resolved', 1), else_=0)).label('resolved'),
+            # 不设else分支，非open的行取NULL被SUM忽略，与只统计open债务的结果一致
+            func.sum(case((is_open, TechnicalDebt.impact_score))).label('impact'),
+            func.sum(case((is_open, TechnicalDebt.effort_estimate))).label('effort')
         ).filter(
-            and_(
-                CodingSession.user_id == user_id,
-                TechnicalDebt.status == 'resolved'
-            )
-        ).scalar() or 0
-        
-        # 严重性分布
-        severity_distribution = (self.db.query(
-                TechnicalDebt.severity,
-                func.count(TechnicalDebt.id).label('count')
-            )
-            .join(CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id)
-            .join(CodingSession, CodeRecord.coding_session_id == CodingSession.id)
-            .filter(CodingSession.user_id == user_id)
-            .group_by(TechnicalDebt.severity)
-            .all())
-        
-        # 类型分布
-        type_distribution = (self.db.query(
-                TechnicalDebt.debt_type,
-                func.count(TechnicalDebt.id).label('count')
-            )
-            .join(CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id)
-            .join(CodingSession, CodeRecord.coding_session_id == CodingSession.id)
-            .filter(CodingSession.user_id == user_id)
-            .group_by(TechnicalDebt.debt_type)
-            .all())
+            TechnicalDebt.user_id == user_id
+        ).one()
         
+        total_debts = totals.total or 0
+        open_debts = totals.open or 0
+        resolved_debts = totals.resolved or 0
         # 总影响分数
-        total_impact = self.db.query(func.sum(TechnicalDebt.impact_score)).join(
-            CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id
-        ).join(
-            CodingSession, CodeRecord.coding_session_id == CodingSession.id
-        ).filter(
-            and_(
-                CodingSession.user_id == user_id,
-                TechnicalDebt.status == 'open'
-            )
-        ).scalar() or 0
-        
+        total_impact = totals.impact or 0
         # 估计总工作量
-        total_effort = self.db.query(func.sum(TechnicalDebt.effort_estimate)).join(
-            CodeRecord, TechnicalDebt.code_record_id == CodeRecord.id
-        ).join(
-            CodingSession, CodeRecord.coding_session_id == CodingSession.id
-        ).filter(
-            and_(
-                CodingSession.user_id == user_id,
-                TechnicalDebt.status == 'open'
-            )
-        ).scalar() or 0
+        total_effort = totals.effort or 0
+        
+        # 严重性分布和类型分布用UNION ALL合并为一次查询，按dimension列区分
+        def distribution_query(dimension: str, column):
+            return (self.db.query(
+                    literal(dimension).label('dimension'),
+                    column.label('value'),
+                    func.count(TechnicalDebt.id).label('count')
+                )
+                .filter(TechnicalDebt.user_id == user_id)
+                .group_by(column))
+        
+        severity_distribution = []
+        type_distribution = []
+        distribution_rows = distribution_query('severity', TechnicalDebt.severity).union_all(
+            distribution_query('debt_type', TechnicalDebt.debt_type)
+        ).all()
+        for dimension, value, count in distribution_rows:
+            if dimension == 'severity':
+                severity_distribution.append((value, count))
+            else:
+                type_distribution.append((value, count))
         
         return {
             'summary': {
@@ -517,55 +781,45 @@ class TechnicalDebtService:
         """获取技术债务趋势"""
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # 每日新增债务
-        daily_created = (self.db.query(
-                func.date(TechnicalDebt.created_at).label('date'),
-                func.count(TechnicalDebt.id).label('created')
-            )
-            .filter(
-                and_(
-                    TechnicalDebt.user_id == user_id,
-                    TechnicalDebt.created_at >= start_date
-                )
+        # 每日新增和解决的债务：两类事件用UNION ALL合并后在数据库端按日期汇总、排序，一次查询完成。
+        # 显式声明Date类型，使SQLite返回的日期字符串也转换为date对象
+        created_events = self.db.query(
+            func.date(TechnicalDebt.created_at, type_=Date).label('date'),
+            literal(1).label('created'),
+            literal(0).label('resolved')
+        ).filter(
+            and_(
+                TechnicalDebt.user_id == user_id,
+                TechnicalDebt.created_at >= start_date
             )
-            .group_by(func.date(TechnicalDebt.created_at))
-            .all())
-        
-        # 每日解决债务
-        daily_resolved = (self.db.query(
-                func.date(TechnicalDebt.resolved_at).label('date'),
-                func.count(TechnicalDebt.id).label('resolved')
+        )
+        resolved_events = self.db.query(
+            func.date(TechnicalDebt.resolved_at, type_=Date).label('date'),
+            literal(0).label('created'),
+            literal(1).label('resolved')
+        ).filter(
+            and_(
+                TechnicalDebt.user_id == user_id,
+                TechnicalDebt.resolved_at >= start_date
             )
-            .filter(
-                and_(
-                    TechnicalDebt.user_id == user_id,
-                    TechnicalDebt.resolved_at >= start_date
-                )
+        )
+        events = created_events.union_all(resolved_events).subquery()
+        daily_counts = (self.db.query(
+                events.c.date,
+                func.sum(events.c.created),
+                func.sum(events.c.resolved)
             )
-            .group_by(func.date(TechnicalDebt.resolved_at))
+            .group_by(events.c.date)
+            .order_by(events.c.date)
             .all())
         
         # 计算净增长
-        date_data = {}
-        for date, created in daily_created:
-            date_data[date] = {'created': created, 'resolved': 0}
-        
-        for date, resolved in daily_resolved:
-            if date in date_data:
-                date_data[date]['resolved'] = resolved
-            else:
-                date_data[date] = {'created': 0, 'resolved': resolved}
-        
-        trend_data = []
-        for date in sorted(date_data.keys()):
-            data = date_data[date]
-            net_change = data['created'] - data['resolved']
-            trend_data.append({
-                'date': date.isoformat(),
-                'created': data['created'],
-                'resolved': data['resolved'],
-                'net_change': net_change
-            })
+        trend_data = [{
+            'date': date.isoformat(),
+            'created': created,
+            'resolved': resolved,
+            'net_change': created - resolved
+        } for date, created, resolved in daily_counts]
         
         return {
             'period_days': days,
@@ -582,94 +836,23 @@ class TechnicalDebtService:
         # 获取用户的技术债务统计
         summary = self.get_user_debt_summary(user_id)
         
-        suggestions = []
-        
-        # 基于严重性分布的建议
+        # 先汇总规则用到的各项指标，再依次套用规则表
         severity_counts = {item['severity']: item['count'] for item in summary['severity_distribution']}
-        
-        if severity_counts.get('critical', 0) > 0:
-            suggestions.append({
-                'type': 'urgent_action',
-                'priority': 'high',
-                'title': 'Address Critical Issues',
-                'description': f"You have {severity_counts['critical']} critical technical debt issues that need immediate attention.",
-                'action_items': [
-                    'Review all critical security vulnerabilities',
-                    'Fix hardcoded secrets and credentials',
-                    'Address critical performance bottlenecks'
-                ]
-            })
-        
-        if severity_counts.get('high', 0) > 5:
-            suggestions.append({
-                'type': 'code_quality',
-                'priority': 'medium',
-                'title': 'Improve Code Quality',
-                'description': f"You have {severity_counts['high']} high-severity issues affecting code quality.",
-                'action_items': [
-                    'Refactor complex functions',
-                    'Reduce code duplication',
-                    'Improve error handling'
-                ]
-            })
-        
-        # 基于类型分布的建议
         type_counts = {item['debt_type']: item['count'] for item in summary['type_distribution']}
+        metrics = {
+            'critical': severity_counts.get('critical', 0),
+            'high': severity_counts.get('high', 0),
+            'security': type_counts.get('security', 0),
+            'performance': type_counts.get('performance', 0),
+            'total_debts': summary['summary']['total_debts'],
+            'resolution_rate': summary['summary']['resolution_rate']
+        }
         
-        if type_counts.get('security', 0) > 0:
-            suggestions.append({
-                'type': 'security',
-                'priority': 'high',
-                'title': 'Security Review Required',
-                'description': f"Found {type_counts['security']} security-related issues.",
-                'action_items': [
-                    'Conduct security code review',
-                    'Implement secure coding practices',
-                    'Use security scanning tools'
-                ]
-            })
-        
-        if type_counts.get('performance', 0) > 3:
-            suggestions.append({
-                'type': 'performance',
-                'priority': 'medium',
-                'title': 'Performance Optimization',
-                'description': f"Multiple performance issues detected ({type_counts['performance']} issues).",
-                'action_items': [
-                    'Profile application performance',
-                    'Optimize database queries',
-                    'Implement caching strategies'
-                ]
-            })
-        
-        # 基于总体情况的建议
-        if summary['summary']['total_debts'] > 20:
-            suggestions.append({
-                'type': 'process',
-                'priority': 'medium',
-                'title': 'Establish Debt Management Process',
-                'description': 'High volume of technical debt suggests need for better processes.',
-                'action_items': [
-                    'Implement regular code reviews',
-                    'Set up automated code quality checks',
-                    'Allocate time for debt reduction in sprints'
-                ]
-            })
-        
-        if summary['summary']['resolution_rate'] < 50:
-            suggestions.append({
-                'type': 'workflow',
-                'priority': 'low',
-                'title': 'Improve Debt Resolution Rate',
-                'description': f"Current resolution rate is {summary['summary']['resolution_rate']:.1f}%.",
-                'action_items': [
-                    'Prioritize debt resolution tasks',
-                    'Break down large debt items',
-                    'Track resolution progress regularly'
-                ]
-            })
-        
-        return suggestions
+        return [{
+            **template,
+            'description': template['description'].format(**metrics),
+            'action_items': list(template['action_items'])
+        } for applies, template in _IMPROVEMENT_SUGGESTION_RULES if applies(metrics)]
     
     def get_debt_metrics_overview(self, user_id: int) -> Dict[str, Any]:
         """获取技术债务指标概览"""
@@ -680,26 +863,27 @@ class TechnicalDebtService:
         # 计算关键指标
         debt_velocity = trends['summary']['net_change'] / 30  # 每日净增长
         
-        # 债务密度（每个编程会话的平均债务数）
-        recent_sessions = (self.db.query(func.count(CodingSession.id))
-                          .filter(
-                              and_(
-                                  CodingSession.user_id == user_id,
-                                  CodingSession.created_at >= datetime.utcnow() - timedelta(days=30)
-                              )
-                          )
-                          .scalar())
+        # 近30天会话数和未解决债务的平均年龄（两个标量子查询合并为一次查询）
+        now = datetime.utcnow()
+        recent_sessions_count = self.db.query(func.count(CodingSession.id)).filter(
+            and_(
+                CodingSession.user_id == user_id,
+                CodingSession.created_at >= now - timedelta(days=30)
+            )
+        ).scalar_subquery()
+        open_debt_avg_age = self.db.query(func.avg(self._debt_age_days_expression(now))).filter(
+            and_(
+                TechnicalDebt.user_id == user_id,
+                TechnicalDebt.status == 'open'
+            )
+        ).scalar_subquery()
+        recent_sessions, avg_age_days = self.db.query(recent_sessions_count, open_debt_avg_age).one()
         
+        # 债务密度（每个编程会话的平均债务数）
         debt_density = summary['summary']['total_debts'] / max(recent_sessions, 1)
         
-        # 债务年龄（平均未解决时间）
-        open_debts = self.get_technical_debts(user_id=user_id, status='open')
-        if open_debts:
-            avg_age_days = sum(
-                (datetime.utcnow() - debt.created_at).days for debt in open_debts
-            ) / len(open_debts)
-        else:
-            avg_age_days = 0
+        # 债务年龄（平均未解决时间，整天数）
+        avg_age_days = float(avg_age_days) if avg_age_days is not None else 0
         
         # 健康评分（0-100）
         health_score = self._calculate_debt_health_score(summary, debt_velocity, avg_age_days)
@@ -722,6 +906,13 @@ class TechnicalDebtService:
             }
         }
     
+    def _debt_age_days_expression(self, now: datetime):
+        """SQL表达式：债务创建至now的整天数，供数据库端聚合，不加载债务对象"""
+        if self.db.get_bind().dialect.name == 'sqlite':
+            # julianday相减得到天数，转换为整数舍去不足一天的部分
+            return cast(func.julianday(now) - func.julianday(TechnicalDebt.created_at), Integer)
+        return func.floor(func.extract('epoch', now - TechnicalDebt.created_at) / 86400)
+    
     def _calculate_debt_health_score(self, summary: Dict, velocity: float, avg_age: float) -> int:
         """计算技术债务健康评分"""
         score = 100
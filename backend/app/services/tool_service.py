@@ -3,7 +3,9 @@
 工具业务逻辑服务
 """
 
+import asyncio
 from typing import List, Optional
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -57,17 +59,22 @@ class ToolService:
         return tool
     
     def update_tool(self, tool_id: int, tool_data: ToolUpdate) -> Optional[Tool]:
-        """更新工具"""
-        tool = self.get_tool(tool_id)
-        if not tool:
-            return None
-        
+        """更新工具（单条 UPDATE ... RETURNING，无需先查询整行）"""
         update_data = tool_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(tool, field, value)
+        if not update_data:
+            return self.get_tool(tool_id)
+        
+        tool = self.db.execute(
+            update(Tool)
+            .where(Tool.id == tool_id)
+            .values(**update_data)
+            .returning(Tool)
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        if tool is None:
+            return None
         
         self.db.commit()
-        self.db.refresh(tool)
         
         return tool
     
@@ -83,7 +90,15 @@ class ToolService:
         return True
     
     async def execute_tool(self, tool_id: int, execution_data: ToolExecutionCreate) -> Optional[ToolExecution]:
-        """执行工具"""
+        """
+        执行工具
+        
+        数据库读写为阻塞调用，放到工作线程中执行，避免阻塞事件循环上的其他请求
+        """
+        return await asyncio.to_thread(self._execute_tool, tool_id, execution_data)
+    
+    def _execute_tool(self, tool_id: int, execution_data: ToolExecutionCreate) -> Optional[ToolExecution]:
+        """执行工具并记录执行结果（同步部分）"""
         tool = self.get_tool(tool_id)
         if not tool:
             return None
@@ -95,14 +110,13 @@ class ToolService:
             status="running"
         )
         
-        self.db.add(execution)
-        self.db.commit()
-        
         # TODO: 实现实际的工具执行逻辑
         execution.output_data = {"result": "执行成功"}
         execution.status = "success"
         execution.completed_at = datetime.utcnow()
         
+        # 工具同步执行完毕后再写入，执行记录连同结果只需一次INSERT和一次提交
+        self.db.add(execution)
         self.db.commit()
         self.db.refresh(execution)
         
@@ -4,10 +4,11 @@
 处理用户相关的业务逻辑
 """
 
-from typing import List, Optional, Dict, Any
+from copy import deepcopy
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc
+from sqlalchemy.orm import Session, object_session, selectinload
+from sqlalchemy import and_, or_, func, desc, tuple_, event, literal, Date, update, exists
 
 from ..models.user import User
 from ..models.coding_session import CodingSession
@@ -17,10 +18,79 @@ from ..models.technical_debt import TechnicalDebt
 from ..schemas.user import UserCreate, UserUpdate
 from ..core.exceptions import UserNotFoundError, UserAlreadyExistsError
 from ..core.security import get_password_hash, verify_password
+from ..core.config import settings
+from ..core.database import SessionLocal
 from ..core.logger import get_logger
+from ._summary_cache import TTLCache
 
 logger = get_logger(__name__)
 
+# 用户ID -> 仪表板数据；相关模型发生写入时由下方的事件监听器失效
+_dashboard_cache = TTLCache(
+    settings.dashboard_cache_ttl_seconds, settings.dashboard_cache_enabled
+)
+
+# 仪表板数据依赖的模型
+_DASHBOARD_SOURCE_MODELS = (User, CodingSession, SkillAssessment, LearningTask, TechnicalDebt)
+
+
+# 会话info中记录待失效仪表板缓存的用户ID集合的键；集合中的None表示需要清空全部缓存
+_DASHBOARD_DIRTY_KEY = 'dashboard_dirty_user_ids'
+
+
+def _mark_dashboard_dirty(session: Optional[Session], user_id: Optional[int]) -> None:
+    """记录会话中写入涉及的用户，待事务提交后再使其仪表板缓存失效"""
+    if session is not None:
+        session.info.setdefault(_DASHBOARD_DIRTY_KEY, set()).add(user_id)
+
+
+def _mark_dashboard_dirty_on_flush(mapper, connection, target) -> None:
+    """ORM刷新写入单条记录后，记录其所属用户"""
+    _mark_dashboard_dirty(
+        object_session(target), target.id if isinstance(target, User) else target.user_id
+    )
+
+
+def _mark_dashboard_dirty_on_bulk_dml(orm_execute_state) -> None:
+    """
+    批量 INSERT/UPDATE/DELETE 语句不触发映射器事件
+    
+    语句通过执行选项 dashboard_user_ids 声明了涉及的用户时只记录这些用户，否则无法得知涉及哪些用户，
+    提交后清空全部仪表板缓存
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if not any(mapper.class_ in _DASHBOARD_SOURCE_MODELS for mapper in orm_execute_state.all_mappers):
+        return
+    for user_id in orm_execute_state.execution_options.get('dashboard_user_ids', (None,)):
+        _mark_dashboard_dirty(orm_execute_state.session, user_id)
+
+
+def _invalidate_dashboard_after_commit(session: Session) -> None:
+    """事务提交后使记录的用户的仪表板缓存失效，避免并发读取在提交前把旧数据重新写入缓存"""
+    user_ids = session.info.pop(_DASHBOARD_DIRTY_KEY, None)
+    if not user_ids:
+        return
+    if None in user_ids:
+        _dashboard_cache.invalidate()
+    else:
+        for user_id in user_ids:
+            _dashboard_cache.invalidate(user_id)
+
+
+def _discard_dashboard_dirty_after_rollback(session: Session) -> None:
+    """事务回滚后数据未变，丢弃记录的用户，不使缓存失效"""
+    session.info.pop(_DASHBOARD_DIRTY_KEY, None)
+
+
+for _model in _DASHBOARD_SOURCE_MODELS:
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _mark_dashboard_dirty_on_flush)
+# 只监听应用的会话工厂创建的会话，其他会话（如脚本、测试自建的会话）执行的语句不受影响
+event.listen(SessionLocal, 'do_orm_execute', _mark_dashboard_dirty_on_bulk_dml)
+event.listen(Session, 'after_commit', _invalidate_dashboard_after_commit)
+event.listen(Session, 'after_rollback', _discard_dashboard_dirty_after_rollback)
+
 
 class UserService:
     """用户服务类"""
@@ -28,44 +98,67 @@ class UserService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_users(self, skip: int = 0, limit: int = 100, 
-                  search: Optional[str] = None,
-                  is_active: Optional[bool] = None) -> List[User]:
-        """获取用户列表"""
-        query = self.db.query(User)
+    @staticmethod
+    def _user_list_filters(search: Optional[str] = None,
+                           is_active: Optional[bool] = None) -> list:
+        """
+        构建用户列表的过滤条件，列表与计数共用同一组条件
+        
+        搜索使用 ILIKE '%关键字%'，PostgreSQL下由用户表的三元组GIN索引支持
+        """
+        filters = []
         
         # 搜索过滤
         if search:
-            search_filter = or_(
+            filters.append(or_(
                 User.username.ilike(f"%{search}%"),
                 User.email.ilike(f"%{search}%"),
                 User.full_name.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+            ))
         
         # 状态过滤
         if is_active is not None:
-            query = query.filter(User.is_active == is_active)
+            filters.append(User.is_active == is_active)
+        
+        return filters
+    
+    def get_users(self, skip: int = 0, limit: int = 100, 
+                  search: Optional[str] = None,
+                  is_active: Optional[bool] = None) -> List[User]:
+        """获取用户列表"""
+        query = self.db.query(User).filter(*self._user_list_filters(search, is_active))
         
         return query.offset(skip).limit(limit).all()
     
     def get_user_count(self, search: Optional[str] = None,
                       is_active: Optional[bool] = None) -> int:
         """获取用户总数"""
-        query = self.db.query(func.count(User.id))
+        query = self.db.query(func.count()).select_from(User).filter(*self._user_list_filters(search, is_active))
         
-        if search:
-            search_filter = or_(
-                User.username.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
-                User.full_name.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+        return query.scalar()
+    
+    def get_users_page(self, skip: int = 0, limit: int = 100,
+                       search: Optional[str] = None,
+                       is_active: Optional[bool] = None) -> Tuple[List[User], int]:
+        """
+        获取一页用户及满足条件的总数
+        
+        总数通过窗口函数 count(*) OVER () 随分页结果一并返回，
+        相比分别调用get_users和get_user_count少一次查询
+        
+        Returns:
+            (当前页用户列表, 总数)
+        """
+        rows = (self.db.query(User, func.count().over().label('total'))
+                .filter(*self._user_list_filters(search, is_active))
+                .offset(skip).limit(limit).all())
         
-        if is_active is not None:
-            query = query.filter(User.is_active == is_active)
+        if rows:
+            return [user for user, _ in rows], rows[0].total
         
-        return query.scalar()
+        # 偏移量超出范围时窗口函数没有行可返回，此时单独统计总数
+        total = self.get_user_count(search, is_active) if skip > 0 else 0
+        return [], total
     
     def get_user_by_id(self, user_id: int) -> User:
         """根据ID获取用户"""
@@ -82,14 +175,29 @@ class UserService:
         """根据邮箱获取用户"""
         return self.db.query(User).filter(User.email == email).first()
     
+    def username_exists(self, username: str, exclude_user_id: Optional[int] = None) -> bool:
+        """用户名是否已被（除exclude_user_id外的）用户占用，使用EXISTS查询而不加载整行"""
+        condition = User.username == username
+        if exclude_user_id is not None:
+            condition = and_(condition, User.id != exclude_user_id)
+        return self.db.query(exists().where(condition)).scalar()
+    
+    def email_exists(self, email: str, exclude_user_id: Optional[int] = None) -> bool:
+        """邮箱是否已被（除exclude_user_id外的）用户占用，使用EXISTS查询而不加载整行"""
+        condition = User.email == email
+        if exclude_user_id is not None:
+            condition = and_(condition, User.id != exclude_user_id)
+        return self.db.query(exists().where(condition)).scalar()
+    
     def create_user(self, user_data: UserCreate) -> User:
         """创建用户"""
-        # 检查用户名是否已存在
-        if self.get_user_by_username(user_data.username):
+        # 检查用户名或邮箱是否已存在（一次查询，两个唯一列各最多命中一行；用户名冲突优先报告）
+        existing = (self.db.query(User.username, User.email)
+                    .filter(or_(User.username == user_data.username, User.email == user_data.email))
+                    .all())
+        if any(row.username == user_data.username for row in existing):
             raise UserAlreadyExistsError(f"Username {user_data.username} already exists")
-        
-        # 检查邮箱是否已存在
-        if self.get_user_by_email(user_data.email):
+        if existing:
             raise UserAlreadyExistsError(f"Email {user_data.email} already exists")
         
         # 创建用户
@@ -112,34 +220,41 @@ class UserService:
         return db_user
     
     def update_user(self, user_id: int, user_data: UserUpdate) -> User:
-        """更新用户"""
-        user = self.get_user_by_id(user_id)
-        
-        # 检查用户名冲突
-        if user_data.username and user_data.username != user.username:
-            existing_user = self.get_user_by_username(user_data.username)
-            if existing_user:
-                raise UserAlreadyExistsError(f"Username {user_data.username} already exists")
+        """更新用户（单条 UPDATE ... RETURNING，无需先查询整行）"""
+        # 检查用户名冲突（新用户名已被其他用户占用）
+        if user_data.username and self.username_exists(user_data.username, exclude_user_id=user_id):
+            raise UserAlreadyExistsError(f"Username {user_data.username} already exists")
         
         # 检查邮箱冲突
-        if user_data.email and user_data.email != user.email:
-            existing_user = self.get_user_by_email(user_data.email)
-            if existing_user:
-                raise UserAlreadyExistsError(f"Email {user_data.email} already exists")
+        if user_data.email and self.email_exists(user_data.email, exclude_user_id=user_id):
+            raise UserAlreadyExistsError(f"Email {user_data.email} already exists")
         
         # 更新字段
         update_data = user_data.dict(exclude_unset=True)
         if 'password' in update_data:
             update_data['hashed_password'] = get_password_hash(update_data.pop('password'))
         
-        for field, value in update_data.items():
-            setattr(user, field, value)
+        # 只有模型中存在的列会被持久化，其余字段忽略
+        update_data = {
+            field: value for field, value in update_data.items()
+            if field in User.__table__.columns
+        }
+        update_data['updated_at'] = datetime.utcnow()
+        
+        user = self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(**update_data)
+            .returning(User)
+            .execution_options(populate_existing=True, dashboard_user_ids=(user_id,))
+        ).scalar_one_or_none()
+        if user is None:
+            raise UserNotFoundError(f"User with id {user_id} not found")
         
-        user.updated_at = datetime.utcnow()
+        username = user.username
         self.db.commit()
-        self.db.refresh(user)
         
-        logger.info(f"Updated user: {user.username} (ID: {user.id})")
+        logger.info(f"Updated user: {username} (ID: {user_id})")
         return user
     
     def delete_user(self, user_id: int) -> bool:
@@ -167,85 +282,157 @@ class UserService:
         
         return user
     
+    @staticmethod
+    def _relation_loader_options(model, load_relations: Tuple[str, ...]) -> list:
+        """将关系名称转换为selectinload选项，按需一次性预加载以避免逐行懒加载"""
+        return [selectinload(getattr(model, name)) for name in load_relations]
+    
+    @staticmethod
+    def _paginate(query, model, skip: int, limit: int,
+                  cursor: Optional[Tuple[datetime, int]]) -> list:
+        """
+        按 (created_at, id) 倒序分页
+        
+        传入cursor时使用键集分页：只返回排在cursor之后的记录并忽略skip，
+        翻页开销不随页数增长；下一页的cursor为本页最后一条记录的 (created_at, id)
+        """
+        if cursor:
+            query = query.filter(tuple_(model.created_at, model.id) < tuple_(*cursor))
+        
+        query = query.order_by(desc(model.created_at), desc(model.id))
+        if not cursor:
+            query = query.offset(skip)
+        
+        return query.limit(limit).all()
+    
     def get_user_coding_sessions(self, user_id: int, 
                                skip: int = 0, limit: int = 100,
-                               status: Optional[str] = None) -> List[CodingSession]:
+                               status: Optional[str] = None,
+                               load_relations: Tuple[str, ...] = (),
+                               cursor: Optional[Tuple[datetime, int]] = None) -> List[CodingSession]:
         """获取用户的编程会话"""
-        query = self.db.query(CodingSession).filter(CodingSession.user_id == user_id)
+        query = (self.db.query(CodingSession)
+                 .filter(CodingSession.user_id == user_id)
+                 .options(*self._relation_loader_options(CodingSession, load_relations)))
         
         if status:
             query = query.filter(CodingSession.status == status)
         
-        return query.order_by(desc(CodingSession.created_at)).offset(skip).limit(limit).all()
+        return self._paginate(query, CodingSession, skip, limit, cursor)
     
     def get_user_skill_assessments(self, user_id: int,
-                                 skip: int = 0, limit: int = 100) -> List[SkillAssessment]:
+                                 skip: int = 0, limit: int = 100,
+                                 load_relations: Tuple[str, ...] = (),
+                                 cursor: Optional[Tuple[datetime, int]] = None) -> List[SkillAssessment]:
         """获取用户的技能评估"""
-        return (self.db.query(SkillAssessment)
-                .filter(SkillAssessment.user_id == user_id)
-                .order_by(desc(SkillAssessment.created_at))
-                .offset(skip).limit(limit).all())
+        query = (self.db.query(SkillAssessment)
+                 .filter(SkillAssessment.user_id == user_id)
+                 .options(*self._relation_loader_options(SkillAssessment, load_relations)))
+        
+        return self._paginate(query, SkillAssessment, skip, limit, cursor)
     
     def get_user_learning_tasks(self, user_id: int,
                               skip: int = 0, limit: int = 100,
-                              status: Optional[str] = None) -> List[LearningTask]:
+                              status: Optional[str] = None,
+                              load_relations: Tuple[str, ...] = (),
+                              cursor: Optional[Tuple[datetime, int]] = None) -> List[LearningTask]:
         """获取用户的学习任务"""
-        query = self.db.query(LearningTask).filter(LearningTask.user_id == user_id)
+        query = (self.db.query(LearningTask)
+                 .filter(LearningTask.user_id == user_id)
+                 .options(*self._relation_loader_options(LearningTask, load_relations)))
         
         if status:
             query = query.filter(LearningTask.status == status)
         
-        return query.order_by(desc(LearningTask.created_at)).offset(skip).limit(limit).all()
+        return self._paginate(query, LearningTask, skip, limit, cursor)
     
     def get_user_technical_debts(self, user_id: int,
                                skip: int = 0, limit: int = 100,
-                               status: Optional[str] = None) -> List[TechnicalDebt]:
+                               status: Optional[str] = None,
+                               load_relations: Tuple[str, ...] = (),
+                               cursor: Optional[Tuple[datetime, int]] = None) -> List[TechnicalDebt]:
         """获取用户的技术债务"""
-        query = self.db.query(TechnicalDebt).filter(TechnicalDebt.user_id == user_id)
+        query = (self.db.query(TechnicalDebt)
+                 .filter(TechnicalDebt.user_id == user_id)
+                 .options(*self._relation_loader_options(TechnicalDebt, load_relations)))
         
         if status:
             query = query.filter(TechnicalDebt.status == status)
         
-        return query.order_by(desc(TechnicalDebt.created_at)).offset(skip).limit(limit).all()
+        return self._paginate(query, TechnicalDebt, skip, limit, cursor)
     
     def get_user_dashboard_data(self, user_id: int) -> Dict[str, Any]:
-        """获取用户仪表板数据"""
+        """
+        获取用户仪表板数据
+        
+        结果按用户在进程内缓存（TTL见dashboard_cache_ttl_seconds），
+        相关记录写入时缓存立即失效；返回的是副本，调用方修改不会影响缓存
+        """
+        hit, dashboard = _dashboard_cache.get(user_id)
+        if not hit:
+            dashboard = self._build_dashboard_data(user_id)
+            _dashboard_cache.set(user_id, dashboard)
+        
+        return deepcopy(dashboard)
+    
+    def _build_dashboard_data(self, user_id: int) -> Dict[str, Any]:
+        """从数据库汇总用户仪表板数据"""
         user = self.get_user_by_id(user_id)
         
-        # 统计数据
+        # 统计数据（五个标量子查询合并为一次查询）
         total_sessions = self.db.query(func.count(CodingSession.id)).filter(
             CodingSession.user_id == user_id
-        ).scalar()
+        ).scalar_subquery()
         
         active_sessions = self.db.query(func.count(CodingSession.id)).filter(
             and_(
                 CodingSession.user_id == user_id,
                 CodingSession.status == 'active'
             )
-        ).scalar()
+        ).scalar_subquery()
         
         total_assessments = self.db.query(func.count(SkillAssessment.id)).filter(
             SkillAssessment.user_id == user_id
-        ).scalar()
+        ).scalar_subquery()
         
         pending_tasks = self.db.query(func.count(LearningTask.id)).filter(
             and_(
                 LearningTask.user_id == user_id,
                 LearningTask.status == 'pending'
             )
-        ).scalar()
+        ).scalar_subquery()
         
         open_debts = self.db.query(func.count(TechnicalDebt.id)).filter(
             and_(
                 TechnicalDebt.user_id == user_id,
                 TechnicalDebt.status == 'open'
             )
-        ).scalar()
-        
-        # 最近活动
-        recent_sessions = self.get_user_coding_sessions(user_id, limit=5)
-        recent_assessments = self.get_user_skill_assessments(user_id, limit=3)
-        recent_tasks = self.get_user_learning_tasks(user_id, limit=5)
+        ).scalar_subquery()
+        
+        (total_sessions, active_sessions, total_assessments,
+         pending_tasks, open_debts) = self.db.query(
+            total_sessions, active_sessions, total_assessments, pending_tasks, open_debts
+        ).one()
+        
+        # 最近活动（只查询展示用到的列，返回轻量的行元组而非完整实体）
+        recent_sessions = (self.db.query(CodingSession.id, CodingSession.title,
+                                         CodingSession.status, CodingSession.created_at)
+                          .filter(CodingSession.user_id == user_id)
+                          .order_by(desc(CodingSession.created_at))
+                          .limit(5)
+                          .all())
+        recent_assessments = (self.db.query(SkillAssessment.id, SkillAssessment.skill_type,
+                                            SkillAssessment.score, SkillAssessment.created_at)
+                             .filter(SkillAssessment.user_id == user_id)
+                             .order_by(desc(SkillAssessment.created_at))
+                             .limit(3)
+                             .all())
+        recent_tasks = (self.db.query(LearningTask.id, LearningTask.title, LearningTask.status,
+                                      LearningTask.priority, LearningTask.created_at)
+                       .filter(LearningTask.user_id == user_id)
+                       .order_by(desc(LearningTask.created_at))
+                       .limit(5)
+                       .all())
         
         # 技能趋势（最近30天）
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
@@ -320,43 +507,47 @@ class UserService:
         """获取用户活动摘要"""
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # 编程会话活动
-        session_activity = (self.db.query(
-                func.date(CodingSession.created_at).label('date'),
-                func.count(CodingSession.id).label('count')
-            )
-            .filter(
-                and_(
-                    CodingSession.user_id == user_id,
-                    CodingSession.created_at >= start_date
-                )
+        # 每日编程会话数和完成的学习任务数：两类事件用UNION ALL合并后在数据库端按日期汇总、排序，
+        # 一次查询完成。显式声明Date类型，使SQLite返回的日期字符串也转换为date对象
+        session_events = self.db.query(
+            func.date(CodingSession.created_at, type_=Date).label('date'),
+            literal(1).label('sessions'),
+            literal(0).label('completed_tasks')
+        ).filter(
+            and_(
+                CodingSession.user_id == user_id,
+                CodingSession.created_at >= start_date
             )
-            .group_by(func.date(CodingSession.created_at))
-            .all())
-        
-        # 学习任务完成情况
-        task_completion = (self.db.query(
-                func.date(LearningTask.completed_at).label('date'),
-                func.count(LearningTask.id).label('count')
+        )
+        task_events = self.db.query(
+            func.date(LearningTask.completed_at, type_=Date).label('date'),
+            literal(0).label('sessions'),
+            literal(1).label('completed_tasks')
+        ).filter(
+            and_(
+                LearningTask.user_id == user_id,
+                LearningTask.status == 'completed',
+                LearningTask.completed_at >= start_date
             )
-            .filter(
-                and_(
-                    LearningTask.user_id == user_id,
-                    LearningTask.status == 'completed',
-                    LearningTask.completed_at >= start_date
-                )
+        )
+        events = session_events.union_all(task_events).subquery()
+        daily_counts = (self.db.query(
+                events.c.date,
+                func.sum(events.c.sessions),
+                func.sum(events.c.completed_tasks)
             )
-            .group_by(func.date(LearningTask.completed_at))
+            .group_by(events.c.date)
+            .order_by(events.c.date)
             .all())
         
         return {
             "period_days": days,
             "session_activity": [{
                 "date": date.isoformat(),
-                "sessions": count
-            } for date, count in session_activity],
+                "sessions": sessions
+            } for date, sessions, _ in daily_counts if sessions],
             "task_completion": [{
                 "date": date.isoformat(),
-                "completed_tasks": count
-            } for date, count in task_completion]
+                "completed_tasks": completed_tasks
+            } for date, _, completed_tasks in daily_counts if completed_tasks]
         }
\ No newline at end of file
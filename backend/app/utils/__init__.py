@@ -4,11 +4,12 @@
 """
 
 from .logger import get_logger
-from .ai_client import AIClient
+from .ai_client import AIClient, get_ai_client
 from .mcp_client import MCPClient
 
 __all__ = [
     "get_logger",
     "AIClient",
+    "get_ai_client",
     "MCPClient",
 ]
\ No newline at end of file
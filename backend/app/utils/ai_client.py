@@ -3,12 +3,27 @@
 AI 模型客户端工具
 """
 
-from typing import Optional, Dict, Any, List
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from app.core.config import settings
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 每个AI服务客户端的HTTP连接池上限；客户端在进程内复用，连接保持存活以省去重复的TLS握手
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# 嵌入接口单次请求的最大输入条数
+EMBEDDING_BATCH_SIZE = 2048
+
+# 嵌入缓存：(文本摘要, 模型) -> 嵌入向量，按最近使用淘汰
+_EMBEDDING_CACHE_SIZE = 10000
+_embedding_cache: "OrderedDict[Tuple[bytes, str], List[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
 
 class AIClient:
     """AI 模型客户端"""
@@ -18,12 +33,24 @@ class AIClient:
         self.anthropic_client = None
         self._init_clients()
     
+    @staticmethod
+    def _http_limits():
+        """构建HTTP连接池限制（httpx随openai/anthropic库一同安装）"""
+        import httpx
+        return httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+        )
+    
     def _init_clients(self):
         """初始化 AI 客户端"""
         try:
             if settings.openai_api_key:
                 import openai
-                self.openai_client = openai.OpenAI(api_key=settings.openai_api_key)
+                self.openai_client = openai.OpenAI(
+                    api_key=settings.openai_api_key,
+                    http_client=openai.DefaultHttpxClient(limits=self._http_limits())
+                )
                 logger.info("OpenAI 客户端初始化成功")
         except ImportError:
             logger.warning("OpenAI 库未安装")
@@ -33,7 +60,10 @@ class AIClient:
         try:
             if settings.anthropic_api_key:
                 import anthropic
-                self.anthropic_client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
+                self.anthropic_client = anthropic.Anthropic(
+                    api_key=settings.anthropic_api_key,
+                    http_client=anthropic.DefaultHttpxClient(limits=self._http_limits())
+                )
                 logger.info("Anthropic 客户端初始化成功")
         except ImportError:
             logger.warning("Anthropic 库未安装")
@@ -98,20 +128,69 @@ class AIClient:
         model: str = "text-embedding-ada-002"
     ) -> Optional[List[float]]:
         """生成文本嵌入"""
-        try:
-            if self.openai_client:
-                response = self.openai_client.embeddings.create(
-                    model=model,
-                    input=text
-                )
-                return response.data[0].embedding
-            else:
-                logger.error("OpenAI 客户端未初始化")
-                return None
+        embeddings = await self.generate_embeddings([text], model)
+        return embeddings[0] if embeddings else None
+    
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        model: str = "text-embedding-ada-002"
+    ) -> Optional[List[List[float]]]:
+        """
+        批量生成文本嵌入
         
-        except Exception as e:
-            logger.error(f"生成嵌入失败: {e}")
+        相同内容的文本只请求一次并在进程内缓存；未命中缓存的文本去重后按
+        EMBEDDING_BATCH_SIZE 分批请求，每批一次API调用。
+        
+        Returns:
+            与texts顺序一致的嵌入列表，失败时返回None
+        """
+        if not self.openai_client:
+            logger.error("OpenAI 客户端未初始化")
             return None
+        
+        keys = [
+            (hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest(), model)
+            for text in texts
+        ]
+        embeddings: Dict[Tuple[bytes, str], List[float]] = {}
+        missing: Dict[Tuple[bytes, str], str] = {}
+        with _embedding_cache_lock:
+            for key, text in zip(keys, texts):
+                cached = _embedding_cache.get(key)
+                if cached is not None:
+                    _embedding_cache.move_to_end(key)
+                    embeddings[key] = cached
+                else:
+                    missing.setdefault(key, text)
+        
+        if missing:
+            pending = list(missing.items())
+            fetched = {}
+            try:
+                for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+                    batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+                    response = self.openai_client.embeddings.create(
+                        model=model,
+                        input=[text for _, text in batch]
+                    )
+                    # 返回结果带有输入序号，按序号对应回输入
+                    for item in response.data:
+                        fetched[batch[item.index][0]] = item.embedding
+            except Exception as e:
+                logger.error(f"生成嵌入失败: {e}")
+                return None
+            
+            embeddings.update(fetched)
+            with _embedding_cache_lock:
+                for key, embedding in fetched.items():
+                    _embedding_cache[key] = embedding
+                    _embedding_cache.move_to_end(key)
+                while len(_embedding_cache) > _EMBEDDING_CACHE_SIZE:
+                    _embedding_cache.popitem(last=False)
+        
+        # 返回副本，调用方修改结果不会影响缓存
+        return [list(embeddings[key]) for key in keys]
     
     def is_available(self, provider: str = "openai") -> bool:
         """检查 AI 服务是否可用"""
@@ -120,4 +199,19 @@ class AIClient:
         elif provider == "anthropic":
             return self.anthropic_client is not None
         else:
-            return False
\ No newline at end of file
+            return False
+
+
+# 全局AI客户端实例
+_ai_client_instance: Optional[AIClient] = None
+_ai_client_lock = threading.Lock()
+
+
+def get_ai_client() -> AIClient:
+    """获取全局AI客户端实例，各请求共享同一组HTTP连接池（并发的首次调用也只创建一个实例）"""
+    global _ai_client_instance
+    if _ai_client_instance is None:
+        with _ai_client_lock:
+            if _ai_client_instance is None:
+                _ai_client_instance = AIClient()
+    return _ai_client_instance
@@ -149,6 +149,7 @@ def create_sample_data():
         # 创建技术债务记录
         technical_debt = TechnicalDebt(
             code_record_id=code_record.id,
+            user_id=user.id,
             title="缺少输入验证",
             description="用户模型缺少邮箱格式和密码强度验证",
             debt_type="code_smell",
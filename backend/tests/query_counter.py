@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+测试共用的SQL语句计数工具
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+@contextmanager
+def count_queries(session):
+    """
+    记录上下文内会话执行的SQL语句，用于约束查询次数、防止N+1回归
+    
+    Yields:
+        (statement, parameters) 列表
+    """
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    engine = session.get_bind()
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
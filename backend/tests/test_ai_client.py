@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+AI客户端单元测试
+"""
+
+import threading
+import time
+import pytest
+from collections import OrderedDict
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.utils import ai_client
+from app.utils.ai_client import AIClient, get_ai_client
+from app.services import ai_service
+from app.services.ai_service import AIService
+
+
+class TestSharedClients:
+    """
+    进程内共享客户端测试类
+    """
+    
+    def _call_concurrently(self, func, thread_count: int = 8):
+        """多个线程同时调用func，返回各线程的结果"""
+        barrier = threading.Barrier(thread_count)
+        results = []
+        
+        def worker():
+            barrier.wait()
+            results.append(func())
+        
+        threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_get_ai_client_creates_one_instance_under_concurrency(self):
+        """并发的首次调用只创建一个AIClient实例"""
+        created = []
+        
+        def slow_client():
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+        
+        with patch.object(ai_client, '_ai_client_instance', None), \
+                patch.object(ai_client, 'AIClient', side_effect=slow_client):
+            results = self._call_concurrently(get_ai_client)
+            
+            assert len(created) == 1
+            assert all(result is created[0] for result in results)
+            assert get_ai_client() is created[0]
+    
+    def test_ai_services_share_llm_clients(self):
+        """各请求的AIService复用同一组LLM客户端，并发的首次调用也只创建一次"""
+        created = []
+        
+        def slow_clients():
+            time.sleep(0.05)
+            created.append({'openai': object()})
+            return created[-1]
+        
+        with patch.object(ai_service, '_llm_clients', None), \
+                patch.object(ai_service, '_create_llm_clients', side_effect=slow_clients):
+            results = self._call_concurrently(lambda: AIService(None).clients)
+            
+            assert len(created) == 1
+            assert all(result is created[0] for result in results)
+            assert AIService(None).clients is created[0]
+
+
+class FakeEmbeddings:
+    """记录请求的嵌入接口，嵌入向量由文本推导，结果按序号倒序返回"""
+    
+    def __init__(self):
+        self.requests = []
+    
+    def create(self, model, input):
+        self.requests.append(list(input))
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text)), float(sum(map(ord, text)))])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class TestEmbeddingCache:
+    """
+    嵌入批量请求与缓存测试类
+    """
+    
+    @pytest.fixture
+    def fake_embeddings(self):
+        """使用空的嵌入缓存和较小的批大小"""
+        with patch.object(ai_client, '_embedding_cache', OrderedDict()), \
+                patch.object(ai_client, 'EMBEDDING_BATCH_SIZE', 2):
+            yield FakeEmbeddings()
+    
+    @pytest.fixture
+    def client(self, fake_embeddings):
+        """嵌入请求发往FakeEmbeddings的AI客户端"""
+        client = AIClient()
+        client.openai_client = SimpleNamespace(embeddings=fake_embeddings)
+        return client
+    
+    @staticmethod
+    def _expected(text):
+        return [float(len(text)), float(sum(map(ord, text)))]
+    
+    @pytest.mark.asyncio
+    async def test_batches_dedupes_and_keeps_input_order(self, client, fake_embeddings):
+        """重复文本只请求一次，按批大小分批请求，结果与输入顺序一致"""
+        texts = ["alpha", "beta", "alpha", "gamma", "delta", "beta", "epsilon"]
+        
+        embeddings = await client.generate_embeddings(texts)
+        
+        assert embeddings == [self._expected(text) for text in texts]
+        assert fake_embeddings.requests == [["alpha", "beta"], ["gamma", "delta"], ["epsilon"]]
+    
+    @pytest.mark.asyncio
+    async def test_cached_texts_are_not_requested_again(self, client, fake_embeddings):
+        """已缓存的文本不再请求，只请求未命中的文本；返回副本不影响缓存"""
+        first = await client.generate_embeddings(["alpha", "beta"])
+        first[0].append(-1.0)
+        
+        embeddings = await client.generate_embeddings(["beta", "gamma", "alpha"])
+        
+        assert embeddings == [self._expected("beta"), self._expected("gamma"), self._expected("alpha")]
+        assert fake_embeddings.requests == [["alpha", "beta"], ["gamma"]]
+        
+        # 不同模型的嵌入分别缓存
+        await client.generate_embeddings(["alpha"], model="text-embedding-3-small")
+        assert fake_embeddings.requests[-1] == ["alpha"]
+    
+    @pytest.mark.asyncio
+    async def test_least_recently_used_entries_are_evicted(self, client, fake_embeddings):
+        """缓存超出上限时淘汰最久未使用的条目"""
+        with patch.object(ai_client, '_EMBEDDING_CACHE_SIZE', 2):
+            await client.generate_embeddings(["alpha", "beta"])
+            # 访问alpha使其成为最近使用，随后写入gamma时淘汰beta
+            await client.generate_embeddings(["alpha"])
+            await client.generate_embeddings(["gamma"])
+            await client.generate_embeddings(["alpha", "beta"])
+        
+        assert fake_embeddings.requests == [["alpha", "beta"], ["gamma"], ["beta"]]
+    
+    @pytest.mark.asyncio
+    async def test_failed_request_returns_none_and_caches_nothing(self, client, fake_embeddings):
+        """请求失败时返回None，且不缓存任何结果"""
+        with patch.object(fake_embeddings, 'create', side_effect=RuntimeError("boom")):
+            assert await client.generate_embeddings(["alpha"]) is None
+        
+        assert len(ai_client._embedding_cache) == 0
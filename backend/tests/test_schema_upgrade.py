@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+已有数据库结构升级的单元测试
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.database import Base
+from app.core.schema_upgrade import upgrade_schema, _has_index
+import app.models  # noqa: F401  注册全部模型
+
+
+class TestSchemaUpgrade:
+    """
+    结构升级测试类
+    """
+    
+    @pytest.fixture
+    def engine(self):
+        """创建按当前模型建表的内存数据库"""
+        engine = create_engine("sqlite://", echo=False)
+        Base.metadata.create_all(engine)
+        
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'u1', 'u1@example.com')"))
+        
+        yield engine
+        
+        engine.dispose()
+    
+    def test_upgrade_is_idempotent_on_current_schema(self, engine):
+        """最新结构的数据库重复升级不报错"""
+        upgrade_schema(engine)
+        upgrade_schema(engine)
+        
+        with engine.connect() as conn:
+            assert _has_index(conn, 'tech_stack_assets', 'ux_tech_asset_user_lowername')
+            assert _has_index(conn, 'tech_stack_debts', 'ux_tech_debt_user_lowername')
+    
+    def test_merges_duplicates_and_creates_tech_stack_unique_indexes(self, engine):
+        """缺少唯一索引的旧库：按 (user_id, lower(technology_name)) 合并重复记录后补建索引"""
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_tech_asset_user_lowername"))
+            conn.execute(text("DROP INDEX ux_tech_debt_user_lowername"))
+            conn.execute(text(
+                "INSERT INTO tech_stack_assets (id, user_id, technology_name, category, proficiency_level, "
+                "proficiency_score, total_practice_hours, project_count, last_practiced_date, subcategory) VALUES "
+                "(1, 1, 'Python', 'language', 'beginner', 20, 1.5, 1, '2024-01-01 00:00:00', NULL), "
+                "(2, 1, 'python', 'language', 'advanced', 70, 2.5, 2, '2024-03-01 00:00:00', 'backend'), "
+                "(3, 1, 'React', 'framework', 'beginner', 10, 1, 1, NULL, NULL)"
+            ))
+            conn.execute(text(
+                "INSERT INTO tech_stack_debts (id, user_id, technology_name, category, importance_score, time_invested) "
+                "VALUES (1, 1, 'Go', 'language', 40, 2), (2, 1, 'GO', 'language', 60, 3)"
+            ))
+        
+        upgrade_schema(engine)
+        
+        with engine.connect() as conn:
+            assert _has_index(conn, 'tech_stack_assets', 'ux_tech_asset_user_lowername')
+            assert _has_index(conn, 'tech_stack_debts', 'ux_tech_debt_user_lowername')
+            # 重复记录合并到最早创建的记录：计数累加，评分和时间取最大值，空值取其他记录的值
+            assert conn.execute(text("SELECT id FROM tech_stack_assets ORDER BY id")).scalars().all() == [1, 3]
+            asset = conn.execute(text(
+                "SELECT technology_name, proficiency_level, proficiency_score, total_practice_hours, project_count, "
+                "last_practiced_date, subcategory FROM tech_stack_assets WHERE id = 1"
+            )).one()
+            assert tuple(asset) == ('Python', 'advanced', 70, 4.0, 3, '2024-03-01 00:00:00.000000', 'backend')
+            debt = conn.execute(text("SELECT id, importance_score, time_invested FROM tech_stack_debts")).all()
+            assert [tuple(row) for row in debt] == [(1, 60, 5)]
+        
+        # 补建的索引可作为upsert的冲突目标
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO tech_stack_assets (user_id, technology_name, category, proficiency_level) "
+                "VALUES (1, 'PYTHON', 'language', 'expert') "
+                "ON CONFLICT (user_id, lower(technology_name)) DO UPDATE SET proficiency_level = excluded.proficiency_level"
+            ))
+            assert conn.execute(text("SELECT proficiency_level FROM tech_stack_assets WHERE id = 1")).scalar() == 'expert'
+    
+    def test_adds_and_backfills_mcp_session_technology_tags(self, engine):
+        """缺少technology_tags列的旧库：补列并按各技术栈字段回填"""
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE mcp_sessions DROP COLUMN technology_tags"))
+            conn.execute(text(
+                "INSERT INTO mcp_sessions (id, user_id, work_type, task_description, technologies, primary_language, frameworks) "
+                "VALUES (1, 1, 'development', 't', '[\"Python\", \"FastAPI\"]', 'Python', '[\"FastAPI\"]'), "
+                "(2, 1, 'development', 't', '[]', NULL, NULL)"
+            ))
+        
+        upgrade_schema(engine)
+        upgrade_schema(engine)
+        
+        with engine.connect() as conn:
+            tags = dict(conn.execute(text("SELECT id, technology_tags FROM mcp_sessions")).all())
+        assert tags == {1: '|python|fastapi|', 2: ''}
+    
+    def test_adds_and_backfills_technical_debt_user_id(self, engine):
+        """缺少user_id列的旧库：补列、按代码记录所属会话回填，并补建按用户统计的索引"""
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_td_user_status_created"))
+            conn.execute(text("DROP INDEX ix_td_user_filters_created_id"))
+            conn.execute(text("ALTER TABLE technical_debts RENAME TO technical_debts_old"))
+            # 按旧结构（不含user_id）重建表
+            conn.execute(text(
+                "CREATE TABLE technical_debts (id INTEGER PRIMARY KEY, code_record_id INTEGER NOT NULL, "
+                "title VARCHAR(200) NOT NULL, description TEXT, debt_type VARCHAR(50) NOT NULL, "
+                "severity VARCHAR(20) NOT NULL, status VARCHAR(20), file_path VARCHAR(500), "
+                "line_start INTEGER, line_end INTEGER, code_snippet TEXT, suggested_fix TEXT, "
+                "effort_estimate INTEGER, impact_score FLOAT, detection_method VARCHAR(50), "
+                "first_detected DATETIME, last_seen DATETIME, resolved_at DATETIME, "
+                "created_at DATETIME, updated_at DATETIME)"
+            ))
+            conn.execute(text("DROP TABLE technical_debts_old"))
+            conn.execute(text("INSERT INTO coding_sessions (id, user_id) VALUES (10, 1)"))
+            conn.execute(text(
+                "INSERT INTO code_records (id, coding_session_id, file_path, file_name, change_type) "
+                "VALUES (20, 10, '/src/app.py', 'app.py', 'modify')"
+            ))
+            conn.execute(text(
+                "INSERT INTO technical_debts (id, code_record_id, title, debt_type, severity, status) "
+                "VALUES (1, 20, 'legacy', 'security', 'high', 'open')"
+            ))
+        
+        upgrade_schema(engine)
+        upgrade_schema(engine)
+        
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT user_id FROM technical_debts WHERE id = 1")).scalar() == 1
+            assert _has_index(conn, 'technical_debts', 'ix_td_user_status_created')
+            assert _has_index(conn, 'technical_debts', 'ix_td_user_filters_created_id')
+    
+    def test_creates_model_indexes_missing_on_existing_tables(self, engine):
+        """create_all 不为已存在的表补建索引：旧库缺少的组合索引和部分索引由升级补建"""
+        missing = {
+            'tech_stack_assets': 'idx_tech_asset_user_prof',
+            'tech_stack_debts': 'idx_tech_debt_active_open',
+            'learning_progress_summaries': 'idx_lps_user_generated',
+            'mcp_sessions': 'idx_mcp_session_user_created_status',
+            'coding_sessions': 'idx_coding_session_user_created_id',
+            'skill_assessments': 'idx_skill_assessment_user_created_id',
+            'learning_tasks': 'idx_learning_task_user_created_id',
+        }
+        with engine.begin() as conn:
+            for index_name in missing.values():
+                conn.execute(text(f"DROP INDEX {index_name}"))
+        
+        upgrade_schema(engine)
+        upgrade_schema(engine)
+        
+        with engine.connect() as conn:
+            for table_name, index_name in missing.items():
+                assert _has_index(conn, table_name, index_name)
+            # 部分索引保留WHERE条件
+            partial_sql = conn.execute(text(
+                "SELECT sql FROM sqlite_master WHERE name = 'idx_tech_debt_active_open'"
+            )).scalar()
+            assert 'WHERE' in partial_sql
+            # PostgreSQL专用的三元组索引在SQLite下不创建
+            assert not _has_index(conn, 'users', 'idx_user_username_trgm')
@@ -7,17 +7,22 @@ import pytest
 import tempfile
 import os
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import patch, MagicMock
 
+from app.core.config import settings
 from app.core.database import Base
 from app.services.tech_stack_summary_agent import TechStackSummaryAgent
 from app.services.tech_stack_data_service import TechStackDataService
 from app.models.user import User
 from app.models.mcp_session import MCPSession
 from app.models.learning_progress import TechStackAsset, TechStackDebt
+from app.schemas.learning_progress import LearningProgressSummaryCreate, TechStackAssetUpdate
+from app.services import _summary_cache
 from tests.test_data_generator import TestDataGenerator
+from tests.query_counter import count_queries
 
 
 class TestTechStackSummaryAgent:
@@ -112,6 +117,21 @@ logging:
         assert agent.config['schedule']['analysis_interval_hours'] == 1
         assert agent.config['data_processing']['max_sessions_per_batch'] == 10
     
+    def test_agent_config_reload_after_modification(self, test_config_file):
+        """测试配置解析结果被缓存，文件修改后重新加载"""
+        first = TechStackSummaryAgent(test_config_file)
+        second = TechStackSummaryAgent(test_config_file)
+        
+        assert second.config == first.config
+        assert second.config is not first.config
+        
+        with open(test_config_file, 'a') as f:
+            f.write("\nextra:\n  reloaded: true\n")
+        stat = os.stat(test_config_file)
+        os.utime(test_config_file, (stat.st_atime, stat.st_mtime + 1))
+        
+        assert TechStackSummaryAgent(test_config_file).config['extra']['reloaded'] is True
+    
     def test_should_run_analysis(self, agent):
         """测试分析运行条件判断"""
         # 初始状态应该运行
@@ -177,9 +197,15 @@ logging:
             MCPSession.user_id == test_data['user_id']
         ).all()
         
-        tech_usage = agent._analyze_technology_usage(sessions)
+        original_technologies = [list(s.technologies or []) for s in sessions]
+        
+        tech_usage, session_stats = agent._analyze_technology_usage(sessions)
         
         assert len(tech_usage) > 0
+        # 分析过程不应修改会话自身的技术列表
+        assert [list(s.technologies or []) for s in sessions] == original_technologies
+        assert session_stats['session_count'] == len(sessions)
+        assert session_stats['min_created_at'] == min(s.created_at for s in sessions)
         
         # 检查技术栈分析结果
         for tech_key, usage in tech_usage.items():
@@ -200,7 +226,7 @@ logging:
         }
         
         scoring = agent.config['analysis']['proficiency_scoring']
-        increment = agent._calculate_proficiency_increment(usage, scoring)
+        increment = agent._calculate_proficiency_increment(usage)
         
         assert increment > 0
         assert increment <= scoring['max_single_increment'] * 2  # 合理范围
@@ -254,6 +280,41 @@ logging:
         # 应该有一些资产
         assert len(assets) > 0
     
+    def test_update_tech_stack_assets_upserts_in_one_statement(self, agent, db_session, test_data):
+        """测试资产更新为单条upsert：重复分析累加到同一资产而不是新建"""
+        tech_usage = {
+            'upserttech': {
+                'name': 'UpsertTech',
+                'category': 'framework',
+                'usage_count': 2,
+                'total_duration': 120,
+                'avg_duration': 60,
+                'avg_complexity': 5.0,
+                'avg_quality': 75.0,
+                'project_count': 1
+            }
+        }
+        
+        def load_assets():
+            return db_session.query(TechStackAsset).filter(
+                TechStackAsset.user_id == test_data['user_id'],
+                TechStackAsset.technology_name == 'UpsertTech'
+            ).populate_existing().all()
+        
+        with count_queries(db_session) as statements:
+            agent._update_tech_stack_assets(db_session, test_data['user_id'], tech_usage)
+        assert len(statements) == 1
+        
+        [created] = load_assets()
+        first_score, first_hours = created.proficiency_score, created.total_practice_hours
+        
+        agent._update_tech_stack_assets(db_session, test_data['user_id'], tech_usage)
+        
+        [updated] = load_assets()
+        assert updated.total_practice_hours == pytest.approx(first_hours * 2)
+        assert updated.proficiency_score > first_score
+        assert updated.proficiency_level == agent._determine_proficiency_level(updated.proficiency_score)
+    
     def test_identify_tech_stack_debts(self, agent, db_session, test_data):
         """测试技术栈负债识别"""
         tech_usage = {
@@ -271,11 +332,39 @@ logging:
         # 可能识别出一些负债
         assert identified_count >= 0
     
+    def test_analyze_user_sessions_skips_writes_without_new_sessions(self, agent, db_session, test_data):
+        """测试分析后截止时间推进到本次分析时间，再次分析没有新会话时不再写入"""
+        first = agent._analyze_user_sessions(db_session, test_data['user_id'])
+        with count_queries(db_session) as statements:
+            second = agent._analyze_user_sessions(db_session, test_data['user_id'])
+        
+        assert first['sessions_processed'] > 0
+        assert second['sessions_processed'] == 0
+        assert second['assets_updated'] == 0
+        assert not [sql for sql, _ in statements if not sql.lstrip().upper().startswith('SELECT')]
+    
+    def test_identify_tech_stack_debts_use_lowername_index(self, agent, db_session, test_data):
+        """测试负债识别中的候选技术查询命中 (user_id, lower(technology_name)) 索引"""
+        tech_usage = {'react': {'name': 'React', 'category': 'framework', 'usage_count': 1}}
+        
+        with count_queries(db_session) as statements:
+            agent._identify_tech_stack_debts(db_session, test_data['user_id'], tech_usage)
+        
+        lookups = [(sql, params) for sql, params in statements if sql.lstrip().upper().startswith('SELECT')]
+        assert len(lookups) == 2
+        for (statement, parameters), index_name in zip(
+            lookups, ('ux_tech_asset_user_lowername', 'ux_tech_debt_user_lowername')
+        ):
+            plan = db_session.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).all()
+            assert index_name in ' '.join(row[-1] for row in plan)
+    
     def test_get_related_technologies(self, agent):
         """测试相关技术获取"""
         related = agent._get_related_technologies('React', 'framework')
         
-        assert isinstance(related, list)
+        assert isinstance(related, tuple)
         # React应该关联JavaScript, HTML, CSS等
         expected_techs = ['JavaScript', 'HTML', 'CSS']
         assert any(tech in related for tech in expected_techs)
@@ -286,6 +375,9 @@ logging:
         assert agent._determine_tech_category('Python') == 'programming_language'
         assert agent._determine_tech_category('HTML') == 'markup_language'
         assert agent._determine_tech_category('UnknownTech') == 'general'
+        # 查找不区分大小写
+        assert agent._determine_tech_category('javascript') == 'programming_language'
+        assert agent._get_related_technologies('react', 'framework') == agent._get_related_technologies('React', 'framework')
     
     def test_get_analysis_status(self, agent):
         """测试获取分析状态"""
@@ -413,6 +505,29 @@ class TestTechStackDataService:
                 'Python' in (session.tools or [])
             )
     
+    def test_get_mcp_sessions_by_technology_matches_rows_without_tags(self, data_service, test_data, db_session):
+        """technology_tags尚未回填的旧记录仍按各技术栈字段匹配（不区分大小写）"""
+        user_id = test_data['user_id']
+        legacy = MCPSession(
+            user_id=user_id,
+            work_type='development',
+            task_description='legacy session',
+            technologies=['Rust', 'Tokio'],
+            libraries=['Serde']
+        )
+        db_session.add(legacy)
+        db_session.commit()
+        db_session.query(MCPSession).filter(MCPSession.id == legacy.id).update({'technology_tags': None})
+        db_session.commit()
+        
+        for technology in ('tokio', 'SERDE'):
+            sessions = data_service.get_mcp_sessions_by_technology(technology=technology, user_id=user_id)
+            assert legacy.id in [session.id for session in sessions]
+        
+        assert legacy.id not in [
+            session.id for session in data_service.get_mcp_sessions_by_technology(technology='Tok', user_id=user_id)
+        ]
+    
     def test_get_mcp_session_statistics(self, data_service, test_data):
         """测试获取MCP会话统计"""
         stats = data_service.get_mcp_session_statistics(test_data['user_id'])
@@ -451,6 +566,29 @@ class TestTechStackDataService:
             assert found_asset.technology_name == tech_name
             assert found_asset.user_id == test_data['user_id']
     
+    def test_get_tech_stack_assets_by_names(self, data_service, test_data):
+        """测试按多个名称批量获取技术栈资产"""
+        assets = data_service.get_tech_stack_assets(test_data['user_id'])
+        names = [asset.technology_name.upper() for asset in assets[:2]] + ['UnknownTech']
+        
+        found = data_service.get_tech_stack_assets_by_names(test_data['user_id'], names)
+        
+        assert set(found) == {asset.technology_name.lower() for asset in assets[:2]}
+        assert data_service.get_tech_stack_assets_by_names(test_data['user_id'], []) == {}
+    
+    def test_tech_name_lookup_uses_expression_index(self, data_service, db_session):
+        """测试按名称（不区分大小写）查找资产和负债时命中 lower(technology_name) 表达式索引"""
+        for table, index_name in [
+            ('tech_stack_assets', 'ux_tech_asset_user_lowername'),
+            ('tech_stack_debts', 'ux_tech_debt_user_lowername')
+        ]:
+            plan = db_session.execute(text(
+                f"EXPLAIN QUERY PLAN SELECT id FROM {table} "
+                "WHERE user_id = 1 AND lower(technology_name) = 'python'"
+            )).all()
+            
+            assert any(index_name in row[-1] for row in plan)
+    
     def test_get_tech_stack_debts(self, data_service, test_data):
         """测试获取技术栈负债"""
         debts = data_service.get_tech_stack_debts(test_data['user_id'])
@@ -458,6 +596,64 @@ class TestTechStackDataService:
         assert len(debts) >= 0
         assert all(debt.user_id == test_data['user_id'] for debt in debts)
     
+    def test_iter_variants_match_list_methods(self, data_service, test_data):
+        """测试迭代器版本与列表版本返回相同结果"""
+        user_id = test_data['user_id']
+        
+        assert [s.id for s in data_service.iter_recent_mcp_sessions(user_id=user_id)] == [
+            s.id for s in data_service.get_recent_mcp_sessions(user_id=user_id)
+        ]
+        assert [d.id for d in data_service.iter_tech_stack_debts(user_id)] == [
+            d.id for d in data_service.get_tech_stack_debts(user_id)
+        ]
+        assert [s.id for s in data_service.iter_learning_progress_summaries(user_id)] == [
+            s.id for s in data_service.get_learning_progress_summaries(user_id)
+        ]
+        assert {u.id for u in data_service.iter_active_users_with_sessions(days=30, chunk=1)} == {
+            u.id for u in data_service.get_active_users_with_sessions(days=30)
+        }
+    
+    def test_bulk_statistics_match_per_user_methods(self, data_service, test_data, db_session):
+        """测试批量统计方法与单用户方法结果一致，且不随用户数增加查询次数"""
+        user_id = test_data['user_id']
+        missing_user_id = user_id + 1000
+        
+        with count_queries(db_session) as statements:
+            session_stats = data_service.get_bulk_mcp_session_statistics([user_id, missing_user_id])
+            debt_counts = data_service.get_bulk_debt_counts([user_id, missing_user_id], is_active=True)
+            assets = data_service.get_bulk_tech_stack_assets([user_id, missing_user_id], is_active=True)
+        
+        assert len(statements) == 3
+        assert session_stats[user_id]['total_sessions'] == (
+            data_service.get_mcp_session_statistics(user_id)['total_sessions']
+        )
+        assert session_stats[missing_user_id]['total_sessions'] == 0
+        assert debt_counts == {
+            user_id: data_service.count_tech_stack_debts(user_id, is_active=True),
+            missing_user_id: 0
+        }
+        assert {a.id for a in assets[user_id]} == {
+            a.id for a in data_service.get_tech_stack_assets(user_id, is_active=True)
+        }
+        assert assets[missing_user_id] == []
+        
+        avg_proficiency, total_assets = data_service.get_bulk_proficiency_summary(
+            [user_id, missing_user_id]
+        )[user_id]
+        assert total_assets == len(assets[user_id])
+        assert avg_proficiency == pytest.approx(
+            sum(a.proficiency_score for a in assets[user_id]) / len(assets[user_id])
+        )
+    
+    def test_count_tech_stack_debts(self, data_service, test_data):
+        """测试统计技术栈负债数量"""
+        assert data_service.count_tech_stack_debts(test_data['user_id']) == len(
+            data_service.get_tech_stack_debts(test_data['user_id'])
+        )
+        assert data_service.count_tech_stack_debts(test_data['user_id'], is_active=True) == len(
+            data_service.get_tech_stack_debts(test_data['user_id'], is_active=True)
+        )
+    
     def test_get_high_priority_debts(self, data_service, test_data):
         """测试获取高优先级负债"""
         debts = data_service.get_high_priority_debts(test_data['user_id'], limit=3)
@@ -466,6 +662,21 @@ class TestTechStackDataService:
         assert all(debt.user_id == test_data['user_id'] for debt in debts)
         assert all(debt.is_active for debt in debts)
     
+    def test_high_priority_debts_use_partial_index(self, data_service, test_data, db_session):
+        """测试高优先级负债查询命中部分索引且无需额外排序"""
+        with count_queries(db_session) as statements:
+            data_service.get_high_priority_debts(test_data['user_id'])
+        
+        assert len(statements) == 1
+        statement, parameters = statements[0]
+        plan = db_session.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).all()
+        details = ' '.join(row[-1] for row in plan)
+        
+        assert 'idx_tech_debt_active_open' in details
+        assert 'TEMP B-TREE' not in details
+    
     def test_get_tech_stack_asset_statistics(self, data_service, test_data):
         """测试获取技术栈资产统计"""
         stats = data_service.get_tech_stack_asset_statistics(test_data['user_id'])
@@ -490,6 +701,49 @@ class TestTechStackDataService:
         assert len(users) >= 1
         assert any(user.id == test_data['user_id'] for user in users)
     
+    def test_get_active_users_with_sessions_preload(self, data_service, test_data):
+        """测试预加载活跃用户的关系"""
+        users = data_service.get_active_users_with_sessions(
+            days=30, load_relations=('tech_stack_assets',)
+        )
+        
+        user = next(user for user in users if user.id == test_data['user_id'])
+        assert 'tech_stack_assets' in user.__dict__
+        assert len(user.tech_stack_assets) > 0
+    
+    def test_query_budgets(self, data_service, test_data, db_session):
+        """测试各数据访问方法的查询次数不超过预算"""
+        user_id = test_data['user_id']
+        budgets = [
+            (lambda: data_service.get_mcp_session_statistics(user_id), 1),
+            (lambda: data_service.get_tech_stack_asset_statistics(user_id), 4),
+            (lambda: data_service.get_tech_stack_debts(user_id), 1),
+            (lambda: data_service.get_active_users_with_sessions(
+                days=30, load_relations=('tech_stack_assets',)
+            ), 2),
+        ]
+        
+        for call, budget in budgets:
+            with count_queries(db_session) as statements:
+                call()
+            assert len(statements) <= budget
+    
+    def test_unloaded_relations_raise(self, data_service, test_data, monkeypatch):
+        """测试调试模式下访问未预加载的关系直接报错"""
+        monkeypatch.setattr(settings, 'debug', True)
+        
+        sessions = data_service.get_recent_mcp_sessions(
+            user_id=test_data['user_id'], load_relations=('user',)
+        )
+        assert sessions
+        assert sessions[0].user.id == test_data['user_id']
+        with pytest.raises(InvalidRequestError):
+            sessions[0].code_snippets
+        
+        users = data_service.get_active_users_with_sessions(days=30)
+        with pytest.raises(InvalidRequestError):
+            users[0].mcp_sessions
+    
     def test_get_user_by_id(self, data_service, test_data):
         """测试根据ID获取用户"""
         user = data_service.get_user_by_id(test_data['user_id'])
@@ -498,6 +752,113 @@ class TestTechStackDataService:
         assert user.id == test_data['user_id']
         assert user.username == test_data['username']
     
+    def test_bulk_upsert_tech_stack_assets(self, data_service, test_data, db_session):
+        """测试批量upsert技术栈资产（不区分大小写合并同名资产）"""
+        user_id = test_data['user_id']
+        row = {
+            'user_id': user_id,
+            'technology_name': 'UpsertTech',
+            'category': 'tool',
+            'proficiency_level': 'beginner',
+            'proficiency_score': 10.0
+        }
+        
+        data_service.bulk_upsert_tech_stack_assets([row])
+        data_service.bulk_upsert_tech_stack_assets([
+            dict(row, technology_name='upserttech', proficiency_score=20.0)
+        ])
+        
+        assets = db_session.query(TechStackAsset).filter(
+            TechStackAsset.user_id == user_id,
+            TechStackAsset.technology_name.in_(['UpsertTech', 'upserttech'])
+        ).all()
+        
+        assert len(assets) == 1
+        assert assets[0].technology_name == 'UpsertTech'
+        assert assets[0].proficiency_score == 20.0
+    
+    def test_update_tech_stack_asset(self, data_service, test_data):
+        """测试更新技术栈资产"""
+        asset = data_service.get_tech_stack_assets(test_data['user_id'])[0]
+        
+        updated = data_service.update_tech_stack_asset(
+            asset, TechStackAssetUpdate(proficiency_score=88.0, proficiency_level='expert')
+        )
+        
+        assert updated.proficiency_score == 88.0
+        assert updated.proficiency_level == 'expert'
+        
+        data_service.bulk_update_tech_stack_assets([{'id': asset.id, 'proficiency_score': 90.0}])
+        data_service.db.expire(asset)
+        assert asset.proficiency_score == 90.0
+    
+    def test_latest_progress_summary_cache_invalidation(self, data_service, test_data):
+        """测试最新学习进度总结缓存在创建新总结后失效"""
+        _summary_cache.invalidate_user(test_data['user_id'])
+        
+        first_end = data_service.get_last_analysis_time(test_data['user_id'])
+        
+        period_end = datetime.utcnow()
+        summary = data_service.create_learning_progress_summary(
+            LearningProgressSummaryCreate(
+                user_id=test_data['user_id'],
+                report_period="weekly",
+                period_start=period_end - timedelta(days=7),
+                period_end=period_end
+            )
+        )
+        
+        assert first_end != period_end
+        assert data_service.get_last_analysis_time(test_data['user_id']) == period_end
+        assert data_service.get_latest_progress_summary(test_data['user_id']).id == summary.id
+        # 命中缓存时仍返回当前会话中的同一对象
+        assert data_service.get_latest_progress_summary(test_data['user_id']) is summary
+    
+    def test_process_summary_cache_invalidated_only_after_commit(self, data_service, test_data):
+        """测试新总结在提交后才使进程级缓存失效，回滚时缓存保持不变"""
+        user_id = test_data['user_id']
+        _summary_cache.invalidate_user(user_id)
+        first_end = data_service.get_last_analysis_time(user_id)
+        
+        def create_summary():
+            period_end = datetime.utcnow()
+            data_service.create_learning_progress_summary(
+                LearningProgressSummaryCreate(
+                    user_id=user_id,
+                    report_period="weekly",
+                    period_start=period_end - timedelta(days=7),
+                    period_end=period_end
+                )
+            )
+            return period_end
+        
+        create_summary()
+        # 提交前其他会话读到的仍是缓存中已提交的数据
+        assert _summary_cache.last_analysis_time_cache.get(user_id) == (True, first_end)
+        
+        data_service.rollback()
+        assert _summary_cache.last_analysis_time_cache.get(user_id) == (True, first_end)
+        assert not _summary_cache.has_pending_invalidation(data_service.db, user_id)
+        
+        period_end = create_summary()
+        data_service.commit()
+        assert _summary_cache.last_analysis_time_cache.get(user_id) == (False, None)
+        assert data_service.get_last_analysis_time(user_id) == period_end
+    
+    def test_instance_cache_cleared_on_commit(self, data_service, test_data):
+        """测试实例级查询缓存在提交后清空"""
+        user = data_service.get_user_by_id(test_data['user_id'])
+        data_service.get_last_analysis_time(test_data['user_id'])
+        
+        assert data_service.get_user_by_id(test_data['user_id']) is user
+        assert test_data['user_id'] in data_service._last_analysis_cache
+        
+        data_service.commit()
+        
+        assert not data_service._user_cache
+        assert not data_service._last_analysis_cache
+        assert not data_service._latest_summary_cache
+    
     def test_transaction_management(self, data_service):
         """测试事务管理"""
         # 测试提交
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+技术栈调度器单元测试
+"""
+
+import asyncio
+import threading
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from apscheduler.events import EVENT_JOB_EXECUTED, JobExecutionEvent
+
+from app.services import tech_stack_scheduler
+from app.services.tech_stack_scheduler import (
+    TechStackScheduler,
+    HEALTH_CHECK_INTERVAL_SECONDS,
+    HEALTH_CHECK_RETRY_SECONDS,
+    HEALTH_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+)
+
+
+class FakeClock:
+    """可手动推进的单调时钟"""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class TestTechStackScheduler:
+    """
+    技术栈调度器测试类
+    """
+    
+    @pytest_asyncio.fixture
+    async def scheduler(self):
+        """创建并启动调度器，测试结束后停止"""
+        scheduler = TechStackScheduler()
+        await scheduler.start()
+        
+        yield scheduler
+        
+        await scheduler.stop()
+    
+    @pytest.fixture
+    def clock(self):
+        """替换调度器使用的单调时钟"""
+        fake_clock = FakeClock()
+        with patch.object(tech_stack_scheduler.time, 'monotonic', fake_clock):
+            yield fake_clock
+    
+    def _health_check_interval(self, scheduler: TechStackScheduler) -> timedelta:
+        return scheduler.scheduler.get_job('scheduler_health_check').trigger.interval
+    
+    @pytest.mark.asyncio
+    async def test_circuit_breaker_states(self, scheduler, clock):
+        """健康检查熔断：失败计数 -> 熔断 -> 半开 -> 恢复"""
+        # 故障持续时每次重试都会重新计时，熔断窗口必须覆盖重试间隔
+        assert CIRCUIT_RESET_SECONDS > HEALTH_CHECK_RETRY_SECONDS
+        assert self._health_check_interval(scheduler) == timedelta(seconds=HEALTH_CHECK_INTERVAL_SECONDS)
+        
+        with patch.object(scheduler, '_ping_database', side_effect=RuntimeError("database down")):
+            # 第一次失败：开始计数并缩短检查间隔，尚未熔断
+            await scheduler._health_check_job()
+            assert scheduler._health_failures == 1
+            assert not scheduler._circuit_open()
+            assert self._health_check_interval(scheduler) == timedelta(seconds=HEALTH_CHECK_RETRY_SECONDS)
+            
+            # 连续失败达到阈值：熔断，耗时任务被跳过
+            for _ in range(HEALTH_FAILURE_THRESHOLD - 1):
+                clock.advance(HEALTH_CHECK_RETRY_SECONDS)
+                await scheduler._health_check_job()
+            assert scheduler._circuit_open()
+            await scheduler._run_monthly_summary_job()
+            assert scheduler.job_history[-1]['status'] == 'skipped'
+            
+            # 故障持续期间的重试失败会重新计时，熔断保持打开
+            clock.advance(CIRCUIT_RESET_SECONDS - 1)
+            assert scheduler._circuit_open()
+            clock.advance(HEALTH_CHECK_RETRY_SECONDS)
+            await scheduler._health_check_job()
+            clock.advance(CIRCUIT_RESET_SECONDS - 1)
+            assert scheduler._circuit_open()
+            
+            # 熔断窗口内没有新的失败：进入半开状态，允许耗时任务重新尝试
+            clock.advance(1)
+            assert not scheduler._circuit_open()
+            assert scheduler._health_failures > HEALTH_FAILURE_THRESHOLD - 1
+            
+            # 半开状态下再次失败：重新熔断
+            await scheduler._health_check_job()
+            assert scheduler._circuit_open()
+        
+        # 检查恢复：清除失败计数和熔断，检查间隔回到正常值
+        await scheduler._health_check_job()
+        assert scheduler._health_failures == 0
+        assert scheduler._circuit_opened_at is None
+        assert not scheduler._circuit_open()
+        assert self._health_check_interval(scheduler) == timedelta(seconds=HEALTH_CHECK_INTERVAL_SECONDS)
+    
+    @pytest.mark.asyncio
+    async def test_trigger_manual_analysis_coalesces_duplicates(self):
+        """同一用户的重复手动触发复用进行中的分析，不同用户各自运行"""
+        scheduler = TechStackScheduler()
+        release = asyncio.Event()
+        calls = []
+        
+        async def fake_analysis(user_id=None):
+            calls.append(user_id)
+            await release.wait()
+            return {'status': 'completed', 'user_id': user_id}
+        
+        with patch.object(scheduler, '_run_agent_analysis', side_effect=fake_analysis):
+            first = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            await asyncio.sleep(0)
+            duplicate = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            other = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=2))
+            await asyncio.sleep(0)
+            
+            assert set(scheduler._inflight) == {'analysis:1', 'analysis:2'}
+            release.set()
+            results = await asyncio.gather(first, duplicate, other)
+        
+        assert sorted(calls) == [1, 2]
+        assert results[0] is results[1]
+        assert results[2]['user_id'] == 2
+        assert scheduler._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_trigger_manual_analysis_cancellation(self):
+        """发起方被取消时等待者一并取消；等待者被取消不影响发起方"""
+        scheduler = TechStackScheduler()
+        release = asyncio.Event()
+        
+        async def fake_analysis(user_id=None):
+            await release.wait()
+            return {'status': 'completed'}
+        
+        with patch.object(scheduler, '_run_agent_analysis', side_effect=fake_analysis):
+            # 等待者被取消：发起方照常完成
+            owner = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            release.set()
+            assert (await owner)['status'] == 'completed'
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            
+            # 发起方被取消：等待者收到取消，进行中的记录被清理
+            release.clear()
+            owner = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(scheduler.trigger_manual_analysis(user_id=1))
+            await asyncio.sleep(0)
+            owner.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await owner
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        
+        assert scheduler._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_pool_analysis_runs_inline_without_nested_pool(self, scheduler):
+        """分析线程池中的Agent分析逐个用户在池内线程执行，不再嵌套创建线程池"""
+        analyzed_threads = []
+        
+        def fake_analyze_user(user_id):
+            analyzed_threads.append(threading.current_thread().name)
+            return {'user_id': user_id, 'sessions_processed': 1}
+        
+        fake_users = [SimpleNamespace(id=user_id) for user_id in (1, 2, 3)]
+        agent = scheduler.agent
+        with patch('app.services.tech_stack_summary_agent.get_db', return_value=iter([MagicMock()])), \
+                patch.object(agent, 'is_enabled', return_value=True), \
+                patch.object(agent, '_get_users_to_analyze', return_value=fake_users), \
+                patch.object(agent, '_analyze_user_in_new_session', side_effect=fake_analyze_user), \
+                patch('app.services.tech_stack_summary_agent.ThreadPoolExecutor') as nested_pool:
+            result = await scheduler._run_agent_analysis()
+        
+        assert result['status'] == 'completed'
+        assert result['total_sessions_processed'] == 3
+        nested_pool.assert_not_called()
+        assert len(set(analyzed_threads)) == 1
+        assert analyzed_threads[0].startswith(scheduler._analysis_pool._thread_name_prefix)
+    
+    def _earliest_run_time(self, scheduler: TechStackScheduler):
+        return min(job.next_run_time for job in scheduler.scheduler.get_jobs())
+    
+    @pytest.mark.asyncio
+    async def test_due_heap_prunes_removed_and_rescheduled_jobs(self, scheduler):
+        """堆顶任务被删除或改期后，过期条目在读取时被惰性弹出"""
+        assert scheduler.job_stats['next_run_time'] == self._earliest_run_time(scheduler)
+        
+        # 删除堆顶任务：其条目留在堆中，读取时被弹出
+        top_job_id = scheduler._due_heap[0][1]
+        scheduler.scheduler.remove_job(top_job_id)
+        scheduler._update_next_run_time()
+        assert scheduler._due_heap[0][1] != top_job_id
+        assert scheduler.job_stats['next_run_time'] == self._earliest_run_time(scheduler)
+        
+        # 堆顶任务改期到最后：新时间由任务事件入堆，旧条目被弹出
+        top_job_id = scheduler._due_heap[0][1]
+        later = max(job.next_run_time for job in scheduler.scheduler.get_jobs()) + timedelta(days=1)
+        scheduler.scheduler.modify_job(top_job_id, next_run_time=later)
+        scheduler._on_job_event(
+            JobExecutionEvent(EVENT_JOB_EXECUTED, top_job_id, 'default', datetime.now(timezone.utc))
+        )
+        assert scheduler._due_heap[0][1] != top_job_id
+        assert scheduler.job_stats['next_run_time'] == self._earliest_run_time(scheduler)
+        assert (later, top_job_id) in scheduler._due_heap
+        
+        # 重新调度：按当前任务重建堆，不保留过期条目
+        await scheduler.reschedule_jobs()
+        jobs = scheduler.scheduler.get_jobs()
+        assert sorted(scheduler._due_heap) == sorted((job.next_run_time, job.id) for job in jobs)
+        assert scheduler.job_stats['next_run_time'] == self._earliest_run_time(scheduler)
+    
+    @pytest.mark.asyncio
+    async def test_get_scheduler_status_shape(self, scheduler):
+        """状态包含固定字段；job_stats为只读的实时视图；执行记录按需返回"""
+        status = scheduler.get_scheduler_status()
+        assert set(status) == {'is_running', 'agent_enabled', 'job_stats', 'scheduled_jobs', 'scheduler_state'}
+        assert status['is_running'] is True
+        assert {job['id'] for job in status['scheduled_jobs']} == {
+            job.id for job in scheduler.scheduler.get_jobs()
+        }
+        for job in status['scheduled_jobs']:
+            assert set(job) == {'id', 'name', 'next_run_time', 'trigger'}
+        
+        # job_stats不可修改，但反映调度器的最新统计
+        with pytest.raises(TypeError):
+            status['job_stats']['total_runs'] = 99
+        scheduler.job_stats['total_runs'] += 1
+        assert status['job_stats']['total_runs'] == scheduler.job_stats['total_runs']
+        
+        # 执行记录以不可变快照返回
+        monthly_stats = {'active_users': 0, 'total_sessions': 0, 'total_learning_hours': 0.0}
+        with patch.object(scheduler, '_collect_monthly_stats', return_value=monthly_stats):
+            await scheduler._run_monthly_summary_job()
+        status = scheduler.get_scheduler_status(include_history=True)
+        assert isinstance(status['job_history'], tuple)
+        assert status['job_history'][-1]['job'] == "Tech Stack Monthly Summary"
+        assert set(status['job_history'][-1]) == {'job', 'start', 'duration_s', 'status'}
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+技术债务服务单元测试
+"""
+
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.api.v1.endpoints import technical_debt as technical_debt_endpoints
+from app.services.technical_debt_service import TechnicalDebtService
+from app.models.user import User
+from app.models.coding_session import CodingSession
+from app.models.code_record import CodeRecord
+from app.models.technical_debt import TechnicalDebt
+from app.core.exceptions import TechnicalDebtNotFoundError, InvalidOperationError
+from tests.query_counter import count_queries
+
+
+# 含两个高严重性问题（硬编码密码、eval）和一个低严重性问题（行尾空白）的代码
+HIGH_SEVERITY_CODE = 'password = "hunter2"\nresult = eval(user_input)  \n'
+
+
+class TestTechnicalDebtService:
+    """
+    技术债务服务测试类
+    """
+    
+    @pytest.fixture
+    def db_session(self):
+        """创建测试数据库会话"""
+        engine = create_engine("sqlite:///:memory:", echo=False)
+        Base.metadata.create_all(engine)
+        
+        SessionLocal = sessionmaker(bind=engine)
+        session = SessionLocal()
+        
+        yield session
+        
+        session.close()
+    
+    @pytest.fixture
+    def service(self, db_session):
+        """创建技术债务服务实例"""
+        return TechnicalDebtService(db_session)
+    
+    @pytest.fixture
+    def code_record(self, db_session):
+        """创建用户、编程会话和代码记录"""
+        user = User(username="debt_user", email="debt_user@example.com")
+        db_session.add(user)
+        db_session.flush()
+        
+        coding_session = CodingSession(user_id=user.id, title="debt session")
+        db_session.add(coding_session)
+        db_session.flush()
+        
+        record = CodeRecord(
+            coding_session_id=coding_session.id,
+            file_path="/src/app.py",
+            file_name="app.py",
+            change_type="modify"
+        )
+        db_session.add(record)
+        db_session.commit()
+        return record
+    
+    def test_analyze_code_bulk_inserts_high_severity_debts(self, service, db_session, code_record):
+        """提供code_record_id时，高严重性问题通过一条INSERT语句批量记录"""
+        user_id = code_record.coding_session.user_id
+        
+        with count_queries(db_session) as statements:
+            analysis = service.analyze_code_for_debt(
+                user_id=user_id,
+                code_content=HIGH_SEVERITY_CODE,
+                file_path="/src/app.py",
+                code_record_id=code_record.id
+            )
+        
+        inserts = [sql for sql, _ in statements if sql.lstrip().upper().startswith("INSERT")]
+        assert len(inserts) == 1
+        
+        created = analysis['created_debts']
+        assert len(created) == analysis['analysis_summary']['critical_issues'] + analysis['analysis_summary']['high_issues']
+        assert len(created) == 2
+        assert all(isinstance(debt, TechnicalDebt) for debt in created)
+        assert {debt.severity for debt in created} <= {'high', 'critical'}
+        
+        # 返回的技术债务对象与数据库中的记录一一对应
+        stored_ids = {debt_id for (debt_id,) in db_session.query(TechnicalDebt.id).all()}
+        assert stored_ids == {debt.id for debt in created}
+        for debt in created:
+            assert debt.user_id == user_id
+            assert debt.code_record_id == code_record.id
+            assert debt.file_path == "/src/app.py"
+            assert debt.line_start is not None
+            assert debt.detection_method == 'static_analysis'
+            assert debt.status == 'open'
+    
+    def test_analyze_code_without_code_record_is_not_persisted(self, service, db_session, code_record):
+        """未提供code_record_id时只报告问题，不写入数据库"""
+        with count_queries(db_session) as statements:
+            analysis = service.analyze_code_for_debt(
+                user_id=code_record.coding_session.user_id,
+                code_content=HIGH_SEVERITY_CODE,
+                file_path="/src/app.py"
+            )
+        
+        assert analysis['analysis_summary']['critical_issues'] + analysis['analysis_summary']['high_issues'] == 2
+        assert analysis['created_debts'] == []
+        assert not [sql for sql, _ in statements if sql.lstrip().upper().startswith("INSERT")]
+        assert db_session.query(TechnicalDebt).count() == 0
+    
+    def test_analyze_code_rejects_code_record_of_another_user(self, service, db_session, code_record):
+        """代码记录不属于传入的用户时拒绝写入，债务不会归属到错误的用户"""
+        other = User(username="other_debt_user", email="other_debt_user@example.com")
+        db_session.add(other)
+        db_session.commit()
+        
+        with pytest.raises(InvalidOperationError):
+            service.analyze_code_for_debt(
+                user_id=other.id,
+                code_content=HIGH_SEVERITY_CODE,
+                file_path="/src/app.py",
+                code_record_id=code_record.id
+            )
+        with pytest.raises(InvalidOperationError):
+            service.analyze_code_for_debt(
+                user_id=other.id,
+                code_content=HIGH_SEVERITY_CODE,
+                file_path="/src/app.py",
+                code_record_id=code_record.id + 1000
+            )
+        
+        assert db_session.query(TechnicalDebt).count() == 0
+    
+    @pytest.mark.asyncio
+    async def test_analyze_endpoint_forwards_arguments(self, db_session, code_record):
+        """分析接口按关键字传参并转发code_record_id"""
+        analysis = await technical_debt_endpoints.analyze_code_for_debt(
+            file_path="/src/app.py",
+            code_content=HIGH_SEVERITY_CODE,
+            user_id=code_record.coding_session.user_id,
+            code_record_id=code_record.id,
+            db=db_session
+        )
+        assert len(analysis['created_debts']) == 2
+        assert all(debt.code_record_id == code_record.id for debt in analysis['created_debts'])
+        
+        analysis = await technical_debt_endpoints.analyze_code_for_debt(
+            file_path="/src/app.py",
+            code_content=HIGH_SEVERITY_CODE,
+            user_id=code_record.coding_session.user_id,
+            db=db_session
+        )
+        assert analysis['created_debts'] == []
+        assert db_session.query(TechnicalDebt).count() == 2
+    
+    def _create_debt(self, db_session, code_record, **kwargs) -> TechnicalDebt:
+        """创建一条技术债务记录"""
+        fields = {
+            'code_record_id': code_record.id,
+            'user_id': code_record.coding_session.user_id,
+            'title': 'debt',
+            'debt_type': 'code_smell',
+            'severity': 'medium',
+            'status': 'open'
+        }
+        fields.update(kwargs)
+        debt = TechnicalDebt(**fields)
+        db_session.add(debt)
+        db_session.commit()
+        return debt
+    
+    def test_cursor_paging_matches_offset_paging_with_tied_timestamps(self, service, db_session, code_record):
+        """created_at相同的记录按id区分先后，键集分页与偏移分页返回相同的顺序且不重不漏"""
+        user_id = code_record.coding_session.user_id
+        base = datetime(2026, 1, 1, 12, 0, 0)
+        # 三个时间点，每个时间点有多条记录
+        for i in range(8):
+            self._create_debt(db_session, code_record, title=f"debt {i}", created_at=base + timedelta(minutes=i % 3))
+        
+        offset_ids = []
+        for skip in range(0, 8, 3):
+            offset_ids.extend(debt.id for debt in service.get_technical_debts(skip=skip, limit=3, user_id=user_id))
+        
+        cursor_ids = []
+        cursor = None
+        while True:
+            page = service.get_technical_debts(limit=3, user_id=user_id, cursor=cursor)
+            if not page:
+                break
+            cursor_ids.extend(debt.id for debt in page)
+            cursor = (page[-1].created_at, page[-1].id)
+        
+        assert cursor_ids == offset_ids
+        assert len(set(cursor_ids)) == 8
+        expected = db_session.query(TechnicalDebt).order_by(
+            TechnicalDebt.created_at.desc(), TechnicalDebt.id.desc()
+        ).all()
+        assert cursor_ids == [debt.id for debt in expected]
+    
+    def test_resolve_technical_debt_not_found_and_already_resolved(self, service, db_session, code_record):
+        """解决债务：不存在时报未找到，已解决时报无效操作，且不修改已有的解决信息"""
+        debt = self._create_debt(db_session, code_record)
+        
+        with pytest.raises(TechnicalDebtNotFoundError):
+            service.resolve_technical_debt(debt.id + 100, "fixed")
+        
+        resolved = service.resolve_technical_debt(debt.id, "fixed")
+        assert resolved.status == 'resolved'
+        assert resolved.resolution_notes == "fixed"
+        assert resolved.resolved_at is not None
+        resolved_at = resolved.resolved_at
+        
+        with pytest.raises(InvalidOperationError):
+            service.resolve_technical_debt(debt.id, "fixed again")
+        
+        db_session.expire_all()
+        stored = db_session.get(TechnicalDebt, debt.id)
+        assert stored.resolution_notes == "fixed"
+        assert stored.resolved_at == resolved_at
+    
+    def test_get_debt_trends_groups_by_date_on_sqlite(self, service, db_session, code_record):
+        """SQLite下按日期汇总的新增/解决数量正确，日期按date解析并按时间升序返回"""
+        today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+        two_days_ago = today - timedelta(days=2)
+        self._create_debt(db_session, code_record, created_at=two_days_ago)
+        self._create_debt(db_session, code_record, created_at=two_days_ago + timedelta(hours=3))
+        self._create_debt(
+            db_session, code_record, created_at=two_days_ago, status='resolved', resolved_at=today
+        )
+        # 超出统计范围的记录不计入
+        self._create_debt(db_session, code_record, created_at=today - timedelta(days=200))
+        
+        trends = service.get_debt_trends(code_record.coding_session.user_id, days=30)
+        
+        assert trends['daily_trends'] == [
+            {'date': two_days_ago.date().isoformat(), 'created': 3, 'resolved': 0, 'net_change': 3},
+            {'date': today.date().isoformat(), 'created': 0, 'resolved': 1, 'net_change': -1},
+        ]
+        assert all(isinstance(date.fromisoformat(entry['date']), date) for entry in trends['daily_trends'])
+        assert trends['summary'] == {'total_created': 3, 'total_resolved': 1, 'net_change': 2}
+    
+    def test_get_user_debt_summary_conditional_aggregates(self, service, db_session, code_record):
+        """汇总：计数覆盖全部债务，影响分数和工作量只统计open债务，分布按严重性和类型分组"""
+        self._create_debt(db_session, code_record, severity='high', debt_type='security', impact_score=8, effort_estimate=60)
+        self._create_debt(db_session, code_record, severity='high', debt_type='code_smell', impact_score=2, effort_estimate=30)
+        self._create_debt(
+            db_session, code_record, severity='low', debt_type='code_smell', status='resolved',
+            impact_score=5, effort_estimate=90
+        )
+        
+        summary = service.get_user_debt_summary(code_record.coding_session.user_id)
+        
+        assert summary['summary'] == {
+            'total_debts': 3,
+            'open_debts': 2,
+            'resolved_debts': 1,
+            'resolution_rate': 33.33,
+            'total_impact_score': 10,
+            'total_estimated_effort_minutes': 90,
+            'total_estimated_effort_hours': 1.5
+        }
+        assert sorted((d['severity'], d['count']) for d in summary['severity_distribution']) == [('high', 2), ('low', 1)]
+        assert sorted((d['debt_type'], d['count']) for d in summary['type_distribution']) == [('code_smell', 2), ('security', 1)]
+        
+        # 没有债务的用户返回零值
+        empty = service.get_user_debt_summary(code_record.coding_session.user_id + 100)
+        assert empty['summary']['total_debts'] == 0
+        assert empty['summary']['total_impact_score'] == 0
+        assert empty['severity_distribution'] == []
+    
+    def test_overview_average_open_debt_age(self, service, db_session, code_record):
+        """概览中的平均年龄只统计open债务，每条按整天数计算"""
+        now = datetime.utcnow()
+        self._create_debt(db_session, code_record, created_at=now - timedelta(days=10, hours=5))
+        self._create_debt(db_session, code_record, created_at=now - timedelta(days=4, hours=20))
+        self._create_debt(db_session, code_record, created_at=now - timedelta(days=100), status='resolved')
+        
+        overview = service.get_debt_metrics_overview(code_record.coding_session.user_id)
+        
+        assert overview['key_metrics']['average_age_days'] == 7.0
+        
+        # 没有open债务时平均年龄为0
+        empty = service.get_debt_metrics_overview(code_record.coding_session.user_id + 100)
+        assert empty['key_metrics']['average_age_days'] == 0
+    
+    def test_overview_session_count_and_age_in_one_query(self, service, db_session, code_record):
+        """近30天会话数和平均年龄在同一次查询中取得，债务密度按近期会话数计算"""
+        user_id = code_record.coding_session.user_id
+        now = datetime.utcnow()
+        db_session.add_all([
+            CodingSession(user_id=user_id, title="recent", created_at=now - timedelta(days=3)),
+            CodingSession(user_id=user_id, title="old", created_at=now - timedelta(days=45)),
+        ])
+        db_session.commit()
+        for _ in range(3):
+            self._create_debt(db_session, code_record, created_at=now - timedelta(days=2))
+        
+        with count_queries(db_session) as statements:
+            overview = service.get_debt_metrics_overview(user_id)
+        
+        # 汇总2次 + 趋势1次 + 会话数与平均年龄1次
+        assert len(statements) == 4
+        # 近30天的会话为fixture中的会话和recent会话
+        assert overview['key_metrics']['debt_density'] == 1.5
+        assert overview['key_metrics']['average_age_days'] == 2.0
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+工具服务单元测试
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.tool import Tool, ToolExecution
+from app.schemas.tool import ToolExecutionCreate, ToolUpdate
+from app.services.tool_service import ToolService
+from tests.query_counter import count_queries
+import app.models  # noqa: F401  注册全部模型
+
+
+class TestToolService:
+    """
+    工具服务测试类
+    """
+    
+    @pytest.fixture
+    def db_session(self):
+        """创建测试数据库会话（单连接，工作线程中执行的数据库操作可见同一内存数据库）"""
+        engine = create_engine(
+            "sqlite://",
+            echo=False,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        
+        SessionLocal = sessionmaker(bind=engine)
+        session = SessionLocal()
+        
+        yield session
+        
+        session.close()
+        engine.dispose()
+    
+    @pytest.fixture
+    def service(self, db_session):
+        """创建工具服务实例"""
+        return ToolService(db_session)
+    
+    @pytest.fixture
+    def tool_id(self, db_session):
+        """创建一个工具，返回其ID（会话中不保留已加载的对象）"""
+        tool = Tool(name="formatter", tool_type="function", version="1.0")
+        db_session.add(tool)
+        db_session.commit()
+        tool_id = tool.id
+        db_session.expunge_all()
+        return tool_id
+    
+    def test_update_tool_single_update_returning(self, service, db_session, tool_id):
+        """更新工具只执行一条 UPDATE ... RETURNING；工具不存在时返回None"""
+        with count_queries(db_session) as statements:
+            tool = service.update_tool(tool_id, ToolUpdate(version="2.0", is_active=False))
+        
+        assert [sql.split()[0] for sql, _ in statements] == ["UPDATE"]
+        assert "RETURNING" in statements[0][0]
+        assert tool.id == tool_id
+        assert tool.version == "2.0"
+        assert tool.is_active is False
+        
+        db_session.expire_all()
+        assert db_session.get(Tool, tool_id).version == "2.0"
+        
+        assert service.update_tool(tool_id + 100, ToolUpdate(version="3.0")) is None
+    
+    @pytest.mark.asyncio
+    async def test_execute_tool_single_insert(self, service, db_session, tool_id):
+        """执行记录连同执行结果只INSERT一次，不再先插入running状态再UPDATE；工具不存在时返回None"""
+        execution_data = ToolExecutionCreate(agent_id=1, input_data={"path": "a.py"})
+        
+        with count_queries(db_session) as statements:
+            execution = await service.execute_tool(tool_id, execution_data)
+        
+        verbs = [sql.split()[0] for sql, _ in statements]
+        assert verbs.count("INSERT") == 1
+        assert "UPDATE" not in verbs
+        assert execution.status == "success"
+        assert execution.output_data == {"result": "执行成功"}
+        assert execution.completed_at is not None
+        
+        stored = db_session.query(ToolExecution).one()
+        assert stored.id == execution.id
+        assert stored.input_data == {"path": "a.py"}
+        
+        assert await service.execute_tool(tool_id + 100, execution_data) is None
+        assert db_session.query(ToolExecution).count() == 1